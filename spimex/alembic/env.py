@@ -1,5 +1,7 @@
 import os
+import sys
 from logging.config import fileConfig
+from pathlib import Path
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
@@ -10,7 +12,21 @@ from alembic import context
 # access to the values within the .ini file in use.
 config = context.config
 
-config.set_main_option("sqlalchemy.url", os.environ["SQLALCHEMY_DATABASE_URL"])
+async_parser_path = Path(__file__).resolve().parent.parent / "async_parser"
+sys.path.insert(0, str(async_parser_path))
+
+from config import ASYNC_SQLALCHEMY_DATABASE_URL  # noqa: E402
+from database import Base  # noqa: E402
+import models  # noqa: E402,F401
+
+# По умолчанию - база асинхронного парсера (через синхронный драйвер)
+config.set_main_option(
+    "sqlalchemy.url",
+    os.environ.get(
+        "SQLALCHEMY_DATABASE_URL",
+        ASYNC_SQLALCHEMY_DATABASE_URL.replace("+asyncpg", "+psycopg2"),
+    ),
+)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -21,7 +37,7 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
-target_metadata = None
+target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -0,0 +1,88 @@
+"""date index, daily rollups and trading calendar
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001a"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Объекты создаются, только если их нет: БД, созданная init_db.py до серии
+# миграций, может содержать часть из них, а отмечается ревизией 0001.
+# Агрегаты и календарь заполняются по уже загруженным данным торгов.
+UPGRADE_SQL = [
+    "CREATE INDEX IF NOT EXISTS ix_spimex_trading_results_date_id "
+    "ON spimex_trading_results (date, id)",
+    """
+    CREATE TABLE IF NOT EXISTS spimex_trading_daily_rollups (
+        date DATE NOT NULL,
+        oil_id VARCHAR(4) NOT NULL,
+        delivery_basis_id VARCHAR(3) NOT NULL,
+        volume FLOAT NOT NULL,
+        total FLOAT NOT NULL,
+        contract_count INTEGER NOT NULL,
+        records INTEGER NOT NULL,
+        min_price FLOAT,
+        max_price FLOAT,
+        updated_on TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        PRIMARY KEY (date, oil_id, delivery_basis_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_spimex_trading_daily_rollups_oil_basis_date "
+    "ON spimex_trading_daily_rollups (oil_id, delivery_basis_id, date)",
+    """
+    CREATE TABLE IF NOT EXISTS spimex_trading_dates (
+        date DATE NOT NULL,
+        row_count INTEGER NOT NULL,
+        loaded_on TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        PRIMARY KEY (date)
+    )
+    """,
+    """
+    INSERT INTO spimex_trading_daily_rollups (
+        date, oil_id, delivery_basis_id, volume, total, contract_count,
+        records, min_price, max_price, updated_on
+    )
+    SELECT
+        date,
+        oil_id,
+        delivery_basis_id,
+        SUM(volume),
+        SUM(total),
+        SUM(contract_count),
+        COUNT(*),
+        MIN(CASE WHEN volume > 0 THEN total / volume END),
+        MAX(CASE WHEN volume > 0 THEN total / volume END),
+        now()
+    FROM spimex_trading_results
+    GROUP BY date, oil_id, delivery_basis_id
+    ON CONFLICT (date, oil_id, delivery_basis_id) DO NOTHING
+    """,
+    "INSERT INTO spimex_trading_dates (date, row_count, loaded_on) "
+    "SELECT date, COUNT(*), now() FROM spimex_trading_results GROUP BY date "
+    "ON CONFLICT (date) DO NOTHING",
+]
+
+
+def upgrade() -> None:
+    for statement in UPGRADE_SQL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS spimex_trading_dates")
+    op.execute(
+        "DROP INDEX IF EXISTS ix_spimex_trading_daily_rollups_oil_basis_date"
+    )
+    op.execute("DROP TABLE IF EXISTS spimex_trading_daily_rollups")
+    op.execute("DROP INDEX IF EXISTS ix_spimex_trading_results_date_id")
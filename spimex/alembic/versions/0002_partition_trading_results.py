@@ -0,0 +1,125 @@
+"""partition spimex_trading_results by month
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Месячные секции от первого месяца с данными до месяца, следующего
+# за текущим (или за последним месяцем с данными)
+CREATE_MONTHLY_PARTITIONS = """
+DO $$
+DECLARE
+    month date;
+BEGIN
+    FOR month IN
+        SELECT generate_series(first_month, last_month, interval '1 month')::date
+        FROM (
+            SELECT
+                date_trunc('month', COALESCE(MIN(date), current_date)) AS first_month,
+                date_trunc('month', GREATEST(MAX(date), current_date))
+                    + interval '1 month' AS last_month
+            FROM spimex_trading_results_unpartitioned
+        ) bounds
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF spimex_trading_results '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'spimex_trading_results_y' || to_char(month, 'YYYY')
+                || 'm' || to_char(month, 'MM'),
+            month,
+            (month + interval '1 month')::date
+        );
+    END LOOP;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(
+        "ALTER TABLE spimex_trading_results RENAME TO spimex_trading_results_unpartitioned"
+    )
+    op.execute(
+        "ALTER TABLE spimex_trading_results_unpartitioned "
+        "RENAME CONSTRAINT spimex_trading_results_pkey "
+        "TO spimex_trading_results_unpartitioned_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_spimex_trading_results_date_id "
+        "RENAME TO ix_spimex_trading_results_unpartitioned_date_id"
+    )
+
+    op.execute(
+        "CREATE TABLE spimex_trading_results "
+        "(LIKE spimex_trading_results_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (date)"
+    )
+    op.execute("ALTER TABLE spimex_trading_results ADD PRIMARY KEY (id, date)")
+    op.create_index(
+        "ix_spimex_trading_results_date_id",
+        "spimex_trading_results",
+        ["date", "id"],
+    )
+    # Последовательность id переходит к новой таблице, иначе она будет
+    # удалена вместе со старой
+    op.execute(
+        "ALTER SEQUENCE spimex_trading_results_id_seq "
+        "OWNED BY spimex_trading_results.id"
+    )
+
+    op.execute(CREATE_MONTHLY_PARTITIONS)
+    op.execute(
+        "INSERT INTO spimex_trading_results "
+        "SELECT * FROM spimex_trading_results_unpartitioned"
+    )
+    op.execute("DROP TABLE spimex_trading_results_unpartitioned")
+    op.execute("ANALYZE spimex_trading_results")
+
+
+def downgrade() -> None:
+    op.execute(
+        "ALTER TABLE spimex_trading_results RENAME TO spimex_trading_results_partitioned"
+    )
+    op.execute(
+        "ALTER TABLE spimex_trading_results_partitioned "
+        "RENAME CONSTRAINT spimex_trading_results_pkey "
+        "TO spimex_trading_results_partitioned_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_spimex_trading_results_date_id "
+        "RENAME TO ix_spimex_trading_results_partitioned_date_id"
+    )
+
+    op.execute(
+        "CREATE TABLE spimex_trading_results "
+        "(LIKE spimex_trading_results_partitioned INCLUDING DEFAULTS)"
+    )
+    op.execute("ALTER TABLE spimex_trading_results ADD PRIMARY KEY (id)")
+    op.create_index(
+        "ix_spimex_trading_results_date_id",
+        "spimex_trading_results",
+        ["date", "id"],
+    )
+    op.execute(
+        "ALTER SEQUENCE spimex_trading_results_id_seq "
+        "OWNED BY spimex_trading_results.id"
+    )
+
+    op.execute(
+        "INSERT INTO spimex_trading_results "
+        "SELECT * FROM spimex_trading_results_partitioned"
+    )
+    op.execute("DROP TABLE spimex_trading_results_partitioned")
+    op.execute("ANALYZE spimex_trading_results")
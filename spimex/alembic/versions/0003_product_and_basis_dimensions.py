@@ -0,0 +1,131 @@
+"""product and delivery basis dimension tables
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "spimex_products",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("exchange_product_id", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("exchange_product_id"),
+    )
+    op.create_table(
+        "spimex_delivery_bases",
+        sa.Column("id", sa.SmallInteger(), nullable=False),
+        sa.Column("delivery_basis_id", sa.String(length=3), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("delivery_basis_id"),
+    )
+
+    # Наименование справочника - последнее загруженное для кода
+    op.execute(
+        """
+        INSERT INTO spimex_products (exchange_product_id, name)
+        SELECT DISTINCT ON (exchange_product_id)
+            exchange_product_id, exchange_product_name
+        FROM spimex_trading_results
+        ORDER BY exchange_product_id, date DESC, id DESC
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO spimex_delivery_bases (delivery_basis_id, name)
+        SELECT DISTINCT ON (delivery_basis_id)
+            delivery_basis_id, delivery_basis_name
+        FROM spimex_trading_results
+        ORDER BY delivery_basis_id, date DESC, id DESC
+        """
+    )
+
+    op.add_column(
+        "spimex_trading_results",
+        sa.Column("product_key", sa.Integer(), nullable=True),
+    )
+    op.add_column(
+        "spimex_trading_results",
+        sa.Column("basis_key", sa.SmallInteger(), nullable=True),
+    )
+    op.execute(
+        """
+        UPDATE spimex_trading_results r
+        SET product_key = p.id, basis_key = b.id
+        FROM spimex_products p, spimex_delivery_bases b
+        WHERE p.exchange_product_id = r.exchange_product_id
+          AND b.delivery_basis_id = r.delivery_basis_id
+        """
+    )
+    op.alter_column("spimex_trading_results", "product_key", nullable=False)
+    op.alter_column("spimex_trading_results", "basis_key", nullable=False)
+    op.create_foreign_key(
+        "spimex_trading_results_product_key_fkey",
+        "spimex_trading_results",
+        "spimex_products",
+        ["product_key"],
+        ["id"],
+    )
+    op.create_foreign_key(
+        "spimex_trading_results_basis_key_fkey",
+        "spimex_trading_results",
+        "spimex_delivery_bases",
+        ["basis_key"],
+        ["id"],
+    )
+
+    op.drop_column("spimex_trading_results", "exchange_product_name")
+    op.drop_column("spimex_trading_results", "delivery_basis_name")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "spimex_trading_results",
+        sa.Column("exchange_product_name", sa.String(), nullable=True),
+    )
+    op.add_column(
+        "spimex_trading_results",
+        sa.Column("delivery_basis_name", sa.String(), nullable=True),
+    )
+    op.execute(
+        """
+        UPDATE spimex_trading_results r
+        SET exchange_product_name = p.name, delivery_basis_name = b.name
+        FROM spimex_products p, spimex_delivery_bases b
+        WHERE p.id = r.product_key AND b.id = r.basis_key
+        """
+    )
+    op.alter_column("spimex_trading_results", "exchange_product_name", nullable=False)
+    op.alter_column("spimex_trading_results", "delivery_basis_name", nullable=False)
+
+    op.drop_constraint(
+        "spimex_trading_results_basis_key_fkey",
+        "spimex_trading_results",
+        type_="foreignkey",
+    )
+    op.drop_constraint(
+        "spimex_trading_results_product_key_fkey",
+        "spimex_trading_results",
+        type_="foreignkey",
+    )
+    op.drop_column("spimex_trading_results", "basis_key")
+    op.drop_column("spimex_trading_results", "product_key")
+
+    op.drop_table("spimex_delivery_bases")
+    op.drop_table("spimex_products")
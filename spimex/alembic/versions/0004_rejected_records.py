@@ -0,0 +1,42 @@
+"""quarantine table for rejected bulletin rows
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "spimex_rejected_records",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("exchange_product_id", sa.String(), nullable=True),
+        sa.Column("reason", sa.String(length=32), nullable=False),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("created_on", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_spimex_rejected_records_date", "spimex_rejected_records", ["date"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_spimex_rejected_records_date", table_name="spimex_rejected_records"
+    )
+    op.drop_table("spimex_rejected_records")
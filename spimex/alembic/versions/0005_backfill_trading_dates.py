@@ -0,0 +1,36 @@
+"""backfill the trading calendar from loaded trading results
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Базы, переведенные на миграции через alembic stamp, содержат данные
+    # торгов, но пустой календарь: API не видит торговых дат, а загрузчик
+    # (get_loaded_row_count) считает даты незагруженными. Даты, уже
+    # записанные загрузчиком, не меняются.
+    op.execute(
+        "INSERT INTO spimex_trading_dates (date, row_count, loaded_on) "
+        "SELECT date, COUNT(*), now() "
+        "FROM spimex_trading_results "
+        "GROUP BY date "
+        "ON CONFLICT (date) DO NOTHING"
+    )
+
+
+def downgrade() -> None:
+    # Восстановленные даты соответствуют данным торгов и остаются в календаре
+    pass
@@ -1,27 +1,55 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import Optional, Tuple
+import asyncio
+import time
 from datetime import date, datetime
 import uvicorn
 
+import os
 import sys
 from pathlib import Path
 
 async_parser_path = Path(__file__).parent.parent
 sys.path.insert(0, str(async_parser_path))
 
+# Пул соединений API рассчитывается по профилю api (см. database.pool_options)
+os.environ.setdefault("DB_ENGINE_ROLE", "api")
+
 from models.schemas import (
     TradingResultResponse,
     TradingDynamicsResponse,
     LastTradingDatesResponse,
     TradingResultFilter,
     DynamicsFilter,
+    DynamicsBatchRequest,
+    DynamicsBatchResponse,
+    ExportFilter,
+    AggregateFilter,
+    AggregateResponse,
 )
 from .services.trading_service import TradingService
 from .services.cache_service import CacheService
+from .services.export_service import ExportService
+from .services.notification_service import NotificationService, format_sse
+from .services.body_cache import ResponseBodyCache
+from .services.read_router import ReadRouter
+from .middleware.compression import (
+    CompressionMiddleware,
+    available_encodings,
+    choose_encoding,
+    compress,
+)
+from .middleware.error_handler import ErrorHandlerMiddleware
+from .middleware.metrics import MetricsMiddleware
+from .services.metrics import record_cache_outcome, render_metrics
+from .middleware.profiling import ProfilingMiddleware
+from .services.profiling import profile_phase
+from .services import columnar
+from .services.cache_codec import dumps_json
 from config import api_settings as settings
-
-from init_db import init_async_database
+from database import async_engine, warm_up_pool, pool_status
 
 app = FastAPI(
     title="SPIMEX Trading Results API",
@@ -39,22 +67,294 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-trading_service = TradingService()
+COMPRESSION_ENCODINGS = available_encodings(
+    [encoding.strip() for encoding in settings.COMPRESSION_ENCODINGS.split(",")]
+)
+
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        encodings=COMPRESSION_ENCODINGS,
+    )
+
+app.add_middleware(ErrorHandlerMiddleware)
+if ProfilingMiddleware.enabled():
+    app.add_middleware(ProfilingMiddleware)
+# Последний добавленный middleware - внешний: время запроса и размер
+# тела ответа учитываются вместе со сжатием и обработкой ошибок
+app.add_middleware(MetricsMiddleware)
+
+read_router = ReadRouter()
+trading_service = TradingService(read_session_factory=read_router)
 cache_service = CacheService()
+export_service = ExportService()
+notification_service = NotificationService()
+body_cache = ResponseBodyCache(settings.RESPONSE_BODY_CACHE_MAX_BYTES)
+
+RESPONSE_FORMATS = ("json", "arrow", "parquet")
+
+
+def resolve_columnar_format(
+    request: Request, format: Optional[str]
+) -> Optional[str]:
+    """
+    Определить колоночный формат ответа по параметру format и заголовку Accept
+
+    Returns:
+        arrow, parquet или None для JSON
+    """
+    if format is not None and format not in RESPONSE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"format должен быть одним из: {', '.join(RESPONSE_FORMATS)}",
+        )
+
+    columnar_format = columnar.negotiate(format, request.headers.get("accept"))
+    if columnar_format and not columnar.is_available():
+        raise HTTPException(
+            status_code=406,
+            detail="Колоночные форматы недоступны: не установлен pyarrow",
+        )
+    return columnar_format
+
+
+def columnar_response(
+    rows, columnar_format: str, next_cursor: Optional[str] = None
+) -> Response:
+    """Ответ в формате Arrow IPC или Parquet"""
+    headers = {"X-Row-Count": str(len(rows))}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(
+        content=columnar.serialize(rows, columnar_format),
+        media_type=columnar.MEDIA_TYPES[columnar_format],
+        headers=headers,
+    )
+
+
+def json_response(content: dict, headers: Optional[dict] = None) -> Response:
+    """
+    JSON ответ без повторной валидации по response_model
+
+    Данные уже собраны из строк БД (или взяты из кэша) в нужной форме,
+    поэтому сериализуются напрямую через orjson.
+    """
+    with profile_phase("serialize"):
+        body = dumps_json(content)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с одним из значений заголовка If-None-Match"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate[2:] == etag if candidate.startswith("W/") else candidate == etag
+        for candidate in candidates
+    )
+
+
+async def cached_json_response(
+    request: Request,
+    cache_key: str,
+    load,
+    vary: Optional[str] = None,
+) -> Response:
+    """
+    JSON ответ из кэша с заголовками HTTP-кэширования
+
+    ETag - версия значения в кэше (хэш его содержимого) и кодирование
+    ответа (сжатые и несжатые представления различаются байтами, поэтому
+    ETag у каждого свой). Он меняется только вместе с данными, а запрос
+    с совпадающим If-None-Match получает 304 по заголовку записи в Redis,
+    без чтения значения и без запроса в БД. max-age не больше HTTP_CACHE_MAX_AGE и не дальше
+    следующего автосброса кэша.
+
+    Готовое тело ответа (сериализованное и сжатое под Accept-Encoding
+    клиента) сохраняется в памяти процесса под версией значения, повторные
+    запросы отдают его без чтения значения, сериализации и сжатия. Версия
+    берется только у свежего значения, поэтому 304 и готовое тело
+    не продлевают устаревшее значение мимо его обновления.
+
+    Устаревшее значение (SWR) отдается без ETag и с no-cache, чтобы
+    клиент не закрепил его под ETag нового поколения.
+
+    При CACHE_CLIENT_BYPASS запрос с Cache-Control: no-cache читается
+    из БД мимо Redis и кэша тел ответов (замеры нагрузки без кэша).
+    """
+    encoding = None
+    vary_headers = [vary] if vary else []
+    if settings.COMPRESSION_ENABLED:
+        encoding = choose_encoding(
+            request.headers.get("accept-encoding"), COMPRESSION_ENCODINGS
+        )
+        vary_headers.append("Accept-Encoding")
+    headers = {"Vary": ", ".join(vary_headers)} if vary_headers else {}
+
+    if settings.CACHE_CLIENT_BYPASS and "no-cache" in request.headers.get(
+        "cache-control", ""
+    ):
+        headers["Cache-Control"] = "no-cache"
+        track_cache_outcome(request, cache_key, "bypass")
+        return body_response(*encode_body(await load(), encoding), headers)
+
+    max_age = min(settings.HTTP_CACHE_MAX_AGE, cache_service.seconds_until_reset())
+    version = await cache_service.version(cache_key)
+    if version:
+        headers["ETag"] = response_etag(version, encoding)
+        headers["Cache-Control"] = f"public, max-age={max_age}"
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            track_cache_outcome(request, cache_key, "not_modified")
+            return Response(status_code=304, headers=headers)
+
+        cached_body = body_cache.get((version, encoding))
+        if cached_body is not None:
+            track_cache_outcome(request, cache_key, "memory")
+            return body_response(*cached_body, headers)
+
+    content, outcome, version = await cache_service.get_or_set_with_version(
+        cache_key, load
+    )
+    track_cache_outcome(request, cache_key, outcome)
+    body, content_encoding = encode_body(content, encoding)
+
+    if outcome == "stale" or not version:
+        headers.pop("ETag", None)
+        headers["Cache-Control"] = "no-cache"
+    else:
+        # значение могло смениться после чтения версии - ETag по прочитанному
+        headers["ETag"] = response_etag(version, encoding)
+        headers["Cache-Control"] = f"public, max-age={max_age}"
+        body_cache.put((version, encoding), body, content_encoding)
+
+    return body_response(body, content_encoding, headers)
+
+
+def response_etag(version: str, encoding: Optional[str]) -> str:
+    """Сильный ETag представления: версия значения и кодирование ответа"""
+    return f'"{version}-{encoding or "identity"}"'
+
+
+def track_cache_outcome(request: Request, cache_key: str, outcome: str):
+    """Учесть результат обращения к кэшу в метриках запроса и пространства имен"""
+    request.state.cache_outcome = outcome
+    record_cache_outcome(cache_key.split(":", 1)[0], outcome)
+
+
+def encode_body(
+    content: dict, encoding: Optional[str]
+) -> Tuple[bytes, Optional[str]]:
+    """Сериализовать тело ответа и сжать, если оно не меньше COMPRESSION_MIN_SIZE"""
+    with profile_phase("serialize"):
+        body = dumps_json(content)
+    if encoding and len(body) >= settings.COMPRESSION_MIN_SIZE:
+        with profile_phase("compress"):
+            return compress(body, encoding), encoding
+    return body, None
+
+
+def body_response(
+    body: bytes, content_encoding: Optional[str], headers: dict
+) -> Response:
+    """JSON ответ из готового (возможно, сжатого) тела"""
+    if content_encoding:
+        headers = {**headers, "Content-Encoding": content_encoding}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def dynamics_payload(
+    filter_params: DynamicsFilter, results: list, next_cursor: Optional[str]
+) -> dict:
+    """Тело ответа динамики торгов (в таком виде оно и хранится в кэше)"""
+    return {
+        "results": results,
+        "count": len(results),
+        "filter": filter_params.dict(exclude_none=True),
+        "next_cursor": next_cursor,
+    }
+
+
+def dynamics_loader(filter_params: DynamicsFilter):
+    """Функция загрузки тела ответа динамики торгов из БД"""
+
+    async def load():
+        results, next_cursor = await trading_service.get_dynamics(filter_params)
+        return dynamics_payload(filter_params, results, next_cursor)
+
+    return load
+
+
+async def cached_dynamics(filter_params: DynamicsFilter) -> dict:
+    """Тело ответа динамики торгов из кэша или из БД"""
+    response, _ = await cache_service.get_or_set(
+        f"dynamics:{filter_params.cache_key()}", dynamics_loader(filter_params)
+    )
+    return response
+
+
+def event_token(event: dict) -> str:
+    """Идентификатор уведомления загрузчика для однократной инвалидации"""
+    if event.get("type") == "backfill":
+        return f"backfill:{event.get('start')}:{event.get('end')}:{event.get('dates')}"
+    return f"trading_date:{event.get('date')}:{event.get('row_count')}"
+
+
+async def on_new_trading_date(event: dict):
+    """
+    Загружены данные торгов: сбросить календарь и кэш
+
+    Загрузчик уведомляет о каждой новой последней дате (trading_date)
+    и один раз за запуск - о загруженных исторических датах (backfill).
+    """
+    read_router.prefer_primary()
+    trading_service.invalidate_calendar()
+    await cache_service.invalidate_once(event_token(event))
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Инициализация при запуске приложения"""
-    await init_async_database()
+    """
+    Инициализация при запуске приложения
+
+    Схема БД управляется миграциями Alembic (alembic upgrade head),
+    API ее не создает и не проверяет.
+    """
+    started = time.perf_counter()
+
     await cache_service.init_redis()
-    print("✅ API сервис SPIMEX запущен")
+
+    # Проверка реплик не зависит от основной БД: если она недоступна
+    # при старте, реплики все равно должны начать обслуживать чтения
+    try:
+        await read_router.start()
+    except Exception as e:
+        print(f"⚠️ Не удалось запустить проверку реплик: {e}")
+
+    try:
+        await warm_up_pool(settings.DB_POOL_WARMUP)
+        await trading_service.get_calendar()
+    except Exception as e:
+        # БД может подняться позже, запросы переподключатся сами
+        print(f"⚠️ Не удалось прогреть пул соединений с БД: {e}")
+
+    if settings.NOTIFY_ENABLED:
+        notification_service.add_handler(on_new_trading_date)
+        await notification_service.start()
+
+    print(
+        f"✅ API сервис SPIMEX запущен за {time.perf_counter() - started:.2f} с"
+    )
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Очистка ресурсов при остановке"""
+    await notification_service.stop()
     await cache_service.close()
+    await read_router.close()
+    await async_engine.dispose()
     print("🔄 API сервис SPIMEX остановлен")
 
 
@@ -68,7 +368,11 @@ async def root():
         "endpoints": {
             "last_trading_dates": "/api/v1/last-trading-dates",
             "dynamics": "/api/v1/dynamics",
+            "dynamics_batch": "/api/v1/dynamics/batch",
             "trading_results": "/api/v1/trading-results",
+            "aggregates": "/api/v1/aggregates",
+            "export": "/api/v1/export",
+            "subscribe": "/api/v1/subscribe",
         },
         "docs": "/docs",
     }
@@ -103,6 +407,7 @@ async def health_check():
     tags=["Торговые данные"],
 )
 async def get_last_trading_dates(
+    request: Request,
     limit: int = Query(
         default=10,
         ge=1,
@@ -123,17 +428,11 @@ async def get_last_trading_dates(
     try:
         cache_key = f"last_trading_dates:{limit}"
 
-        cached_result = await cache_service.get(cache_key)
-        if cached_result:
-            return cached_result
-
-        dates = await trading_service.get_last_trading_dates(limit)
-
-        result = LastTradingDatesResponse(dates=dates, count=len(dates))
-
-        await cache_service.set(cache_key, result.dict())
+        async def load():
+            dates = await trading_service.get_last_trading_dates(limit)
+            return LastTradingDatesResponse(dates=dates, count=len(dates)).dict()
 
-        return result
+        return await cached_json_response(request, cache_key, load)
 
     except Exception as e:
         raise HTTPException(
@@ -145,6 +444,7 @@ async def get_last_trading_dates(
     "/api/v1/dynamics", response_model=TradingDynamicsResponse, tags=["Торговые данные"]
 )
 async def get_dynamics(
+    request: Request,
     start_date: date = Query(
         ...,
         description="Дата начала периода (обязательная)",
@@ -166,6 +466,14 @@ async def get_dynamics(
         description="ID базиса поставки (3 символа)",
     ),
     limit: int = Query(1000, ge=1, le=10000, description="Лимит записей (1-10000)"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Курсор следующей страницы (next_cursor из предыдущего ответа)",
+    ),
+    format: Optional[str] = Query(
+        None,
+        description="Формат ответа: json (по умолчанию), arrow или parquet",
+    ),
 ):
     """
     Получить динамику торгов за заданный период
@@ -176,11 +484,19 @@ async def get_dynamics(
     - **oil_id**: ID нефтепродукта (опциональный)
     - **delivery_type_id**: ID типа поставки (опциональный)
     - **delivery_basis_id**: ID базиса поставки (опциональный)
-    - **limit**: Лимит записей (опциональный, по умолчанию 1000)
+    - **limit**: Лимит записей на страницу (опциональный, по умолчанию 1000)
+    - **cursor**: Курсор следующей страницы (опциональный)
 
     **Обоснование обязательности:**
     - start_date, end_date - обязательные для предотвращения запроса всех данных
     - Остальные параметры опциональные для гибкости фильтрации
+
+    **Пагинация:** если в ответе есть next_cursor, следующую страницу
+    можно получить, повторив запрос с параметром cursor=next_cursor.
+
+    **Колоночные форматы:** format=arrow|parquet или заголовок Accept
+    (application/vnd.apache.arrow.stream, application/vnd.apache.parquet).
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
     """
     try:
         if start_date > end_date:
@@ -196,40 +512,214 @@ async def get_dynamics(
             delivery_type_id=delivery_type_id,
             delivery_basis_id=delivery_basis_id,
             limit=limit,
+            cursor=cursor,
+        )
+
+        columnar_format = resolve_columnar_format(request, format)
+        if columnar_format:
+            rows, next_cursor = await trading_service.get_dynamics_rows(filter_params)
+            return columnar_response(rows, columnar_format, next_cursor)
+
+        return await cached_json_response(
+            request,
+            f"dynamics:{filter_params.cache_key()}",
+            dynamics_loader(filter_params),
+            vary="Accept",
+        )
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Ошибка получения динамики: {str(e)}"
         )
 
-        cache_key = f"dynamics:{filter_params.cache_key()}"
 
-        cached_result = await cache_service.get(cache_key)
-        if cached_result:
-            return TradingDynamicsResponse(**cached_result)
+@app.post(
+    "/api/v1/dynamics/batch",
+    response_model=DynamicsBatchResponse,
+    tags=["Торговые данные"],
+)
+async def get_dynamics_batch(request: Request, batch: DynamicsBatchRequest):
+    """
+    Получить динамику торгов сразу по нескольким фильтрам
 
-        results = await trading_service.get_dynamics(filter_params)
+    Тело запроса: {"queries": {"<имя>": {<параметры /api/v1/dynamics>}, ...}}.
+    Результаты возвращаются по тем же именам и совпадают с ответами
+    GET /api/v1/dynamics.
+
+    Закэшированные ответы читаются одним MGET из Redis, остальные фильтры
+    выполняются одним SQL запросом, и их результаты сохраняются в кэш
+    одним конвейером. Устаревшие (SWR) ответы отдаются сразу и обновляются
+    в фоне, как в GET /api/v1/dynamics. Максимальное число фильтров -
+    BATCH_MAX_QUERIES.
+    """
+    if len(batch.queries) > settings.BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не более {settings.BATCH_MAX_QUERIES} запросов в пакете",
+        )
+
+    try:
+        cache_keys = {
+            name: f"dynamics:{filter_params.cache_key()}"
+            for name, filter_params in batch.queries.items()
+        }
+        # одинаковые фильтры под разными именами выполняются один раз
+        filters = {
+            cache_key: batch.queries[name] for name, cache_key in cache_keys.items()
+        }
+        entries = await cache_service.mget(list(filters))
+        cached = {
+            cache_key: entry[0] for cache_key, entry in entries.items() if entry
+        }
+        missing = {
+            cache_key: filter_params
+            for cache_key, filter_params in filters.items()
+            if cache_key not in cached
+        }
 
-        response = TradingDynamicsResponse(
-            results=results,
-            count=len(results),
-            filter=filter_params.dict(exclude_none=True),
+        outcomes = []
+        for cache_key, entry in entries.items():
+            if entry is None:
+                outcome = "miss"
+            elif entry[1]:
+                outcome = "stale"
+                cache_service.schedule_refresh(
+                    cache_key, dynamics_loader(filters[cache_key]), None
+                )
+            else:
+                outcome = "hit"
+            record_cache_outcome("dynamics", outcome)
+            outcomes.append(outcome)
+        request.state.cache_outcome = next(
+            (outcome for outcome in ("miss", "stale") if outcome in outcomes), "hit"
         )
 
-        await cache_service.set(cache_key, response.dict())
+        if missing:
+            pages = await trading_service.get_dynamics_batch(list(missing.values()))
+            loaded = {
+                cache_key: dynamics_payload(filter_params, items, next_cursor)
+                for (cache_key, filter_params), (items, next_cursor) in zip(
+                    missing.items(), pages
+                )
+            }
+            cached.update(loaded)
+            await cache_service.mset(loaded)
 
-        return response
+        return json_response(
+            {
+                "results": {
+                    name: cached[cache_key] for name, cache_key in cache_keys.items()
+                },
+                "count": len(cache_keys),
+            }
+        )
 
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Ошибка получения динамики: {str(e)}"
         )
 
 
+@app.get("/api/v1/subscribe", tags=["Торговые данные"])
+async def subscribe(
+    request: Request,
+    include_rows: bool = Query(
+        False,
+        description="Добавлять в событие результаты торгов за новую дату",
+    ),
+    oil_id: Optional[str] = Query(None, description="ID нефтепродукта (4 символа)"),
+    delivery_type_id: Optional[str] = Query(
+        None,
+        description="ID типа поставки (1 символ)",
+    ),
+    delivery_basis_id: Optional[str] = Query(
+        None,
+        description="ID базиса поставки (3 символа)",
+    ),
+    limit: int = Query(1000, ge=1, le=10000, description="Лимит записей (1-10000)"),
+):
+    """
+    Подписка на новые торговые даты (Server-Sent Events)
+
+    После коммита загрузчиком новой торговой даты клиент получает событие
+    `trading_date` с полями date и row_count. При include_rows=true
+    в событие добавляются results - результаты торгов за эту дату
+    с учетом фильтров (как в /api/v1/dynamics за один день); если их
+    не удалось получить, событие приходит без results, с полем
+    results_error.
+
+    Раз в SSE_HEARTBEAT_INTERVAL секунд отправляется комментарий-пинг,
+    чтобы прокси не закрывали соединение.
+    """
+    if not settings.NOTIFY_ENABLED:
+        raise HTTPException(status_code=503, detail="Уведомления отключены")
+
+    try:
+        row_filter = TradingResultFilter(
+            oil_id=oil_id,
+            delivery_type_id=delivery_type_id,
+            delivery_basis_id=delivery_basis_id,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        queue = notification_service.subscribe()
+        try:
+            yield b": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.SSE_HEARTBEAT_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+
+                # загрузка истории сбрасывает кэш, но не является новыми торгами
+                if event.get("type", "trading_date") != "trading_date":
+                    continue
+
+                if include_rows:
+                    # ошибка чтения строк не должна закрывать поток подписчика:
+                    # событие уходит без results, с описанием ошибки
+                    try:
+                        trade_date = date.fromisoformat(event["date"])
+                        payload = await cached_dynamics(
+                            DynamicsFilter(
+                                start_date=trade_date,
+                                end_date=trade_date,
+                                **row_filter.dict(),
+                            )
+                        )
+                        event = {**event, "results": payload["results"]}
+                    except Exception as e:
+                        print(f"❌ Ошибка получения результатов для SSE: {e}")
+                        event = {**event, "results_error": str(e)}
+
+                yield format_sse("trading_date", event, event_id=event["date"])
+        finally:
+            notification_service.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get(
     "/api/v1/trading-results",
     response_model=TradingResultResponse,
     tags=["Торговые данные"],
 )
 async def get_trading_results(
+    request: Request,
     oil_id: Optional[str] = Query(None, description="ID нефтепродукта (4 символа)"),
     delivery_type_id: Optional[str] = Query(
         None,
@@ -245,6 +735,10 @@ async def get_trading_results(
         le=1000,
         description="Лимит записей (1-1000)",
     ),
+    format: Optional[str] = Query(
+        None,
+        description="Формат ответа: json (по умолчанию), arrow или parquet",
+    ),
 ):
     """
     Получить последние результаты торгов
@@ -259,6 +753,9 @@ async def get_trading_results(
     - Все параметры опциональные для максимальной гибкости
     - limit имеет разумное значение по умолчанию
     - Без фильтров возвращаются последние торги по всем инструментам
+
+    **Колоночные форматы:** format=arrow|parquet или заголовок Accept
+    (application/vnd.apache.arrow.stream, application/vnd.apache.parquet).
     """
     try:
         filter_params = TradingResultFilter(
@@ -268,28 +765,198 @@ async def get_trading_results(
             limit=limit,
         )
 
+        columnar_format = resolve_columnar_format(request, format)
+        if columnar_format:
+            rows = await trading_service.get_trading_results_rows(filter_params)
+            return columnar_response(rows, columnar_format)
+
         cache_key = f"trading_results:{filter_params.cache_key()}"
 
-        cached_result = await cache_service.get(cache_key)
-        if cached_result:
-            return TradingResultResponse(**cached_result)
+        async def load():
+            results = await trading_service.get_trading_results(filter_params)
+            return {
+                "results": results,
+                "count": len(results),
+                "filter": filter_params.dict(exclude_none=True),
+            }
+
+        return await cached_json_response(request, cache_key, load, vary="Accept")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Ошибка получения результатов: {str(e)}"
+        )
+
+
+@app.get(
+    "/api/v1/aggregates",
+    response_model=AggregateResponse,
+    tags=["Торговые данные"],
+)
+async def get_aggregates(
+    request: Request,
+    start_date: date = Query(
+        ...,
+        description="Дата начала периода (обязательная)",
+    ),
+    end_date: date = Query(
+        ...,
+        description="Дата окончания периода (обязательная)",
+    ),
+    bucket: str = Query(
+        "day",
+        description="Размер периода агрегации: day, week или month",
+    ),
+    oil_id: Optional[str] = Query(
+        None,
+        description="ID нефтепродукта (4 символа)",
+    ),
+    delivery_basis_id: Optional[str] = Query(
+        None,
+        description="ID базиса поставки (3 символа)",
+    ),
+    limit: int = Query(1000, ge=1, le=10000, description="Лимит записей (1-10000)"),
+):
+    """
+    Получить агрегаты торгов по нефтепродукту и базису поставки за периоды
+
+    **Параметры:**
+    - **start_date**: Дата начала периода (обязательная)
+    - **end_date**: Дата окончания периода (обязательная)
+    - **bucket**: day, week или month (опциональный, по умолчанию day)
+    - **oil_id**: ID нефтепродукта (опциональный)
+    - **delivery_basis_id**: ID базиса поставки (опциональный)
+    - **limit**: Лимит записей (опциональный, по умолчанию 1000)
 
-        results = await trading_service.get_trading_results(filter_params)
+    Для каждого периода возвращаются суммарные объем, стоимость и количество
+    договоров, средневзвешенная цена (avg_price), минимальная и максимальная
+    цена, а также средняя цена первого и последнего торгового дня периода
+    (open_price, close_price). Данные берутся из таблицы дневных агрегатов,
+    которую загрузчик обновляет вместе с сырыми данными.
+    """
+    try:
+        if start_date > end_date:
+            raise HTTPException(
+                status_code=400,
+                detail="Дата начала не может быть больше даты окончания",
+            )
 
-        response = TradingResultResponse(
-            results=results,
-            count=len(results),
-            filter=filter_params.dict(exclude_none=True),
+        filter_params = AggregateFilter(
+            start_date=start_date,
+            end_date=end_date,
+            bucket=bucket,
+            oil_id=oil_id,
+            delivery_basis_id=delivery_basis_id,
+            limit=limit,
         )
 
-        await cache_service.set(cache_key, response.dict())
+        cache_key = f"aggregates:{filter_params.cache_key()}"
 
-        return response
+        async def load():
+            results = await trading_service.get_aggregates(filter_params)
+            return AggregateResponse(
+                results=results,
+                count=len(results),
+                filter=filter_params.dict(exclude_none=True),
+            ).dict()
 
+        return await cached_json_response(request, cache_key, load)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
-            status_code=500, detail=f"Ошибка получения результатов: {str(e)}"
+            status_code=500, detail=f"Ошибка получения агрегатов: {str(e)}"
+        )
+
+
+@app.get("/api/v1/export", tags=["Торговые данные"])
+async def export_trading_results(
+    start_date: date = Query(
+        ...,
+        description="Дата начала периода (обязательная)",
+    ),
+    end_date: date = Query(
+        ...,
+        description="Дата окончания периода (обязательная)",
+    ),
+    oil_id: Optional[str] = Query(
+        None,
+        description="ID нефтепродукта (4 символа)",
+    ),
+    delivery_type_id: Optional[str] = Query(
+        None,
+        description="ID типа поставки (1 символ)",
+    ),
+    delivery_basis_id: Optional[str] = Query(
+        None,
+        description="ID базиса поставки (3 символа)",
+    ),
+    format: str = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
+):
+    """
+    Потоковая выгрузка результатов торгов за период
+
+    **Параметры:**
+    - **start_date**: Дата начала периода (обязательная)
+    - **end_date**: Дата окончания периода (обязательная)
+    - **oil_id**: ID нефтепродукта (опциональный)
+    - **delivery_type_id**: ID типа поставки (опциональный)
+    - **delivery_basis_id**: ID базиса поставки (опциональный)
+    - **format**: ndjson (по умолчанию) или csv
+
+    Данные читаются из БД серверным курсором и отдаются по мере чтения,
+    без лимита записей и без кэширования.
+    """
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=400,
+            detail="Дата начала не может быть больше даты окончания",
+        )
+
+    try:
+        filter_params = ExportFilter(
+            start_date=start_date,
+            end_date=end_date,
+            oil_id=oil_id,
+            delivery_type_id=delivery_type_id,
+            delivery_basis_id=delivery_basis_id,
+            format=format,
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = f"spimex_{start_date.isoformat()}_{end_date.isoformat()}.{format}"
+    return StreamingResponse(
+        export_service.serialize(
+            trading_service.stream_dynamics(filter_params), filter_params.format
+        ),
+        media_type=export_service.media_type(filter_params.format),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/metrics", tags=["Общие"], include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus (по всем воркерам)"""
+    body, content_type = render_metrics()
+    return Response(content=body, headers={"Content-Type": content_type})
+
+
+@app.get("/api/v1/db/pool", tags=["Общие"])
+async def get_db_pool_status():
+    """
+    Состояние пула соединений с БД текущего воркера
+
+    Размер пула, выданные соединения, overflow, число выдач, таймаутов
+    и время ожидания соединения (суммарное, среднее, максимальное),
+    а также отставание и доступность реплик для чтения.
+    """
+    return {**pool_status(), "replicas": read_router.status()}
 
 
 @app.get("/api/v1/cache/stats", tags=["Кэш"])
@@ -297,6 +964,7 @@ async def get_cache_stats():
     """Получить статистику кэша"""
     try:
         stats = await cache_service.get_stats()
+        stats["response_bodies"] = body_cache.stats()
         return stats
     except Exception as e:
         raise HTTPException(
@@ -305,11 +973,46 @@ async def get_cache_stats():
 
 
 @app.delete("/api/v1/cache/clear", tags=["Кэш"])
-async def clear_cache():
-    """Очистить весь кэш (для администрирования)"""
+async def clear_cache(
+    namespace: Optional[str] = Query(
+        None,
+        description="Пространство имен кэша (по умолчанию - все пространства сервиса)",
+    ),
+    mode: str = Query(
+        "generation",
+        description="Режим: generation - смена поколения ключей, "
+        "unlink - фоновое удаление ключей (SCAN + UNLINK)",
+    ),
+):
+    """
+    Очистить кэш (для администрирования)
+
+    **Параметры:**
+    - **namespace**: last_trading_dates, dynamics, trading_results
+      или aggregates (опциональный)
+    - **mode**: generation (O(1), по умолчанию) или unlink
+    """
+    if namespace is not None and namespace not in CacheService.NAMESPACES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестное пространство имен: {namespace}",
+        )
+    if mode not in CacheService.INVALIDATION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестный режим очистки: {mode}",
+        )
+
     try:
-        await cache_service.clear_all()
-        return {"message": "Кэш очищен", "timestamp": datetime.now().isoformat()}
+        removed = await cache_service.invalidate(namespace, mode)
+        if removed is None:
+            raise RuntimeError("Redis недоступен")
+        return {
+            "message": "Кэш очищен",
+            "mode": mode,
+            "namespaces": removed,
+            "timestamp": datetime.now().isoformat(),
+        }
     except Exception as e:
         raise HTTPException(
             status_code=500,
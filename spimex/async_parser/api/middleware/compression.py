@@ -0,0 +1,216 @@
+import zlib
+from typing import Dict, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..services.profiling import profile_phase
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Типы содержимого, которые имеет смысл сжимать. Parquet уже сжат внутри,
+# text/event-stream нельзя буферизовать в компрессоре.
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/vnd.apache.arrow.stream",
+    "text/csv",
+    "text/plain",
+    "text/html",
+)
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+BROTLI_QUALITY = 4
+
+
+def available_encodings(encodings: Sequence[str]) -> tuple:
+    """Оставить только алгоритмы, для которых установлены библиотеки"""
+    supported = {"gzip"}
+    if zstandard is not None:
+        supported.add("zstd")
+    if brotli is not None:
+        supported.add("br")
+    return tuple(encoding for encoding in encodings if encoding in supported)
+
+
+def choose_encoding(
+    accept_encoding: Optional[str], encodings: Sequence[str]
+) -> Optional[str]:
+    """
+    Выбрать алгоритм сжатия по заголовку Accept-Encoding
+
+    Args:
+        accept_encoding: Значение заголовка Accept-Encoding
+        encodings: Алгоритмы сервера в порядке предпочтения
+
+    Returns:
+        gzip, br, zstd или None, если клиент не принимает ни один из них
+    """
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[token.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class _BrotliStream:
+    """Обертка brotli.Compressor с интерфейсом compress/flush"""
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def stream_compressor(encoding: str):
+    """Потоковый компрессор (методы compress и flush)"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    if encoding == "br":
+        return _BrotliStream()
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Сжать тело ответа целиком"""
+    compressor = stream_compressor(encoding)
+    return compressor.compress(data) + compressor.flush()
+
+
+def is_compressible(headers: Headers) -> bool:
+    """Можно ли сжимать ответ с такими заголовками"""
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов gzip/brotli/zstd по Accept-Encoding клиента
+
+    Ответы меньше minimum_size и уже сжатые (с Content-Encoding)
+    передаются как есть. Потоковые ответы сжимаются по мере отправки.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        encodings: Sequence[str] = ("zstd", "br", "gzip"),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings(encodings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            encoding = choose_encoding(headers.get("accept-encoding"), self.encodings)
+            if encoding:
+                responder = _CompressionResponder(self.app, encoding, self.minimum_size)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            # заголовки отправляются вместе с первым фрагментом тела,
+            # когда уже известно, сжимать ли ответ
+            self.initial_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+
+            if not is_compressible(headers) or (
+                not more_body and len(body) < self.minimum_size
+            ):
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            self.compressor = stream_compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+
+            with profile_phase("compress"):
+                data = self.compressor.compress(body)
+                if not more_body:
+                    data += self.compressor.flush()
+            if more_body:
+                if "content-length" in headers:
+                    del headers["content-length"]
+            else:
+                headers["Content-Length"] = str(len(data))
+
+            await self.send(self.initial_message)
+            await self.send(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+            return
+
+        if self.compressor is None:
+            await self.send(message)
+            return
+
+        with profile_phase("compress"):
+            data = self.compressor.compress(body)
+            if not more_body:
+                data += self.compressor.flush()
+        await self.send(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
@@ -1,42 +1,54 @@
 import traceback
-from typing import Callable
-from fastapi import Request, Response, HTTPException
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 import logging
 
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 logger = logging.getLogger(__name__)
 
 
-class ErrorHandlerMiddleware(BaseHTTPMiddleware):
-    """Middleware для централизованной обработки ошибок"""
+class ErrorHandlerMiddleware:
+    """
+    Middleware для централизованной обработки ошибок
+
+    Чистый ASGI middleware: сообщения ответа передаются дальше без
+    буферизации, поэтому потоковые ответы (выгрузка, SSE) не копятся
+    в памяти. HTTPException FastAPI обрабатывает сам; сюда доходят только
+    необработанные исключения. Если заголовки ответа уже отправлены,
+    ответить 500 нельзя, и исключение пробрасывается дальше.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_tracking_start(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
 
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: Callable
-    ) -> Response:
         try:
-            response = await call_next(request)
-            return response
-        except HTTPException as exc:
-            return JSONResponse(
-                status_code=exc.status_code,
-                content={
-                    "error": exc.detail,
-                    "status_code": exc.status_code,
-                    "path": str(request.url),
-                },
-            )
+            await self.app(scope, receive, send_tracking_start)
         except Exception as exc:
             logger.error(f"Unhandled error: {exc}")
             logger.error(traceback.format_exc())
+            if response_started:
+                raise
 
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=500,
                 content={
                     "error": "Внутренняя ошибка сервера",
                     "detail": "Произошла неожиданная ошибка",
-                    "path": str(request.url),
+                    "path": str(Request(scope).url),
                 },
             )
+            await response(scope, receive, send)
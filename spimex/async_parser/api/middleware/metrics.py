@@ -0,0 +1,57 @@
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..services.metrics import REQUEST_DURATION, RESPONSE_BYTES
+
+
+class MetricsMiddleware:
+    """
+    Метрики HTTP запросов: время обработки и размер тела ответа
+
+    Маршрут в метках - шаблон пути (/api/v1/dynamics), а не фактический
+    путь запроса. Результат обращения к кэшу обработчик записывает
+    в request.state.cache_outcome. Middleware подключается последним,
+    чтобы учитывать сжатие и обработку ошибок.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        body_bytes = 0
+
+        async def send_with_metrics(message: Message):
+            nonlocal status, body_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            route = self.route_template(scope)
+            cache = scope.get("state", {}).get("cache_outcome", "none")
+            REQUEST_DURATION.labels(scope["method"], route, str(status), cache).observe(
+                time.perf_counter() - started
+            )
+            RESPONSE_BYTES.labels(scope["method"], route).observe(body_bytes)
+
+    @staticmethod
+    def route_template(scope: Scope) -> str:
+        """Шаблон пути маршрута или unmatched для неизвестных путей"""
+        app = scope.get("app")
+        for route in getattr(app, "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
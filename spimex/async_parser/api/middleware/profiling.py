@@ -0,0 +1,96 @@
+import logging
+import random
+import secrets
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import sys
+from pathlib import Path
+
+async_parser_path = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(async_parser_path))
+
+from config import api_settings as settings
+from ..services.profiling import (
+    install_query_hooks,
+    log_slow_request,
+    start_profile,
+    start_trace,
+    stop_profile,
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запросов: время SQL, преобразования строк, кэша
+    и сериализации
+
+    Подробный профиль (заголовок Server-Timing, запись в журнал, трасса
+    PROFILE_TRACE) снимается для запросов с заголовком X-Profile, равным
+    PROFILE_HEADER_TOKEN, и для доли PROFILE_SAMPLE_RATE остальных.
+    При SLOW_REQUEST_THRESHOLD_MS > 0 облегченный профиль (без трассы)
+    ведется для всех запросов, и медленные пишутся в журнал с SQL
+    и планами выполнения.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        install_query_hooks()
+
+    @staticmethod
+    def enabled() -> bool:
+        """Нужно ли подключать middleware при текущих настройках"""
+        return (
+            bool(settings.PROFILE_HEADER_TOKEN)
+            or settings.PROFILE_SAMPLE_RATE > 0
+            or settings.SLOW_REQUEST_THRESHOLD_MS > 0
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        detailed = (
+            self.requested(scope) or random.random() < settings.PROFILE_SAMPLE_RATE
+        )
+        if not detailed and settings.SLOW_REQUEST_THRESHOLD_MS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        query_string = scope.get("query_string", b"").decode("latin-1")
+        profile = start_profile(scope["method"], scope["path"], query_string)
+        trace = start_trace() if detailed else None
+
+        async def send_with_timing(message: Message):
+            if detailed and message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            trace_path = trace.stop(profile) if trace else None
+            stop_profile(profile)
+            threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+            if threshold > 0 and profile.elapsed() * 1000 >= threshold:
+                log_slow_request(profile)
+            elif detailed:
+                logger.info("Профиль запроса %s", profile.summary())
+            if trace_path:
+                logger.info("Трасса запроса сохранена: %s", trace_path)
+
+    @staticmethod
+    def requested(scope: Scope) -> bool:
+        """Запрошен ли профиль заголовком X-Profile с верным токеном"""
+        token = settings.PROFILE_HEADER_TOKEN
+        if not token:
+            return False
+        value = Headers(scope=scope).get(PROFILE_HEADER)
+        return value is not None and secrets.compare_digest(value, token)
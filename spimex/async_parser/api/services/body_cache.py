@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ResponseBodyCache:
+    """
+    LRU кэш готовых (сериализованных и сжатых) тел ответов в памяти процесса
+
+    Ключ - версия значения в кэше (хэш содержимого) и алгоритм сжатия.
+    Версия меняется вместе с данными, поэтому записи не нужно
+    инвалидировать: старые вытесняются по LRU, когда суммарный размер
+    превышает max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, Optional[str]]]" = (
+            OrderedDict()
+        )
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Optional[str]]]:
+        """
+        Получить тело ответа
+
+        Returns:
+            Кортеж (тело, Content-Encoding или None) или None при промахе
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, body: bytes, content_encoding: Optional[str]):
+        """Сохранить тело ответа, вытеснив самые старые записи"""
+        if len(body) > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous[0])
+
+        self._entries[key] = (body, content_encoding)
+        self._size += len(body)
+
+        while self._size > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кэша тел ответов в процессе"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
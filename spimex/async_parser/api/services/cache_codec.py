@@ -0,0 +1,206 @@
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+# Первый байт закодированного значения, по нему отличаем новый формат
+# от старых значений, сохраненных как обычная JSON-строка
+MAGIC = b"\xc5"
+
+SERIALIZERS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSORS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+COLUMNS_MARKER = "__columns__"
+
+
+def _json_default(value: Any) -> Any:
+    """Сериализация дат в ISO формате, остальное - строкой"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps_json(value: Any) -> bytes:
+    """Быстрая сериализация в JSON (orjson, если установлен)"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default)
+    return json.dumps(value, default=_json_default, ensure_ascii=False).encode()
+
+
+def loads_json(data: bytes) -> Any:
+    """Десериализация JSON (orjson, если установлен)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _to_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Преобразует список однотипных словарей в словарь колонок"""
+    keys = list(rows[0].keys())
+    return {key: [row[key] for row in rows] for key in keys}
+
+
+def _from_columns(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Обратное преобразование словаря колонок в список словарей"""
+    keys = list(columns.keys())
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def _is_table(value: Any) -> bool:
+    """Список словарей с одинаковым набором ключей"""
+    if not isinstance(value, list) or len(value) < 2:
+        return False
+    if not all(isinstance(row, dict) for row in value):
+        return False
+    keys = value[0].keys()
+    return all(row.keys() == keys for row in value)
+
+
+class CacheCodec:
+    """
+    Кодек значений кэша
+
+    Формат: MAGIC + id сериализатора + id компрессора + данные.
+    Списки однотипных записей верхнего уровня хранятся по колонкам
+    (имена полей не повторяются в каждой строке), данные больше
+    порога сжимаются.
+    """
+
+    def __init__(
+        self,
+        serializer: str = "orjson",
+        compression: str = "zstd",
+        threshold: int = 4096,
+        columnar: bool = True,
+    ):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Неизвестный сериализатор кэша: {serializer}")
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Неизвестный алгоритм сжатия кэша: {compression}")
+
+        if serializer == "orjson" and orjson is None:
+            serializer = "json"
+        if serializer == "msgpack" and msgpack is None:
+            serializer = "json"
+        if compression == "zstd" and zstandard is None:
+            compression = "zlib"
+        if compression == "lz4" and lz4_frame is None:
+            compression = "zlib"
+
+        self.serializer = serializer
+        self.compression = compression
+        self.threshold = threshold
+        self.columnar = columnar
+
+        self._zstd_compressor = (
+            zstandard.ZstdCompressor(level=3) if compression == "zstd" else None
+        )
+        self._zstd_decompressor = (
+            zstandard.ZstdDecompressor() if zstandard is not None else None
+        )
+
+    def encode(self, value: Any) -> bytes:
+        """
+        Закодировать значение для записи в Redis
+
+        Args:
+            value: Значение для сохранения
+
+        Returns:
+            Закодированные байты
+        """
+        if self.columnar and isinstance(value, dict):
+            value = {
+                key: {COLUMNS_MARKER: _to_columns(item)} if _is_table(item) else item
+                for key, item in value.items()
+            }
+
+        payload = self._serialize(value)
+
+        compression = "none"
+        if len(payload) >= self.threshold and self.compression != "none":
+            payload = self._compress(payload)
+            compression = self.compression
+
+        header = MAGIC + bytes(
+            (SERIALIZERS[self.serializer], COMPRESSORS[compression])
+        )
+        return header + payload
+
+    def decode(self, data: bytes) -> Any:
+        """
+        Декодировать значение, прочитанное из Redis
+
+        Args:
+            data: Байты из Redis
+
+        Returns:
+            Исходное значение
+        """
+        if not data.startswith(MAGIC):
+            return json.loads(data)
+
+        serializer_id, compressor_id = data[1], data[2]
+        payload = self._decompress(compressor_id, data[3:])
+        value = self._deserialize(serializer_id, payload)
+
+        if isinstance(value, dict):
+            value = {
+                key: (
+                    _from_columns(item[COLUMNS_MARKER])
+                    if isinstance(item, dict) and COLUMNS_MARKER in item
+                    else item
+                )
+                for key, item in value.items()
+            }
+        return value
+
+    def _serialize(self, value: Any) -> bytes:
+        if self.serializer == "msgpack":
+            return msgpack.packb(value, default=_json_default, use_bin_type=True)
+        if self.serializer == "orjson":
+            return orjson.dumps(value, default=_json_default)
+        return json.dumps(value, default=_json_default, ensure_ascii=False).encode()
+
+    @staticmethod
+    def _deserialize(serializer_id: int, payload: bytes) -> Any:
+        if serializer_id == SERIALIZERS["msgpack"]:
+            return msgpack.unpackb(payload, raw=False)
+        return loads_json(payload)
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == "zstd":
+            return self._zstd_compressor.compress(payload)
+        if self.compression == "lz4":
+            return lz4_frame.compress(payload)
+        return zlib.compress(payload, 6)
+
+    def _decompress(self, compressor_id: int, payload: bytes) -> bytes:
+        if compressor_id == COMPRESSORS["zstd"]:
+            return self._zstd_decompressor.decompress(payload)
+        if compressor_id == COMPRESSORS["lz4"]:
+            return lz4_frame.decompress(payload)
+        if compressor_id == COMPRESSORS["zlib"]:
+            return zlib.decompress(payload)
+        return payload
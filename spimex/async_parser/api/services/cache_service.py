@@ -1,6 +1,9 @@
-import json
+import time as time_module
 import asyncio
-from typing import Optional, Dict, Any
+import hashlib
+import struct
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
 from datetime import datetime, time, timedelta
 import redis.asyncio as aioredis
 from redis.asyncio import Redis
@@ -12,34 +15,80 @@ async_parser_path = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(async_parser_path))
 
 from config import api_settings as settings
+from .cache_codec import CacheCodec
+from .profiling import profile_phase
+
+# Заголовок значения в Redis: формат, время "мягкого" устаревания (unix time)
+# и хэш закодированного значения - версия значения, из которой строится ETag
+ENVELOPE = struct.Struct(">Bd8s")
+ENVELOPE_FORMAT = 2
 
 
 class CacheService:
-    """Сервис для работы с Redis кэшем с автосбросом в 14:11"""
+    """
+    Сервис для работы с Redis кэшем с автосбросом в 14:11
+
+    Ключи вида ``<namespace>:<suffix>`` хранятся в Redis как
+    ``<prefix>:<namespace>:v<generation>:<suffix>``. Инвалидация пространства
+    имен сводится к инкременту его поколения (O(1)), старые ключи
+    перестают читаться и удаляются Redis по TTL.
+
+    Счетчики попаданий/промахов копятся в процессе и периодически
+    сбрасываются в Redis (HINCRBY), поэтому статистика общая для всех
+    воркеров API.
+
+    В режиме stale-while-revalidate (CACHE_SWR_ENABLED) значение хранится
+    дольше своего "мягкого" TTL: после его истечения, а также после смены
+    поколения плановым автосбросом, вызывающий сразу получает устаревшее
+    значение, а обновление выполняется фоновой задачей. После явной
+    инвалидации значения прошлого поколения не отдаются.
+    """
+
+    NAMESPACES = ("last_trading_dates", "dynamics", "trading_results", "aggregates")
+    INVALIDATION_MODES = ("generation", "unlink")
 
     def __init__(self):
         self.redis: Optional[Redis] = None
         self.cache_reset_time = time(14, 11)
+        self.key_prefix = settings.CACHE_KEY_PREFIX
+        self.codec = CacheCodec(
+            serializer=settings.CACHE_CODEC,
+            compression=settings.CACHE_COMPRESSION,
+            threshold=settings.CACHE_COMPRESSION_THRESHOLD,
+            columnar=settings.CACHE_COLUMNAR,
+        )
         self._reset_task: Optional[asyncio.Task] = None
-        self._stats = {"hits": 0, "misses": 0}
+        self._metrics: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self._metrics_task: Optional[asyncio.Task] = None
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self._memory_stats: Optional[Tuple[Dict[str, Dict[str, Any]], float]] = None
 
     async def init_redis(self):
         """Инициализация подключения к Redis"""
         try:
-            self.redis = aioredis.from_url(
+            pool = aioredis.BlockingConnectionPool.from_url(
                 settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True,
+                password=settings.REDIS_PASSWORD or None,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+                decode_responses=False,
                 socket_connect_timeout=5,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
                 socket_keepalive=True,
                 socket_keepalive_options={},
                 health_check_interval=30,
             )
+            self.redis = Redis(connection_pool=pool)
 
             await self.redis.ping()
             print("✅ Redis подключен успешно")
 
             self._reset_task = asyncio.create_task(self._schedule_cache_reset())
+            self._metrics_task = asyncio.create_task(self._schedule_metrics_flush())
 
         except Exception as e:
             print(f"❌ Ошибка подключения к Redis: {e}")
@@ -47,14 +96,20 @@ class CacheService:
 
     async def close(self):
         """Закрытие подключения к Redis"""
-        if self._reset_task:
-            self._reset_task.cancel()
-            try:
-                await self._reset_task
-            except asyncio.CancelledError:
-                pass
+        for task in (
+            self._reset_task,
+            self._metrics_task,
+            *self._refresh_tasks.values(),
+        ):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
 
         if self.redis:
+            await self.flush_metrics()
             await self.redis.close()
 
     async def ping(self) -> bool:
@@ -81,17 +136,18 @@ class CacheService:
             if not self.redis:
                 return None
 
-            cached_data = await self.redis.get(key)
-            if cached_data:
-                self._stats["hits"] += 1
-                return json.loads(cached_data)
+            cached_data = await self.redis.get(await self._resolve_key(key))
+            decoded = self._decode(cached_data) if cached_data else None
+            if decoded:
+                self._record(key, hits=1)
+                return decoded[0]
             else:
-                self._stats["misses"] += 1
+                self._record(key, misses=1)
                 return None
 
         except Exception as e:
             print(f"❌ Ошибка получения из кэша {key}: {e}")
-            self._stats["misses"] += 1
+            self._record(key, misses=1, errors=1)
             return None
 
     async def set(
@@ -108,6 +164,381 @@ class CacheService:
         Returns:
             True если успешно сохранено
         """
+        return await self._store(key, value, ttl) is not None
+
+    async def _store(
+        self, key: str, value: Dict[str, Any], ttl: Optional[int]
+    ) -> Optional[str]:
+        """
+        Сохранить значение в кэш
+
+        Returns:
+            Версия сохраненного значения или None при ошибке
+        """
+        try:
+            if not self.redis:
+                return None
+
+            if ttl is None:
+                ttl = self._calculate_ttl_until_reset()
+
+            started = time_module.perf_counter()
+            data, ttl = self._encode(value, ttl)
+            redis_key = await self._resolve_key(key)
+            with profile_phase("redis"):
+                await self.redis.setex(redis_key, ttl, data)
+            self._record(
+                key,
+                sets=1,
+                set_seconds=time_module.perf_counter() - started,
+                set_bytes=len(data),
+            )
+            return self._unpack(data)[1]
+
+        except Exception as e:
+            print(f"❌ Ошибка сохранения в кэш {key}: {e}")
+            self._record(key, errors=1)
+            return None
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: Optional[int] = None,
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Получить значение из кэша или вычислить и сохранить его
+
+        Одновременные промахи по одному ключу в процессе объединяются
+        в один вызов loader. В режиме SWR устаревшее значение отдается
+        сразу, а обновление запускается в фоне.
+
+        Args:
+            key: Ключ кэша
+            loader: Корутина-функция, вычисляющая значение
+            ttl: Время жизни в секундах (если не указано, кэш будет сброшен в 14:11)
+
+        Returns:
+            Кортеж (значение, исход: hit, stale или miss)
+        """
+        value, outcome, _ = await self.get_or_set_with_version(key, loader, ttl)
+        return value, outcome
+
+    async def get_or_set_with_version(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: Optional[int] = None,
+    ) -> Tuple[Dict[str, Any], str, Optional[str]]:
+        """
+        То же, что get_or_set, но вместе с версией значения (см. version)
+
+        Returns:
+            Кортеж (значение, исход, версия или None, если значение
+            не удалось сохранить в Redis)
+        """
+        cached = await self._lookup(key)
+        if cached is not None:
+            value, is_stale, version = cached
+            if is_stale:
+                self.schedule_refresh(key, loader, ttl)
+                return value, "stale", version
+            return value, "hit", version
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                value, version = await asyncio.shield(inflight)
+                return value, "miss", version
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+            # лидер отменен - значение вычисляет один из ожидавших
+            return await self.get_or_set_with_version(key, loader, ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            version = await self._store(key, value, ttl)
+            future.set_result((value, version))
+        except Exception as e:
+            future.set_exception(e)
+            # помечаем исключение полученным, чтобы asyncio не писал
+            # предупреждение, если других ожидающих нет
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            # лидер отменен (отключение клиента, остановка): ожидающие
+            # не должны ждать future бесконечно
+            if not future.done():
+                future.cancel()
+
+        return value, "miss", version
+
+    async def _lookup(
+        self, key: str
+    ) -> Optional[Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """
+        Найти значение с учетом режима SWR
+
+        Args:
+            key: Ключ кэша
+
+        Returns:
+            Кортеж (значение, устарело ли оно, версия) или None при промахе
+        """
+        try:
+            if not self.redis:
+                return None
+
+            redis_key = await self._resolve_key(key)
+            with profile_phase("redis"):
+                cached_data = await self.redis.get(redis_key)
+
+            if not cached_data and settings.CACHE_SWR_ENABLED:
+                previous_key = (await self._previous_keys([key])).get(key)
+                if previous_key:
+                    previous = await self.redis.get(previous_key)
+                    if previous:
+                        return self._unwrap(key, previous, stale=True)
+
+            return self._unwrap(key, cached_data)
+
+        except Exception as e:
+            print(f"❌ Ошибка получения из кэша {key}: {e}")
+            self._record(key, misses=1, errors=1)
+            return None
+
+    async def _previous_keys(self, keys: List[str]) -> Dict[str, str]:
+        """
+        Ключи Redis предыдущего поколения для промахов
+
+        После планового автосброса значения предыдущего поколения
+        отдаются устаревшими; после явной инвалидации - нет.
+
+        Returns:
+            Словарь {ключ кэша: ключ Redis предыдущего поколения}
+        """
+        result = {}
+        for namespace in {key.partition(":")[0] for key in keys}:
+            generation = await self._get_generation(namespace)
+            stale_ok = await self.redis.get(self._stale_generation_key(namespace))
+            if generation == 0 or not stale_ok or int(stale_ok) != generation:
+                continue
+            for key in keys:
+                key_namespace, _, suffix = key.partition(":")
+                if key_namespace == namespace:
+                    result[key] = (
+                        f"{self.key_prefix}:{namespace}:v{generation - 1}:{suffix}"
+                    )
+        return result
+
+    def _unwrap(
+        self, key: str, cached_data: Optional[bytes], stale: bool = False
+    ) -> Optional[Tuple[Dict[str, Any], bool, str]]:
+        """
+        Декодировать найденное значение и учесть исход в статистике
+
+        Args:
+            key: Ключ кэша
+            cached_data: Данные из Redis или None при промахе
+            stale: Значение предыдущего поколения (устарело независимо
+                от времени мягкого устаревания)
+
+        Returns:
+            Кортеж (значение, устарело ли оно, версия) или None при промахе
+        """
+        decoded = self._decode(cached_data) if cached_data else None
+        if not decoded:
+            self._record(key, misses=1)
+            return None
+
+        value, soft_deadline, version = decoded
+        if stale or (
+            settings.CACHE_SWR_ENABLED and time_module.time() >= soft_deadline
+        ):
+            self._record(key, stale=1)
+            return value, True, version
+
+        self._record(key, hits=1)
+        return value, False, version
+
+    def schedule_refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: Optional[int],
+    ):
+        """Запустить фоновое обновление ключа, если оно еще не запущено"""
+        if key in self._refresh_tasks:
+            return
+
+        task = asyncio.create_task(self._refresh(key, loader, ttl))
+        self._refresh_tasks[key] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+
+    async def _refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: Optional[int],
+    ):
+        """
+        Фоновое обновление значения
+
+        Блокировка в Redis (SET NX) гарантирует, что ключ обновляет
+        только один воркер.
+        """
+        lock_key = f"{self.key_prefix}:lock:{await self._resolve_key(key)}"
+        try:
+            acquired = await self.redis.set(
+                lock_key, b"1", nx=True, ex=settings.CACHE_REFRESH_LOCK_TTL
+            )
+            if not acquired:
+                return
+
+            try:
+                value = await loader()
+                await self.set(key, value, ttl)
+                self._record(key, refreshes=1)
+            finally:
+                await self.redis.delete(lock_key)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Ошибка фонового обновления кэша {key}: {e}")
+            self._record(key, errors=1)
+
+    def _encode(self, value: Dict[str, Any], ttl: int) -> Tuple[bytes, int]:
+        """
+        Закодировать значение вместе с временем мягкого устаревания
+
+        Args:
+            value: Значение для сохранения
+            ttl: Время жизни в секундах
+
+        Returns:
+            Кортеж (данные для Redis, TTL ключа в Redis)
+        """
+        soft_ttl = min(settings.CACHE_SOFT_TTL, ttl)
+        hard_ttl = ttl
+        if settings.CACHE_SWR_ENABLED:
+            hard_ttl = ttl + settings.CACHE_STALE_TTL
+        else:
+            soft_ttl = ttl
+
+        with profile_phase("cache_encode"):
+            payload = self.codec.encode(value)
+        digest = hashlib.blake2b(payload, digest_size=8).digest()
+        envelope = ENVELOPE.pack(ENVELOPE_FORMAT, time_module.time() + soft_ttl, digest)
+        return envelope + payload, hard_ttl
+
+    def _unpack(self, data: bytes) -> Optional[Tuple[float, str]]:
+        """
+        Прочитать заголовок значения из Redis
+
+        Returns:
+            Кортеж (время мягкого устаревания, версия значения) или None,
+            если значение записано в другом формате (считается промахом)
+        """
+        if len(data) < ENVELOPE.size or data[0] != ENVELOPE_FORMAT:
+            return None
+        _, soft_deadline, digest = ENVELOPE.unpack_from(data)
+        return soft_deadline, digest.hex()
+
+    def _decode(self, data: bytes) -> Optional[Tuple[Dict[str, Any], float, str]]:
+        """
+        Декодировать значение из Redis
+
+        Returns:
+            Кортеж (значение, время мягкого устаревания, версия значения)
+            или None, если значение записано в другом формате
+        """
+        header = self._unpack(data)
+        if header is None:
+            return None
+        with profile_phase("cache_decode"):
+            value = self.codec.decode(data[ENVELOPE.size:])
+        return (value, *header)
+
+    async def mget(
+        self, keys: List[str]
+    ) -> Dict[str, Optional[Tuple[Dict[str, Any], bool]]]:
+        """
+        Получить несколько значений из кэша за один запрос MGET
+
+        Значения ищутся так же, как в get_or_set: в режиме SWR значение
+        после мягкого TTL, а после планового автосброса и значение
+        предыдущего поколения (вторым MGET), возвращаются устаревшими.
+        Их фоновое обновление запускает вызывающий (schedule_refresh).
+
+        Args:
+            keys: Ключи кэша
+
+        Returns:
+            Словарь {ключ: (значение, устарело ли оно) или None при промахе}
+        """
+        if not keys:
+            return {}
+
+        try:
+            if not self.redis:
+                return {key: None for key in keys}
+
+            resolved = await self._resolve_keys(keys)
+            with profile_phase("redis"):
+                cached_values = await self.redis.mget(resolved)
+            found = dict(zip(keys, cached_values))
+
+            previous: Dict[str, bytes] = {}
+            missing = [key for key, cached_data in found.items() if not cached_data]
+            if missing and settings.CACHE_SWR_ENABLED:
+                previous_keys = await self._previous_keys(missing)
+                if previous_keys:
+                    with profile_phase("redis"):
+                        previous_values = await self.redis.mget(
+                            list(previous_keys.values())
+                        )
+                    previous = {
+                        key: cached_data
+                        for key, cached_data in zip(previous_keys, previous_values)
+                        if cached_data
+                    }
+
+            result = {}
+            for key, cached_data in found.items():
+                if key in previous:
+                    entry = self._unwrap(key, previous[key], stale=True)
+                else:
+                    entry = self._unwrap(key, cached_data)
+                result[key] = entry[:2] if entry else None
+            return result
+
+        except Exception as e:
+            print(f"❌ Ошибка пакетного получения из кэша: {e}")
+            for key in keys:
+                self._record(key, misses=1, errors=1)
+            return {key: None for key in keys}
+
+    async def mset(
+        self, items: Dict[str, Dict[str, Any]], ttl: Optional[int] = None
+    ) -> bool:
+        """
+        Сохранить несколько значений в кэш одним конвейером (pipeline)
+
+        Args:
+            items: Словарь {ключ: значение}
+            ttl: Время жизни в секундах (если не указано, кэш будет сброшен в 14:11)
+
+        Returns:
+            True если успешно сохранено
+        """
+        if not items:
+            return True
+
         try:
             if not self.redis:
                 return False
@@ -115,12 +546,25 @@ class CacheService:
             if ttl is None:
                 ttl = self._calculate_ttl_until_reset()
 
-            json_data = json.dumps(value, default=str, ensure_ascii=False)
-            await self.redis.setex(key, ttl, json_data)
+            started = time_module.perf_counter()
+            keys = list(items.keys())
+            resolved = await self._resolve_keys(keys)
+            encoded = [self._encode(items[key], ttl) for key in keys]
+
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for redis_key, (data, hard_ttl) in zip(resolved, encoded):
+                    pipe.setex(redis_key, hard_ttl, data)
+                await pipe.execute()
+
+            elapsed = (time_module.perf_counter() - started) / len(keys)
+            for key, (data, _) in zip(keys, encoded):
+                self._record(key, sets=1, set_seconds=elapsed, set_bytes=len(data))
             return True
 
         except Exception as e:
-            print(f"❌ Ошибка сохранения в кэш {key}: {e}")
+            print(f"❌ Ошибка пакетного сохранения в кэш: {e}")
+            for key in items:
+                self._record(key, errors=1)
             return False
 
     async def delete(self, key: str) -> bool:
@@ -137,7 +581,7 @@ class CacheService:
             if not self.redis:
                 return False
 
-            result = await self.redis.delete(key)
+            result = await self.redis.delete(await self._resolve_key(key))
             return result > 0
 
         except Exception as e:
@@ -146,26 +590,218 @@ class CacheService:
 
     async def clear_all(self) -> bool:
         """
-        Очистить весь кэш
+        Очистить весь кэш сервиса (без затрагивания чужих ключей в БД Redis)
 
         Returns:
             True если очищен успешно
         """
+        return await self.invalidate() is not None
+
+    async def invalidate(
+        self,
+        namespace: Optional[str] = None,
+        mode: str = "generation",
+        serve_stale: bool = False,
+    ) -> Optional[Dict[str, int]]:
+        """
+        Инвалидировать пространство имен кэша
+
+        Args:
+            namespace: Пространство имен (dynamics, trading_results, ...);
+                если не указано - все пространства сервиса
+            mode: generation - инкремент поколения ключей (O(1)),
+                unlink - неблокирующее удаление ключей через SCAN + UNLINK
+            serve_stale: Разрешить в режиме SWR отдавать значения
+                предыдущего поколения как устаревшие до их обновления
+                (плановый автосброс). Явная инвалидация (очистка кэша,
+                новая торговая дата) старые данные не отдает
+
+        Returns:
+            Количество удаленных ключей по пространствам имен или None при ошибке
+        """
+        if mode not in self.INVALIDATION_MODES:
+            raise ValueError(f"Неизвестный режим инвалидации: {mode}")
+
+        namespaces = [namespace] if namespace else list(self.NAMESPACES)
+
+        try:
+            if not self.redis:
+                return None
+
+            removed = {}
+            if mode == "generation":
+                # Поколение и запрет на значения предыдущего поколения
+                # меняются атомарно; разрешение ставится уже после инкремента
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    for ns in namespaces:
+                        pipe.incr(self._generation_key(ns))
+                        pipe.delete(self._stale_generation_key(ns))
+                    generations = (await pipe.execute())[::2]
+
+                if serve_stale and settings.CACHE_SWR_ENABLED:
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        for ns, generation in zip(namespaces, generations):
+                            pipe.set(self._stale_generation_key(ns), generation)
+                        await pipe.execute()
+
+                now = time_module.monotonic()
+                for ns, generation in zip(namespaces, generations):
+                    self._generations[ns] = (int(generation), now)
+                    removed[ns] = 0
+                    self._record(ns, invalidations=1)
+            else:
+                for ns in namespaces:
+                    removed[ns] = await self._unlink_namespace(ns)
+                    self._record(ns, invalidations=1, unlinked_keys=removed[ns])
+
+            print(f"🗑️ Кэш инвалидирован ({mode}): {', '.join(namespaces)}")
+            return removed
+
+        except Exception as e:
+            print(f"❌ Ошибка очистки кэша: {e}")
+            return None
+
+    async def invalidate_once(
+        self, token: str, namespace: Optional[str] = None, serve_stale: bool = False
+    ) -> bool:
+        """
+        Инвалидировать кэш один раз на событие для всех воркеров
+
+        Событие (например, уведомление о новой торговой дате) получает
+        каждый воркер; поколение увеличивает только тот, кто первым
+        занял ключ token в Redis (SET NX).
+
+        Args:
+            token: Идентификатор события
+            namespace: Пространство имен; если не указано - все
+            serve_stale: См. invalidate
+
+        Returns:
+            True если инвалидацию выполнил этот воркер
+        """
         try:
             if not self.redis:
                 return False
 
-            await self.redis.flushdb()
-            print("🗑️ Кэш полностью очищен")
-            return True
+            acquired = await self.redis.set(
+                f"{self.key_prefix}:once:{token}",
+                b"1",
+                nx=True,
+                ex=settings.CACHE_REFRESH_LOCK_TTL,
+            )
+            if not acquired:
+                return False
+
+            return (
+                await self.invalidate(namespace, serve_stale=serve_stale) is not None
+            )
 
         except Exception as e:
             print(f"❌ Ошибка очистки кэша: {e}")
             return False
 
+    async def _unlink_namespace(self, namespace: str) -> int:
+        """
+        Удалить все ключи пространства имен пачками без блокировки Redis
+
+        Args:
+            namespace: Пространство имен
+
+        Returns:
+            Количество удаленных ключей
+        """
+        removed = 0
+        batch: List[str] = []
+
+        async for key in self.redis.scan_iter(
+            match=f"{self.key_prefix}:{namespace}:*",
+            count=settings.CACHE_SCAN_BATCH_SIZE,
+        ):
+            batch.append(key)
+            if len(batch) >= settings.CACHE_SCAN_BATCH_SIZE:
+                removed += await self.redis.unlink(*batch)
+                batch = []
+
+        if batch:
+            removed += await self.redis.unlink(*batch)
+
+        return removed
+
+    def _generation_key(self, namespace: str) -> str:
+        """Ключ счетчика поколений пространства имен"""
+        return f"{self.key_prefix}:ns:{namespace}:gen"
+
+    def _stale_generation_key(self, namespace: str) -> str:
+        """
+        Ключ поколения, для которого разрешено отдавать значения
+        предыдущего поколения (ставится только плановым автосбросом)
+        """
+        return f"{self.key_prefix}:ns:{namespace}:stale_ok"
+
+    async def _get_generation(self, namespace: str) -> int:
+        """
+        Получить текущее поколение пространства имен
+
+        Значение кэшируется в процессе на CACHE_GENERATION_TTL секунд,
+        чтобы не делать лишний запрос в Redis на каждое чтение.
+        """
+        cached = self._generations.get(namespace)
+        now = time_module.monotonic()
+        if cached and now - cached[1] < settings.CACHE_GENERATION_TTL:
+            return cached[0]
+
+        value = await self.redis.get(self._generation_key(namespace))
+        generation = int(value) if value else 0
+        self._generations[namespace] = (generation, now)
+        return generation
+
+    async def _resolve_key(self, key: str) -> str:
+        """
+        Преобразовать логический ключ в физический ключ Redis
+
+        Args:
+            key: Ключ вида ``<namespace>:<suffix>``
+
+        Returns:
+            Ключ вида ``<prefix>:<namespace>:v<generation>:<suffix>``
+        """
+        namespace, _, suffix = key.partition(":")
+        generation = await self._get_generation(namespace)
+        return f"{self.key_prefix}:{namespace}:v{generation}:{suffix}"
+
+    async def _resolve_keys(self, keys: List[str]) -> List[str]:
+        """
+        Преобразовать несколько логических ключей в ключи Redis
+
+        Поколения пространств имен, которых нет в локальном кэше,
+        запрашиваются одним MGET.
+        """
+        now = time_module.monotonic()
+        namespaces = {key.partition(":")[0] for key in keys}
+        stale = [
+            ns
+            for ns in namespaces
+            if ns not in self._generations
+            or now - self._generations[ns][1] >= settings.CACHE_GENERATION_TTL
+        ]
+
+        if stale:
+            values = await self.redis.mget(
+                [self._generation_key(ns) for ns in stale]
+            )
+            for ns, value in zip(stale, values):
+                self._generations[ns] = (int(value) if value else 0, now)
+
+        resolved = []
+        for key in keys:
+            namespace, _, suffix = key.partition(":")
+            generation = self._generations[namespace][0]
+            resolved.append(f"{self.key_prefix}:{namespace}:v{generation}:{suffix}")
+        return resolved
+
     async def get_stats(self) -> Dict[str, Any]:
         """
-        Получить статистику кэша
+        Получить статистику кэша (агрегированную по всем воркерам)
 
         Returns:
             Словарь со статистикой
@@ -176,27 +812,31 @@ class CacheService:
                     "status": "disconnected",
                     "total_keys": 0,
                     "memory_usage": "0B",
-                    "hits": self._stats["hits"],
-                    "misses": self._stats["misses"],
+                    "hits": 0,
+                    "misses": 0,
                     "hit_rate": 0.0,
                     "expires_at": None,
                 }
 
-            info = await self.redis.info()
+            await self.flush_metrics()
 
-            db_info = await self.redis.info("keyspace")
-            total_keys = 0
-            if "db0" in db_info:
-                keys_info = db_info["db0"]
-                if "keys" in keys_info:
-                    total_keys = keys_info["keys"]
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.info()
+                for namespace in self.NAMESPACES:
+                    pipe.hgetall(self._metrics_key(namespace))
+                info, *raw_metrics = await pipe.execute()
 
-            total_requests = self._stats["hits"] + self._stats["misses"]
-            hit_rate = (
-                (self._stats["hits"] / total_requests * 100)
-                if total_requests > 0
-                else 0.0
-            )
+            db_name = f"db{self.redis.connection_pool.connection_kwargs.get('db', 0)}"
+            total_keys = info.get(db_name, {}).get("keys", 0)
+
+            metrics = self._parse_metrics(raw_metrics)
+            namespaces = await self._namespace_memory_stats()
+            for namespace, values in metrics.items():
+                namespaces.setdefault(namespace, {}).update(values)
+
+            hits = sum(values["hits"] for values in metrics.values())
+            misses = sum(values["misses"] for values in metrics.values())
+            stale = sum(values["stale"] for values in metrics.values())
 
             next_reset = self._get_next_reset_time()
 
@@ -204,12 +844,22 @@ class CacheService:
                 "status": "connected",
                 "total_keys": total_keys,
                 "memory_usage": self._format_bytes(info.get("used_memory", 0)),
-                "hits": self._stats["hits"],
-                "misses": self._stats["misses"],
-                "hit_rate": round(hit_rate, 2),
+                "hits": hits,
+                "misses": misses,
+                "stale": stale,
+                "hit_rate": self._hit_rate(hits + stale, misses),
                 "expires_at": next_reset.isoformat() if next_reset else None,
                 "redis_version": info.get("redis_version", "unknown"),
                 "uptime_in_seconds": info.get("uptime_in_seconds", 0),
+                "evicted_keys": info.get("evicted_keys", 0),
+                "expired_keys": info.get("expired_keys", 0),
+                "codec": {
+                    "serializer": self.codec.serializer,
+                    "compression": self.codec.compression,
+                    "compression_threshold": self.codec.threshold,
+                    "columnar": self.codec.columnar,
+                },
+                "namespaces": namespaces,
             }
 
         except Exception as e:
@@ -217,11 +867,216 @@ class CacheService:
             return {
                 "status": "error",
                 "error": str(e),
-                "hits": self._stats["hits"],
-                "misses": self._stats["misses"],
+                "hits": 0,
+                "misses": 0,
                 "hit_rate": 0.0,
             }
 
+    def _record(self, key: str, **values: float):
+        """
+        Учесть метрики операции в локальном буфере
+
+        Args:
+            key: Ключ кэша или пространство имен
+            **values: Приращения счетчиков (hits, misses, sets, ...)
+        """
+        namespace = key.partition(":")[0]
+        metrics = self._metrics[namespace]
+        for field, value in values.items():
+            metrics[field] += value
+
+    def _metrics_key(self, namespace: str) -> str:
+        """Ключ хэша с метриками пространства имен"""
+        return f"{self.key_prefix}:metrics:{namespace}"
+
+    async def flush_metrics(self):
+        """
+        Сбросить накопленные в процессе метрики в Redis
+
+        Приращения отправляются одной транзакцией (MULTI/EXEC): при ошибке
+        Redis не применяется ни одно, и буфер возвращается в локальные
+        счетчики до следующего сброса.
+        """
+        if not self.redis or not self._metrics:
+            return
+
+        buffered, self._metrics = self._metrics, defaultdict(
+            lambda: defaultdict(float)
+        )
+
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for namespace, values in buffered.items():
+                    metrics_key = self._metrics_key(namespace)
+                    for field, value in values.items():
+                        if float(value).is_integer():
+                            pipe.hincrby(metrics_key, field, int(value))
+                        else:
+                            pipe.hincrbyfloat(metrics_key, field, value)
+                await pipe.execute()
+        except Exception as e:
+            print(f"❌ Ошибка сохранения метрик кэша: {e}")
+            for namespace, values in buffered.items():
+                for field, value in values.items():
+                    self._metrics[namespace][field] += value
+
+    def _parse_metrics(
+        self, raw_metrics: List[Dict[bytes, bytes]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Разобрать хэши метрик всех воркеров, прочитанные из Redis
+
+        Args:
+            raw_metrics: Результаты HGETALL в порядке NAMESPACES
+
+        Returns:
+            Словарь {namespace: метрики}
+        """
+        metrics = {}
+        for namespace, raw in zip(self.NAMESPACES, raw_metrics):
+            values = {
+                field.decode(): float(value) for field, value in raw.items()
+            }
+            hits = int(values.get("hits", 0))
+            misses = int(values.get("misses", 0))
+            stale = int(values.get("stale", 0))
+            sets = int(values.get("sets", 0))
+
+            metrics[namespace] = {
+                "hits": hits,
+                "misses": misses,
+                "stale": stale,
+                "refreshes": int(values.get("refreshes", 0)),
+                "hit_rate": self._hit_rate(hits + stale, misses),
+                "errors": int(values.get("errors", 0)),
+                "sets": sets,
+                "avg_set_latency_ms": (
+                    round(values.get("set_seconds", 0) / sets * 1000, 3)
+                    if sets
+                    else 0.0
+                ),
+                "avg_payload_size": self._format_bytes(
+                    values.get("set_bytes", 0) / sets if sets else 0
+                ),
+                "invalidations": int(values.get("invalidations", 0)),
+                "unlinked_keys": int(values.get("unlinked_keys", 0)),
+            }
+
+        return metrics
+
+    async def _schedule_metrics_flush(self):
+        """Периодический сброс метрик кэша в Redis"""
+        while True:
+            try:
+                await asyncio.sleep(settings.CACHE_METRICS_FLUSH_INTERVAL)
+                await self.flush_metrics()
+            except asyncio.CancelledError:
+                break
+
+    @staticmethod
+    def _hit_rate(hits: int, misses: int) -> float:
+        """Процент попаданий в кэш"""
+        total_requests = hits + misses
+        return round(hits / total_requests * 100, 2) if total_requests else 0.0
+
+    async def _namespace_memory_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Оценить расход памяти Redis на ключ по пространствам имен
+
+        По каждому пространству имен берется выборка из
+        CACHE_STATS_SAMPLE_SIZE ключей текущего поколения,
+        для которых запрашивается MEMORY USAGE. SCAN ограничен
+        CACHE_STATS_SCAN_LIMIT вызовами, чтобы выборка не обходила весь
+        keyspace, а результат кэшируется в процессе на
+        CACHE_STATS_MEMORY_TTL секунд.
+
+        Returns:
+            Словарь {namespace: статистика по выборке}
+        """
+        if self._memory_stats is not None:
+            cached, measured_at = self._memory_stats
+            if time_module.monotonic() - measured_at < settings.CACHE_STATS_MEMORY_TTL:
+                return {namespace: dict(values) for namespace, values in cached.items()}
+
+        stats = {}
+        sample_size = settings.CACHE_STATS_SAMPLE_SIZE
+
+        for namespace in self.NAMESPACES:
+            generation = await self._get_generation(namespace)
+            keys = []
+            cursor = 0
+            for _ in range(settings.CACHE_STATS_SCAN_LIMIT):
+                cursor, batch = await self.redis.scan(
+                    cursor,
+                    match=f"{self.key_prefix}:{namespace}:v{generation}:*",
+                    count=settings.CACHE_SCAN_BATCH_SIZE,
+                )
+                keys.extend(batch)
+                if not cursor or len(keys) >= sample_size:
+                    break
+            keys = keys[:sample_size]
+
+            sizes = []
+            if keys:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.memory_usage(key)
+                    sizes = [size for size in await pipe.execute() if size]
+
+            stats[namespace] = {
+                "generation": generation,
+                "sampled_keys": len(keys),
+                "avg_key_memory": self._format_bytes(
+                    sum(sizes) / len(sizes) if sizes else 0
+                ),
+                "max_key_memory": self._format_bytes(max(sizes) if sizes else 0),
+            }
+
+        self._memory_stats = (stats, time_module.monotonic())
+        return {namespace: dict(values) for namespace, values in stats.items()}
+
+    async def version(self, key: str) -> Optional[str]:
+        """
+        Версия свежего значения по ключу кэша без чтения самого значения
+
+        Версия - хэш закодированного значения из заголовка записи
+        (GETRANGE читает только заголовок), поэтому она меняется вместе
+        с содержимым, а не с поколением или временем записи.
+
+        Args:
+            key: Ключ кэша
+
+        Returns:
+            Версия или None при промахе, недоступном Redis и (в режиме SWR)
+            устаревшем значении - его обновление запускает get_or_set
+        """
+        try:
+            if not self.redis:
+                return None
+
+            redis_key = await self._resolve_key(key)
+            with profile_phase("redis"):
+                header = await self.redis.getrange(redis_key, 0, ENVELOPE.size - 1)
+            unpacked = self._unpack(header) if header else None
+            if not unpacked:
+                return None
+
+            soft_deadline, version = unpacked
+            if settings.CACHE_SWR_ENABLED and time_module.time() >= soft_deadline:
+                return None
+            return version
+
+        except Exception as e:
+            print(f"❌ Ошибка получения версии значения кэша {key}: {e}")
+            return None
+
+    def seconds_until_reset(self) -> int:
+        """Количество секунд до следующего автосброса кэша"""
+        next_reset = self._get_next_reset_time()
+        if not next_reset:
+            return 0
+        return max(int((next_reset - datetime.now()).total_seconds()), 0)
+
     def _calculate_ttl_until_reset(self) -> int:
         """
         Рассчитать TTL до следующего сброса кэша в 14:11
@@ -274,7 +1129,10 @@ class CacheService:
                     )
                     await asyncio.sleep(sleep_seconds)
 
-                await self.clear_all()
+                # сбрасывает один воркер, остальные только ждут следующего раза
+                await self.invalidate_once(
+                    f"reset:{next_reset:%Y%m%d%H%M}", serve_stale=True
+                )
                 print(
                     f"🔄 Автосброс кэша выполнен в {datetime.now().strftime('%H:%M:%S')}"
                 )
@@ -0,0 +1,112 @@
+import io
+from typing import Optional, Sequence
+
+from sqlalchemy.engine import Row
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+MEDIA_TYPES = {"arrow": ARROW_MEDIA_TYPE, "parquet": PARQUET_MEDIA_TYPE}
+
+# Дополнительные media type, под которыми клиенты запрашивают форматы
+ACCEPT_ALIASES = {
+    ARROW_MEDIA_TYPE: "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/x-apache-arrow-stream": "arrow",
+    PARQUET_MEDIA_TYPE: "parquet",
+    "application/x-parquet": "parquet",
+}
+
+if pa is not None:
+    TRADING_RESULT_SCHEMA = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("exchange_product_id", pa.string()),
+            ("exchange_product_name", pa.string()),
+            ("oil_id", pa.string()),
+            ("delivery_basis_id", pa.string()),
+            ("delivery_basis_name", pa.string()),
+            ("delivery_type_id", pa.string()),
+            ("volume", pa.float64()),
+            ("total", pa.float64()),
+            ("count", pa.int64()),
+            ("date", pa.date32()),
+            ("created_on", pa.timestamp("us")),
+            ("updated_on", pa.timestamp("us")),
+        ]
+    )
+
+
+def is_available() -> bool:
+    """Установлен ли pyarrow"""
+    return pa is not None
+
+
+def negotiate(format_param: Optional[str], accept: Optional[str]) -> Optional[str]:
+    """
+    Определить колоночный формат ответа
+
+    Args:
+        format_param: Явно запрошенный формат (json, arrow, parquet)
+        accept: Заголовок Accept
+
+    Returns:
+        arrow, parquet или None для обычного JSON
+    """
+    if format_param:
+        return format_param if format_param in MEDIA_TYPES else None
+
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in ACCEPT_ALIASES:
+            return ACCEPT_ALIASES[media_type]
+    return None
+
+
+def rows_to_table(rows: Sequence[Row]) -> "pa.Table":
+    """
+    Построить Arrow-таблицу по колонкам напрямую из строк БД
+
+    Args:
+        rows: Строки с колонками в порядке TRADING_RESULT_SCHEMA
+
+    Returns:
+        Таблица pyarrow
+    """
+    columns = list(zip(*rows)) if rows else [[] for _ in TRADING_RESULT_SCHEMA]
+    arrays = [
+        pa.array(column, type=field.type)
+        for column, field in zip(columns, TRADING_RESULT_SCHEMA)
+    ]
+    return pa.Table.from_arrays(arrays, schema=TRADING_RESULT_SCHEMA)
+
+
+def serialize(rows: Sequence[Row], columnar_format: str) -> bytes:
+    """
+    Сериализовать строки в Arrow IPC stream или Parquet
+
+    Args:
+        rows: Строки БД
+        columnar_format: arrow или parquet
+
+    Returns:
+        Тело ответа
+    """
+    table = rows_to_table(rows)
+    sink = io.BytesIO()
+
+    if columnar_format == "parquet":
+        pq.write_table(table, sink, compression="zstd")
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    return sink.getvalue()
@@ -0,0 +1,60 @@
+import csv
+import io
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy.engine import RowMapping
+
+from .cache_codec import dumps_json
+
+
+class ExportService:
+    """Сервис для потоковой сериализации результатов торгов"""
+
+    MEDIA_TYPES = {
+        "ndjson": "application/x-ndjson",
+        "csv": "text/csv; charset=utf-8",
+    }
+
+    def media_type(self, export_format: str) -> str:
+        """Media type ответа для формата выгрузки"""
+        return self.MEDIA_TYPES[export_format]
+
+    def serialize(
+        self, batches: AsyncIterator[Sequence[RowMapping]], export_format: str
+    ) -> AsyncIterator[bytes]:
+        """
+        Сериализовать пачки строк в выбранный формат
+
+        Args:
+            batches: Асинхронный итератор пачек строк
+            export_format: ndjson или csv
+
+        Returns:
+            Асинхронный итератор фрагментов ответа
+        """
+        if export_format == "csv":
+            return self._csv(batches)
+        return self._ndjson(batches)
+
+    @staticmethod
+    async def _ndjson(
+        batches: AsyncIterator[Sequence[RowMapping]],
+    ) -> AsyncIterator[bytes]:
+        """Одна JSON-запись на строку, один фрагмент на пачку"""
+        async for batch in batches:
+            yield b"".join(dumps_json(dict(row)) + b"\n" for row in batch)
+
+    @staticmethod
+    async def _csv(
+        batches: AsyncIterator[Sequence[RowMapping]],
+    ) -> AsyncIterator[bytes]:
+        """CSV с заголовком, один фрагмент на пачку"""
+        header_written = False
+        async for batch in batches:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if not header_written and batch:
+                writer.writerow(batch[0].keys())
+                header_written = True
+            writer.writerows(row.values() for row in batch)
+            yield buffer.getvalue().encode("utf-8")
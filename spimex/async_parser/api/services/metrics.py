@@ -0,0 +1,94 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+REQUEST_DURATION = Histogram(
+    "spimex_api_request_duration_seconds",
+    "Время обработки HTTP запроса",
+    ["method", "route", "status", "cache"],
+)
+RESPONSE_BYTES = Histogram(
+    "spimex_api_response_bytes",
+    "Размер тела ответа (после сжатия)",
+    ["method", "route"],
+    buckets=BYTES_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "spimex_api_cache_requests_total",
+    "Обращения к кэшу ответов по результату",
+    ["namespace", "outcome"],
+)
+DB_QUERY_DURATION = Histogram(
+    "spimex_db_query_duration_seconds",
+    "Время запросов к БД по методу сервиса",
+    ["method"],
+)
+DB_ROWS = Histogram(
+    "spimex_db_rows_returned",
+    "Количество строк, возвращенных запросом к БД",
+    ["method"],
+    buckets=ROWS_BUCKETS,
+)
+
+
+class QueryObservation:
+    """Результат замера запроса: количество строк задает вызывающий код"""
+
+    rows = 0
+
+
+@contextmanager
+def observe_query(method: str) -> Iterator[QueryObservation]:
+    """
+    Замерить время запроса к БД и количество строк
+
+    Пример:
+        with observe_query("get_dynamics_rows") as observation:
+            rows = (await session.execute(query)).all()
+            observation.rows = len(rows)
+    """
+    observation = QueryObservation()
+    started = time.perf_counter()
+    try:
+        yield observation
+    finally:
+        DB_QUERY_DURATION.labels(method).observe(time.perf_counter() - started)
+        DB_ROWS.labels(method).observe(observation.rows)
+
+
+def record_cache_outcome(namespace: str, outcome: str):
+    """Учесть результат обращения к кэшу (hit, miss, stale, memory, not_modified)"""
+    CACHE_REQUESTS.labels(namespace, outcome).inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Метрики в текстовом формате Prometheus
+
+    С PROMETHEUS_MULTIPROC_DIR (несколько воркеров uvicorn) метрики
+    собираются из файлов всех процессов, иначе - из памяти процесса.
+
+    Returns:
+        Кортеж (тело ответа, Content-Type)
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
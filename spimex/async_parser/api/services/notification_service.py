@@ -0,0 +1,138 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import asyncpg
+
+import sys
+from pathlib import Path
+
+async_parser_path = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(async_parser_path))
+
+from config import api_settings as settings
+from .cache_codec import dumps_json, loads_json
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> bytes:
+    """Сформировать сообщение Server-Sent Events"""
+    message = f"event: {event}\n"
+    if event_id:
+        message += f"id: {event_id}\n"
+    return message.encode() + b"data: " + dumps_json(data) + b"\n\n"
+
+
+class NotificationService:
+    """
+    Подписка на уведомления загрузчика о новых торговых датах
+
+    Загрузчик вызывает pg_notify в транзакции загрузки, поэтому
+    уведомление приходит только после коммита данных. Сервис держит
+    отдельное asyncpg соединение с LISTEN на канал NOTIFY_CHANNEL,
+    вызывает зарегистрированные обработчики (сброс кэша) и раздает
+    события подписчикам SSE через очереди.
+    """
+
+    def __init__(self):
+        self.dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._handlers: List[Callable[[Dict[str, Any]], Awaitable[None]]] = []
+        self._listen_task: Optional[asyncio.Task] = None
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+
+    def add_handler(self, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Зарегистрировать обработчик, вызываемый на каждое уведомление"""
+        self._handlers.append(handler)
+
+    async def start(self):
+        """Запустить прослушивание канала в фоне"""
+        if self._listen_task is None:
+            self._listen_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Остановить прослушивание канала"""
+        for task in (self._listen_task, *self._dispatch_tasks):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._listen_task = None
+
+    def subscribe(self) -> asyncio.Queue:
+        """Создать очередь событий для нового подписчика"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.SSE_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Удалить очередь подписчика"""
+        self._subscribers.discard(queue)
+
+    @property
+    def subscribers(self) -> int:
+        """Количество подписчиков в процессе"""
+        return len(self._subscribers)
+
+    async def _listen(self):
+        """
+        Держать соединение с LISTEN, переподключаясь при обрыве
+
+        Соединение проверяется запросом раз в NOTIFY_HEALTHCHECK_INTERVAL
+        секунд, чтобы обнаружить обрыв без закрытия сокета.
+        """
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(
+                    settings.NOTIFY_CHANNEL, self._on_notification
+                )
+                print(f"📡 Подписка на канал {settings.NOTIFY_CHANNEL} активна")
+
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(
+                            closed.wait(), timeout=settings.NOTIFY_HEALTHCHECK_INTERVAL
+                        )
+                    except asyncio.TimeoutError:
+                        await connection.execute("SELECT 1")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Ошибка подписки на канал {settings.NOTIFY_CHANNEL}: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            await asyncio.sleep(settings.NOTIFY_RECONNECT_DELAY)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        """Колбэк asyncpg: разбор уведомления и запуск рассылки"""
+        try:
+            event = loads_json(payload)
+        except ValueError:
+            print(f"⚠️ Некорректное уведомление в канале {channel}: {payload}")
+            return
+
+        task = asyncio.create_task(self._dispatch(event))
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self, event: Dict[str, Any]):
+        """Вызвать обработчики и разослать событие подписчикам"""
+        for handler in self._handlers:
+            try:
+                await handler(event)
+            except Exception as e:
+                print(f"❌ Ошибка обработчика уведомления: {e}")
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # медленный подписчик пропускает событие, остальные не ждут
+                pass
@@ -0,0 +1,294 @@
+import asyncio
+import cProfile
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import sys
+from pathlib import Path
+
+async_parser_path = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(async_parser_path))
+
+from config import api_settings as settings
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+# Не больше стольких SQL запросов сохраняется в профиле одного HTTP запроса
+MAX_RECORDED_QUERIES = 50
+# Для скольких самых долгих запросов в журнал пишется EXPLAIN
+EXPLAIN_QUERIES = 3
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "spimex_request_profile", default=None
+)
+_explain_tasks: Set[asyncio.Task] = set()
+# cProfile профилирует весь поток (все запросы в цикле событий),
+# поэтому трасса снимается не больше чем для одного запроса за раз
+_trace_active = False
+
+
+class QueryRecord:
+    """SQL запрос, выполненный во время HTTP запроса"""
+
+    __slots__ = ("engine", "statement", "parameters", "seconds")
+
+    def __init__(self, engine: Engine, statement: str, parameters: Any, seconds: float):
+        self.engine = engine
+        self.statement = statement
+        self.parameters = parameters
+        self.seconds = seconds
+
+
+class RequestProfile:
+    """
+    Разбивка времени HTTP запроса по этапам
+
+    Этапы не вложены друг в друга: db - выполнение SQL (события курсора
+    SQLAlchemy), convert - строки БД в словари и Pydantic модели,
+    redis, cache_encode, cache_decode - работа с кэшем, serialize
+    и compress - подготовка тела ответа. Остаток - other.
+    """
+
+    def __init__(self, method: str, path: str, query_string: str):
+        self.method = method
+        self.path = path
+        self.query_string = query_string
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.queries: List[QueryRecord] = []
+        self.query_count = 0
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] += seconds
+
+    def add_query(self, record: QueryRecord):
+        self.add("db", record.seconds)
+        self.query_count += 1
+        if len(self.queries) < MAX_RECORDED_QUERIES:
+            self.queries.append(record)
+
+    def finish(self):
+        """Зафиксировать время окончания запроса"""
+        self.finished = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def breakdown(self) -> Dict[str, float]:
+        """Время этапов в миллисекундах, включая total и other"""
+        total = self.elapsed()
+        result = {phase: seconds * 1000 for phase, seconds in self.phases.items()}
+        result["other"] = max(total - sum(self.phases.values()), 0.0) * 1000
+        result["total"] = total * 1000
+        return result
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing"""
+        return ", ".join(
+            f"{phase};dur={ms:.1f}" for phase, ms in self.breakdown().items()
+        )
+
+    def summary(self) -> str:
+        """Строка разбивки для журнала"""
+        breakdown = self.breakdown()
+        total = breakdown.pop("total")
+        phases = ", ".join(f"{phase}={ms:.1f}" for phase, ms in breakdown.items())
+        target = self.path + (f"?{self.query_string}" if self.query_string else "")
+        return (
+            f"{self.method} {target} {total:.1f} мс "
+            f"(SQL запросов: {self.query_count}): {phases}"
+        )
+
+
+class _Phase:
+    __slots__ = ("profile", "name", "started")
+
+    def __init__(self, profile: RequestProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profile.add(self.name, time.perf_counter() - self.started)
+
+
+_NO_PHASE = nullcontext()
+
+
+def profile_phase(name: str):
+    """
+    Учесть время блока в этапе профиля текущего запроса
+
+    Без активного профиля возвращает пустой контекстный менеджер,
+    поэтому в горячих путях стоит одного обращения к ContextVar.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return _NO_PHASE
+    return _Phase(profile, name)
+
+
+def start_profile(method: str, path: str, query_string: str) -> RequestProfile:
+    """Начать профиль запроса в текущем контексте"""
+    profile = RequestProfile(method, path, query_string)
+    _current_profile.set(profile)
+    return profile
+
+
+def stop_profile(profile: RequestProfile):
+    """Завершить профиль запроса в текущем контексте"""
+    profile.finish()
+    _current_profile.set(None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("spimex_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    started = conn.info.get("spimex_query_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    profile.add_query(QueryRecord(conn.engine, statement, parameters, seconds))
+
+
+def install_query_hooks():
+    """Подписаться на события курсора всех движков SQLAlchemy (один раз)"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def log_slow_request(profile: RequestProfile):
+    """
+    Записать медленный запрос в журнал вместе с SQL и планами выполнения
+
+    EXPLAIN выполняется в фоне после отправки ответа, чтобы не увеличивать
+    время и без того медленного запроса.
+    """
+    if not settings.SLOW_QUERY_EXPLAIN or not profile.queries:
+        logger.warning(
+            "Медленный запрос %s%s", profile.summary(), _format_queries(profile)
+        )
+        return
+
+    task = asyncio.create_task(_explain_and_log(profile))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+async def _explain_and_log(profile: RequestProfile):
+    # EXPLAIN не должен попадать в профиль, который сейчас записывается
+    _current_profile.set(None)
+
+    plans: Dict[int, str] = {}
+    slowest = sorted(profile.queries, key=lambda q: q.seconds, reverse=True)
+    for record in slowest[:EXPLAIN_QUERIES]:
+        if not record.statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            continue
+        try:
+            async with AsyncEngine(record.engine).connect() as conn:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN {record.statement}", tuple(record.parameters or ())
+                )
+                plans[id(record)] = "\n".join(row[0] for row in result)
+        except Exception as e:
+            plans[id(record)] = f"EXPLAIN не выполнен: {e}"
+
+    logger.warning(
+        "Медленный запрос %s%s", profile.summary(), _format_queries(profile, plans)
+    )
+
+
+def _format_queries(
+    profile: RequestProfile, plans: Optional[Dict[int, str]] = None
+) -> str:
+    """SQL запросы профиля (самые долгие первыми) с планами выполнения"""
+    lines = []
+    for record in sorted(profile.queries, key=lambda q: q.seconds, reverse=True):
+        lines.append(f"\n--- {record.seconds * 1000:.1f} мс\n{record.statement}")
+        if record.parameters:
+            lines.append(f"\nпараметры: {record.parameters!r}")
+        if plans and id(record) in plans:
+            lines.append(f"\nплан:\n{plans[id(record)]}")
+    return "".join(lines)
+
+
+class RequestTrace:
+    """Трасса cProfile или pyinstrument для одного запроса"""
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        if tool == "pyinstrument":
+            self.profiler = PyinstrumentProfiler(async_mode="enabled")
+            self.profiler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self, profile: RequestProfile) -> Path:
+        """Остановить трассу и сохранить ее в PROFILE_DUMP_DIR"""
+        global _trace_active
+        try:
+            if self.tool == "pyinstrument":
+                self.profiler.stop()
+            else:
+                self.profiler.disable()
+        finally:
+            _trace_active = False
+
+        dump_dir = Path(settings.PROFILE_DUMP_DIR)
+        dump_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", profile.path).strip("_") or "root"
+        suffix = "html" if self.tool == "pyinstrument" else "prof"
+        path = dump_dir / f"{int(time.time() * 1000)}-{profile.method}-{slug}.{suffix}"
+        if self.tool == "pyinstrument":
+            path.write_text(self.profiler.output_html(), encoding="utf-8")
+        else:
+            self.profiler.dump_stats(str(path))
+        return path
+
+
+def start_trace() -> Optional[RequestTrace]:
+    """
+    Начать трассу запроса по настройке PROFILE_TRACE
+
+    Returns:
+        None, если трасса выключена, pyinstrument не установлен
+        или уже снимается трасса другого запроса
+    """
+    global _trace_active
+    tool = settings.PROFILE_TRACE.lower()
+    if tool not in ("cprofile", "pyinstrument") or _trace_active:
+        return None
+    if tool == "pyinstrument" and PyinstrumentProfiler is None:
+        logger.warning("pyinstrument не установлен, трасса запроса не снимается")
+        return None
+    _trace_active = True
+    try:
+        return RequestTrace(tool)
+    except Exception:
+        _trace_active = False
+        raise
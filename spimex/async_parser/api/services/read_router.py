@@ -0,0 +1,173 @@
+import asyncio
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+import sys
+from pathlib import Path
+
+async_parser_path = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(async_parser_path))
+
+from config import api_settings as settings
+from database import AsyncSessionLocal, create_engine_for
+
+# Отставание реплики в секундах. NULL - состояние неизвестно, и реплика
+# не используется: сервер не в режиме standby (не реплика или реплика
+# после promote) либо WAL receiver не подключен к основной БД (тогда
+# равенство receive/replay LSN ничего не говорит о свежести данных).
+# Статус WAL receiver виден роли с pg_read_all_stats (pg_monitor).
+REPLICATION_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+UNKNOWN_LAG_ERROR = "не standby или WAL receiver не подключен"
+
+
+class _Replica:
+    """Реплика: engine, фабрика сессий и последнее измеренное отставание"""
+
+    def __init__(self, url: str):
+        self.host = url.rsplit("@", 1)[-1]
+        self.engine: AsyncEngine = create_engine_for(url, role="replica")
+        self.session_factory = async_sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+
+class ReadRouter:
+    """
+    Фабрика сессий для чтения с маршрутизацией на реплики
+
+    Вызов ReadRouter() возвращает сессию реплики (по кругу среди реплик
+    с отставанием не больше REPLICA_MAX_LAG_SECONDS) или, если подходящих
+    реплик нет, сессию основной БД. Отставание проверяется фоновой задачей
+    раз в REPLICA_LAG_CHECK_INTERVAL секунд.
+
+    Без DATABASE_REPLICA_URLS все чтения идут в основную БД.
+    """
+
+    def __init__(self, replica_urls: Optional[List[str]] = None):
+        if replica_urls is None:
+            replica_urls = [
+                url.strip()
+                for url in settings.DATABASE_REPLICA_URLS.split(",")
+                if url.strip()
+            ]
+        self.replicas = [_Replica(url) for url in replica_urls]
+        self._round_robin = itertools.cycle(range(len(self.replicas) or 1))
+        self._primary_until = 0.0
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    def __call__(self) -> AsyncSession:
+        replica = self._choose_replica()
+        if replica is None:
+            return AsyncSessionLocal()
+        return replica.session_factory()
+
+    def _choose_replica(self) -> Optional[_Replica]:
+        if not self.replicas or time.monotonic() < self._primary_until:
+            return None
+
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._round_robin)]
+            if replica.healthy:
+                return replica
+        return None
+
+    def prefer_primary(self, seconds: Optional[float] = None):
+        """
+        Временно читать только из основной БД
+
+        Вызывается после загрузки новых данных: реплики могут еще
+        не получить их, а кэш не должен заполниться старыми значениями.
+        """
+        if seconds is None:
+            seconds = settings.REPLICA_MAX_LAG_SECONDS
+        self._primary_until = max(self._primary_until, time.monotonic() + seconds)
+
+    async def start(self):
+        """Измерить отставание реплик и запустить периодическую проверку"""
+        if not self.replicas:
+            return
+        # Периодическая проверка запускается до первого замера, чтобы
+        # ошибка замера не оставила реплики выключенными навсегда
+        self._monitor_task = asyncio.create_task(self._monitor())
+        await self.check_lag()
+
+    async def close(self):
+        """Остановить проверку и закрыть соединения с репликами"""
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def check_lag(self):
+        """Измерить отставание всех реплик"""
+        await asyncio.gather(*(self._check_replica(replica) for replica in self.replicas))
+
+    async def _check_replica(self, replica: _Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                result = await asyncio.wait_for(
+                    conn.execute(REPLICATION_LAG_SQL),
+                    timeout=settings.REPLICA_LAG_CHECK_INTERVAL,
+                )
+                lag = result.scalar()
+        except Exception as e:
+            if replica.error is None:
+                print(f"⚠️ Реплика {replica.host} недоступна: {e}")
+            replica.lag = None
+            replica.error = str(e)
+            return
+
+        if lag is None:
+            if replica.error != UNKNOWN_LAG_ERROR:
+                print(f"⚠️ Реплика {replica.host} не используется: {UNKNOWN_LAG_ERROR}")
+            replica.lag = None
+            replica.error = UNKNOWN_LAG_ERROR
+        else:
+            replica.lag = float(lag)
+            replica.error = None
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(settings.REPLICA_LAG_CHECK_INTERVAL)
+            await self.check_lag()
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Состояние реплик для /api/v1/db/pool"""
+        return [
+            {
+                "host": replica.host,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag,
+                "error": replica.error,
+            }
+            for replica in self.replicas
+        ]
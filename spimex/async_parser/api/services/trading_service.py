@@ -1,6 +1,23 @@
-from typing import List
+import asyncio
+import time
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
 from datetime import date
-from sqlalchemy import select, distinct, desc, and_
+from sqlalchemy import (
+    select,
+    distinct,
+    desc,
+    and_,
+    tuple_,
+    case,
+    func,
+    literal,
+    literal_column,
+    union_all,
+    Date,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.engine import Row, RowMapping
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import sys
 from pathlib import Path
@@ -8,18 +25,133 @@ from pathlib import Path
 async_parser_path = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(async_parser_path))
 
+from config import api_settings as settings
+from .metrics import observe_query
+from .profiling import profile_phase
 from database import AsyncSessionLocal
 from models.trading_result import TradingResult
+from models.trading_rollup import TradingDailyRollup
+from models.trading_date import TradingDate
+from models.product import Product
+from models.delivery_basis import DeliveryBasis
 from models.schemas import (
     TradingResultFilter,
     DynamicsFilter,
-    TradingResultItem,
+    ExportFilter,
+    AggregateFilter,
+    AggregateItem,
+    encode_cursor,
+    decode_cursor,
+)
+
+
+# Колонки результата торгов в порядке полей TradingResultItem
+ITEM_COLUMNS = (
+    TradingResult.id,
+    TradingResult.exchange_product_id,
+    Product.name.label("exchange_product_name"),
+    TradingResult.oil_id,
+    TradingResult.delivery_basis_id,
+    DeliveryBasis.name.label("delivery_basis_name"),
+    TradingResult.delivery_type_id,
+    TradingResult.volume,
+    TradingResult.total,
+    TradingResult.count,
+    TradingResult.date,
+    TradingResult.created_on,
+    TradingResult.updated_on,
 )
 
+# Наименования берутся из справочников по суррогатным ключам
+ITEM_FROM = TradingResult.__table__.join(
+    Product.__table__, TradingResult.product_key == Product.id
+).join(DeliveryBasis.__table__, TradingResult.basis_key == DeliveryBasis.id)
+
 
 class TradingService:
     """Сервис для работы с торговыми данными SPIMEX"""
 
+    def __init__(
+        self,
+        read_session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        # Фабрика сессий для чтения (реплика или основная БД, см. ReadRouter)
+        self._read_session = read_session_factory
+        # Торговый календарь (даты по убыванию), кэшируется в процессе
+        self._calendar: List[date] = []
+        self._calendar_loaded_at: Optional[float] = None
+        self._calendar_lock = asyncio.Lock()
+
+    async def get_calendar(self) -> List[date]:
+        """
+        Получить торговый календарь из кэша процесса
+
+        Календарь перечитывается из таблицы spimex_trading_dates
+        не чаще раза в TRADING_CALENDAR_TTL секунд.
+
+        Returns:
+            Список торговых дат в порядке убывания
+        """
+        if self._calendar_is_fresh():
+            return self._calendar
+
+        async with self._calendar_lock:
+            if self._calendar_is_fresh():
+                return self._calendar
+
+            with observe_query("get_calendar") as observation:
+                async with self._read_session() as session:
+                    result = await session.execute(
+                        select(TradingDate.date).order_by(desc(TradingDate.date))
+                    )
+                    self._calendar = list(result.scalars().all())
+                    self._calendar_loaded_at = time.monotonic()
+                observation.rows = len(self._calendar)
+
+        return self._calendar
+
+    def invalidate_calendar(self):
+        """Сбросить кэш торгового календаря"""
+        self._calendar_loaded_at = None
+
+    def _calendar_is_fresh(self) -> bool:
+        return (
+            self._calendar_loaded_at is not None
+            and time.monotonic() - self._calendar_loaded_at
+            < settings.TRADING_CALENDAR_TTL
+        )
+
+    @staticmethod
+    def _dynamics_conditions(filter_params) -> list:
+        """
+        Условия выборки за период с опциональными фильтрами
+
+        Args:
+            filter_params: DynamicsFilter или ExportFilter
+
+        Returns:
+            Список условий для WHERE
+        """
+        conditions = [
+            TradingResult.date >= filter_params.start_date,
+            TradingResult.date <= filter_params.end_date,
+        ]
+
+        if filter_params.oil_id:
+            conditions.append(TradingResult.oil_id == filter_params.oil_id)
+
+        if filter_params.delivery_type_id:
+            conditions.append(
+                TradingResult.delivery_type_id == filter_params.delivery_type_id
+            )
+
+        if filter_params.delivery_basis_id:
+            conditions.append(
+                TradingResult.delivery_basis_id == filter_params.delivery_basis_id
+            )
+
+        return conditions
+
     async def health_check(self) -> bool:
         """Проверка доступности базы данных"""
         try:
@@ -40,96 +172,179 @@ class TradingService:
             Список дат в порядке убывания
         """
         try:
-            async with AsyncSessionLocal() as session:
-                query = (
-                    select(distinct(TradingResult.date))
-                    .order_by(desc(TradingResult.date))
-                    .limit(limit)
-                )
-
-                result = await session.execute(query)
-                dates = [row[0] for row in result.fetchall()]
-
-                return dates
+            calendar = await self.get_calendar()
+            return calendar[:limit]
 
         except Exception as e:
             raise Exception(f"Ошибка получения торговых дат: {str(e)}")
 
     async def get_dynamics(
         self, filter_params: DynamicsFilter
-    ) -> List[TradingResultItem]:
+    ) -> Tuple[List[dict], Optional[str]]:
         """
-        Получить динамику торгов за период
+        Получить страницу динамики торгов за период
+
+        Строки БД сразу преобразуются в словари полей TradingResultItem,
+        без промежуточных ORM и Pydantic объектов.
 
         Args:
             filter_params: Параметры фильтрации
 
         Returns:
-            Список результатов торгов
+            Кортеж (список результатов торгов, курсор следующей страницы
+            или None, если страница последняя)
         """
-        try:
-            async with AsyncSessionLocal() as session:
-                query = select(TradingResult).where(
-                    and_(
-                        TradingResult.date >= filter_params.start_date,
-                        TradingResult.date <= filter_params.end_date,
-                    )
-                )
+        rows, next_cursor = await self.get_dynamics_rows(filter_params)
+        with profile_phase("convert"):
+            return [row._asdict() for row in rows], next_cursor
 
-                conditions = []
+    async def get_dynamics_rows(
+        self, filter_params: DynamicsFilter
+    ) -> Tuple[List[Row], Optional[str]]:
+        """
+        Получить страницу динамики торгов в виде строк БД (колонки ITEM_COLUMNS)
 
-                if filter_params.oil_id:
-                    conditions.append(
-                        TradingResult.oil_id == filter_params.oil_id
-                        )
+        Страницы выбираются по ключу (date, id) в порядке убывания:
+        каждая следующая страница - диапазонное сканирование индекса
+        от позиции курсора, без OFFSET.
 
-                if filter_params.delivery_type_id:
-                    conditions.append(
-                        TradingResult.delivery_type_id
-                        == filter_params.delivery_type_id
-                    )
+        Args:
+            filter_params: Параметры фильтрации
 
-                if filter_params.delivery_basis_id:
-                    conditions.append(
-                        TradingResult.delivery_basis_id
-                        == filter_params.delivery_basis_id
+        Returns:
+            Кортеж (список строк, курсор следующей страницы
+            или None, если страница последняя)
+        """
+        try:
+            with observe_query("get_dynamics_rows") as observation:
+                async with self._read_session() as session:
+                    result = await session.execute(
+                        self._dynamics_page_query(filter_params)
                     )
+                    rows = result.all()
+                observation.rows = len(rows)
+            return self._split_page(rows, filter_params.limit)
 
-                if conditions:
-                    query = query.where(and_(*conditions))
+        except Exception as e:
+            raise Exception(f"Ошибка получения динамики торгов: {str(e)}")
 
-                query = query.order_by(
-                    desc(TradingResult.date), desc(TradingResult.id)
-                ).limit(filter_params.limit)
+    async def get_dynamics_batch(
+        self, filters: List[DynamicsFilter]
+    ) -> List[Tuple[List[dict], Optional[str]]]:
+        """
+        Получить страницы динамики сразу для нескольких фильтров
 
-                result = await session.execute(query)
-                trading_results = result.scalars().all()
-
-                return [
-                    TradingResultItem(
-                        id=tr.id,
-                        exchange_product_id=tr.exchange_product_id,
-                        exchange_product_name=tr.exchange_product_name,
-                        oil_id=tr.oil_id,
-                        delivery_basis_id=tr.delivery_basis_id,
-                        delivery_basis_name=tr.delivery_basis_name,
-                        delivery_type_id=tr.delivery_type_id,
-                        volume=tr.volume,
-                        total=tr.total,
-                        count=tr.count,
-                        date=tr.date,
-                        created_on=tr.created_on,
-                        updated_on=tr.updated_on,
-                    )
-                    for tr in trading_results
-                ]
+        Все фильтры выполняются одним запросом UNION ALL: каждая ветка -
+        та же выборка страницы, что и в get_dynamics_rows, со своим
+        LIMIT и номером фильтра в колонке spec. Порядок строк UNION ALL
+        не гарантирован (например, при Parallel Append ветки
+        перемешиваются), поэтому строки каждого фильтра сортируются
+        по (date, id) перед разбиением на страницу.
+
+        Args:
+            filters: Список параметров фильтрации
+
+        Returns:
+            Список кортежей (результаты, курсор следующей страницы)
+            в порядке фильтров
+        """
+        if not filters:
+            return []
+
+        try:
+            branches = [
+                self._dynamics_page_query(filter_params).add_columns(
+                    literal(index).label("spec")
+                )
+                for index, filter_params in enumerate(filters)
+            ]
+            query = branches[0] if len(branches) == 1 else union_all(*branches)
+
+            with observe_query("get_dynamics_batch") as observation:
+                async with self._read_session() as session:
+                    result = await session.execute(query)
+                    grouped: List[List[Row]] = [[] for _ in filters]
+                    for row in result:
+                        grouped[row.spec].append(row)
+                observation.rows = sum(len(rows) for rows in grouped)
+
+            pages = []
+            with profile_phase("convert"):
+                for rows, filter_params in zip(grouped, filters):
+                    rows.sort(key=lambda row: (row.date, row.id), reverse=True)
+                    rows, next_cursor = self._split_page(rows, filter_params.limit)
+                    items = [row._asdict() for row in rows]
+                    for item in items:
+                        del item["spec"]
+                    pages.append((items, next_cursor))
+            return pages
 
         except Exception as e:
             raise Exception(f"Ошибка получения динамики торгов: {str(e)}")
 
+    def _dynamics_page_query(self, filter_params: DynamicsFilter):
+        """Запрос страницы динамики (на одну запись больше лимита)"""
+        conditions = self._dynamics_conditions(filter_params)
+
+        if filter_params.cursor:
+            cursor_date, cursor_id = decode_cursor(filter_params.cursor)
+            conditions.append(
+                tuple_(TradingResult.date, TradingResult.id)
+                < tuple_(cursor_date, cursor_id)
+            )
+
+        # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+        return (
+            select(*ITEM_COLUMNS)
+            .select_from(ITEM_FROM)
+            .where(and_(*conditions))
+            .order_by(desc(TradingResult.date), desc(TradingResult.id))
+            .limit(filter_params.limit + 1)
+        )
+
+    @staticmethod
+    def _split_page(rows: List[Row], limit: int) -> Tuple[List[Row], Optional[str]]:
+        """Обрезать выборку до лимита и построить курсор следующей страницы"""
+        if len(rows) <= limit:
+            return rows, None
+
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor(last.date, last.id)
+
+    async def stream_dynamics(
+        self, filter_params: ExportFilter
+    ) -> AsyncIterator[Sequence[RowMapping]]:
+        """
+        Потоково выгрузить результаты торгов за период
+
+        Строки читаются серверным курсором пачками по EXPORT_BATCH_SIZE,
+        поэтому потребление памяти не зависит от объема выгрузки.
+
+        Args:
+            filter_params: Параметры фильтрации
+
+        Yields:
+            Пачки строк (словарей колонка -> значение)
+        """
+        query = (
+            select(*ITEM_COLUMNS)
+            .select_from(ITEM_FROM)
+            .where(and_(*self._dynamics_conditions(filter_params)))
+            .order_by(TradingResult.date, TradingResult.id)
+            .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        )
+
+        with observe_query("stream_dynamics") as observation:
+            async with self._read_session() as session:
+                result = await session.stream(query)
+                async for partition in result.mappings().partitions():
+                    observation.rows += len(partition)
+                    yield partition
+
     async def get_trading_results(
         self, filter_params: TradingResultFilter
-    ) -> List[TradingResultItem]:
+    ) -> List[dict]:
         """
         Получить последние результаты торгов
 
@@ -137,24 +352,40 @@ class TradingService:
             filter_params: Параметры фильтрации
 
         Returns:
-            Список результатов торгов
+            Список результатов торгов (словари полей TradingResultItem)
         """
-        try:
-            async with AsyncSessionLocal() as session:
-                # Сначала находим последнюю торговую дату
-                latest_date_query = (
-                    select(TradingResult.date)
-                    .order_by(desc(TradingResult.date))
-                    .limit(1)
-                )
-                latest_date_result = await session.execute(latest_date_query)
-                latest_date = latest_date_result.scalar()
+        rows = await self.get_trading_results_rows(filter_params)
+        with profile_phase("convert"):
+            return [row._asdict() for row in rows]
 
-                if not latest_date:
-                    return []
+    async def get_trading_results_rows(
+        self, filter_params: TradingResultFilter
+    ) -> List[Row]:
+        """
+        Получить последние результаты торгов в виде строк БД (колонки ITEM_COLUMNS)
 
+        Args:
+            filter_params: Параметры фильтрации
+
+        Returns:
+            Список строк
+        """
+        try:
+            # Последняя торговая дата берется из торгового календаря; он
+            # читается до открытия сессии, чтобы при перечитывании запрос
+            # не держал два соединения
+            calendar = await self.get_calendar()
+            if not calendar:
+                return []
+            latest_date = calendar[0]
+
+            async with self._read_session() as session:
                 # Базовый запрос для последней торговой даты
-                query = select(TradingResult).where(TradingResult.date == latest_date)
+                query = (
+                    select(*ITEM_COLUMNS)
+                    .select_from(ITEM_FROM)
+                    .where(TradingResult.date == latest_date)
+                )
 
                 # Применяем фильтры
                 conditions = []
@@ -181,32 +412,87 @@ class TradingService:
                     desc(TradingResult.total), desc(TradingResult.volume)
                 ).limit(filter_params.limit)
 
-                result = await session.execute(query)
-                trading_results = result.scalars().all()
-
-                # Преобразуем в Pydantic модели
-                return [
-                    TradingResultItem(
-                        id=tr.id,
-                        exchange_product_id=tr.exchange_product_id,
-                        exchange_product_name=tr.exchange_product_name,
-                        oil_id=tr.oil_id,
-                        delivery_basis_id=tr.delivery_basis_id,
-                        delivery_basis_name=tr.delivery_basis_name,
-                        delivery_type_id=tr.delivery_type_id,
-                        volume=tr.volume,
-                        total=tr.total,
-                        count=tr.count,
-                        date=tr.date,
-                        created_on=tr.created_on,
-                        updated_on=tr.updated_on,
-                    )
-                    for tr in trading_results
-                ]
+                with observe_query("get_trading_results_rows") as observation:
+                    rows = (await session.execute(query)).all()
+                    observation.rows = len(rows)
+                return rows
 
         except Exception as e:
             raise Exception(f"Ошибка получения результатов торгов: {str(e)}")
 
+    async def get_aggregates(self, filter_params: AggregateFilter) -> List[AggregateItem]:
+        """
+        Получить агрегаты торгов по периодам из таблицы дневных агрегатов
+
+        Args:
+            filter_params: Параметры фильтрации и размер периода (day, week, month)
+
+        Returns:
+            Список агрегатов в порядке убывания начала периода
+        """
+        try:
+            async with self._read_session() as session:
+                rollup = TradingDailyRollup
+                # bucket проверен валидатором, подставляем литералом,
+                # чтобы выражение в SELECT и GROUP BY совпадало
+                period_start = func.date_trunc(
+                    literal_column(f"'{filter_params.bucket}'"), rollup.date
+                ).cast(Date)
+                daily_price = case(
+                    (rollup.volume > 0, rollup.total / rollup.volume),
+                )
+                volume = func.sum(rollup.volume)
+                total = func.sum(rollup.total)
+
+                query = select(
+                    period_start.label("period_start"),
+                    rollup.oil_id,
+                    rollup.delivery_basis_id,
+                    volume.label("volume"),
+                    total.label("total"),
+                    func.sum(rollup.count).label("count"),
+                    func.sum(rollup.records).label("records"),
+                    (total / func.nullif(volume, 0)).label("avg_price"),
+                    func.min(rollup.min_price).label("min_price"),
+                    func.max(rollup.max_price).label("max_price"),
+                    func.array_agg(aggregate_order_by(daily_price, rollup.date.asc()))[
+                        1
+                    ].label("open_price"),
+                    func.array_agg(aggregate_order_by(daily_price, rollup.date.desc()))[
+                        1
+                    ].label("close_price"),
+                ).where(
+                    rollup.date >= filter_params.start_date,
+                    rollup.date <= filter_params.end_date,
+                )
+
+                if filter_params.oil_id:
+                    query = query.where(rollup.oil_id == filter_params.oil_id)
+
+                if filter_params.delivery_basis_id:
+                    query = query.where(
+                        rollup.delivery_basis_id == filter_params.delivery_basis_id
+                    )
+
+                query = (
+                    query.group_by(
+                        period_start, rollup.oil_id, rollup.delivery_basis_id
+                    )
+                    .order_by(
+                        desc(period_start), rollup.oil_id, rollup.delivery_basis_id
+                    )
+                    .limit(filter_params.limit)
+                )
+
+                with observe_query("get_aggregates") as observation:
+                    rows = (await session.execute(query)).all()
+                    observation.rows = len(rows)
+                with profile_phase("convert"):
+                    return [AggregateItem(**row._mapping) for row in rows]
+
+        except Exception as e:
+            raise Exception(f"Ошибка получения агрегатов торгов: {str(e)}")
+
     async def get_trading_statistics(self) -> dict:
         """
         Получить общую статистику по торгам
@@ -215,7 +501,7 @@ class TradingService:
             Словарь со статистикой
         """
         try:
-            async with AsyncSessionLocal() as session:
+            async with self._read_session() as session:
                 from sqlalchemy import func
 
                 # Общее количество записей
@@ -228,10 +514,8 @@ class TradingService:
                 unique_dates_result = await session.execute(unique_dates_query)
                 unique_dates = unique_dates_result.scalar()
 
-                # Количество уникальных инструментов
-                unique_instruments_query = select(
-                    func.count(distinct(TradingResult.exchange_product_id))
-                )
+                # Количество уникальных инструментов (строк справочника)
+                unique_instruments_query = select(func.count(Product.id))
                 unique_instruments_result = await session.execute(
                     unique_instruments_query
                 )
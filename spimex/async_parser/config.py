@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from pydantic import BaseSettings
+from constants import TRADING_DATES_CHANNEL
 
 load_dotenv()
 
@@ -13,6 +14,22 @@ ASYNC_SQLALCHEMY_DATABASE_URL = (
     f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
 
+# Профиль пула соединений: api или loader
+DB_ENGINE_ROLE = os.environ.get("DB_ENGINE_ROLE", "loader")
+# Бюджет соединений с Postgres на один под/хост (все процессы вместе)
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", "80"))
+# Ожидаемое число одновременных запросов к БД в одном процессе
+DB_API_CONCURRENCY = int(os.environ.get("DB_API_CONCURRENCY", "10"))
+DB_LOADER_CONCURRENCY = int(os.environ.get("DB_LOADER_CONCURRENCY", "20"))
+# Часть бюджета, отдаваемая загрузчику; остаток делится между воркерами API
+DB_LOADER_MAX_CONNECTIONS = int(os.environ.get("DB_LOADER_MAX_CONNECTIONS", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+# Подключение через PgBouncer в режиме transaction pooling
+DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+API_WORKERS = int(os.environ.get("WORKERS", "4"))
+# Prometheus Pushgateway для метрик загрузчика (пусто - не отправлять)
+PUSHGATEWAY_URL = os.environ.get("PUSHGATEWAY_URL", "")
+
 
 class APISettings(BaseSettings):
     """Настройки API"""
@@ -20,14 +37,66 @@ class APISettings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = False
+    WORKERS: int = API_WORKERS
 
     DATABASE_URL: str = ASYNC_SQLALCHEMY_DATABASE_URL
+    DB_POOL_WARMUP: int = 5
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 10.0
+    REPLICA_LAG_CHECK_INTERVAL: float = 5.0
 
     REDIS_URL: str = "redis://redis:6379/0"
     REDIS_PASSWORD: str = ""
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
 
     CACHE_TTL: int = 3600
     CACHE_RESET_TIME: str = "14:11"
+    CACHE_KEY_PREFIX: str = "spimex"
+    CACHE_GENERATION_TTL: float = 1.0
+    CACHE_SCAN_BATCH_SIZE: int = 500
+    CACHE_CODEC: str = "orjson"
+    CACHE_COMPRESSION: str = "zstd"
+    CACHE_COMPRESSION_THRESHOLD: int = 4096
+    CACHE_COLUMNAR: bool = True
+    CACHE_STATS_SAMPLE_SIZE: int = 50
+    CACHE_STATS_SCAN_LIMIT: int = 10
+    CACHE_STATS_MEMORY_TTL: float = 60.0
+    CACHE_METRICS_FLUSH_INTERVAL: float = 5.0
+    CACHE_SWR_ENABLED: bool = True
+    CACHE_SOFT_TTL: int = 300
+    CACHE_STALE_TTL: int = 600
+    CACHE_REFRESH_LOCK_TTL: int = 30
+    HTTP_CACHE_MAX_AGE: int = 60
+    # Запрос с Cache-Control: no-cache идет в БД мимо кэша (нагрузочные тесты)
+    CACHE_CLIENT_BYPASS: bool = False
+
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"
+    COMPRESSION_MIN_SIZE: int = 1024
+    RESPONSE_BODY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    EXPORT_BATCH_SIZE: int = 5000
+    BATCH_MAX_QUERIES: int = 50
+
+    NOTIFY_ENABLED: bool = True
+    NOTIFY_CHANNEL: str = TRADING_DATES_CHANNEL
+    NOTIFY_RECONNECT_DELAY: float = 5.0
+    NOTIFY_HEALTHCHECK_INTERVAL: float = 30.0
+    SSE_HEARTBEAT_INTERVAL: float = 15.0
+    SSE_QUEUE_SIZE: int = 100
+    TRADING_CALENDAR_TTL: float = 60.0
+
+    # Профилирование запросов: по заголовку X-Profile с токеном и/или
+    # случайной выборке; медленные запросы пишутся в журнал с SQL и EXPLAIN
+    PROFILE_HEADER_TOKEN: str = ""
+    PROFILE_SAMPLE_RATE: float = 0.0
+    SLOW_REQUEST_THRESHOLD_MS: float = 0.0
+    SLOW_QUERY_EXPLAIN: bool = True
+    # cprofile или pyinstrument: трасса профилируемых запросов в PROFILE_DUMP_DIR
+    PROFILE_TRACE: str = ""
+    PROFILE_DUMP_DIR: str = "/tmp/spimex-profiles"
 
     SECRET_KEY: str = "spimex-api-secret-key"
 
@@ -15,8 +15,6 @@ BASE_URL = "https://spimex.com/markets/oil_products/trades/results/"
 
 PAGE_URL_PATTERN = "?page=page-{page_num}"
 
-FILE_URL_PATTERN = r'href="([^"]*oil_xls_{date_formatted}\d{{6}}\.xls[^"]*)"'
-
 ALL_FILES_PATTERN = r'href="([^"]*oil_xls_(\d{8})\d{6}\.xls[^"]*)"'
 
 RECORDS_TO_SAVE = [
@@ -40,8 +38,18 @@ METRIC_TON_MARKER = "Единица измерения: Метрическая 
 # Числовые столбцы для обработки
 NUMERIC_COLUMNS = ["volume", "total", "count"]
 
+# Код инструмента: 4 символа вида нефтепродукта, 3 символа базиса поставки,
+# служебная часть и буква вида поставки в конце (A592ACH060F)
+PRODUCT_CODE_PATTERN = (
+    r"^(?P<oil_id>[A-Z0-9]{4})(?P<delivery_basis_id>[A-Z0-9]{3})"
+    r"[A-Z0-9]*(?P<delivery_type_id>[A-Z])$"
+)
+
 # Максимальное количество страниц для проверки
 MAX_PAGES_TO_CHECK = 64
 
 # Таймауты для HTTP запросов
 HTTP_TIMEOUT = 10
+
+# Канал Postgres NOTIFY для уведомлений о загрузке новой торговой даты
+TRADING_DATES_CHANNEL = "spimex_trading_dates"
@@ -1,22 +1,126 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict
+from uuid import uuid4
+
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
 )
 from sqlalchemy.orm import declarative_base
-from config import ASYNC_SQLALCHEMY_DATABASE_URL
-
-
-async_engine = create_async_engine(
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from config import (
     ASYNC_SQLALCHEMY_DATABASE_URL,
-    echo=False,
-    pool_size=50,
-    max_overflow=100,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_timeout=30,
+    DB_ENGINE_ROLE,
+    DB_MAX_CONNECTIONS,
+    DB_API_CONCURRENCY,
+    DB_LOADER_CONCURRENCY,
+    DB_LOADER_MAX_CONNECTIONS,
+    DB_POOL_TIMEOUT,
+    DB_PGBOUNCER,
+    API_WORKERS,
 )
 
+
+# Соединения воркера API с основной БД вне пула: LISTEN уведомлений загрузчика
+LISTEN_CONNECTIONS = 1
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений со счетчиками выдачи и времени ожидания соединения"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self.checkouts += 1
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkouts = self.checkouts
+        pool.timeouts = self.timeouts
+        pool.wait_seconds = self.wait_seconds
+        pool.max_wait_seconds = self.max_wait_seconds
+        return pool
+
+
+def pool_options(role: str) -> Dict[str, Any]:
+    """
+    Параметры пула для роли процесса
+
+    Бюджет DB_MAX_CONNECTIONS основной БД делится между процессами:
+    загрузчик получает DB_LOADER_MAX_CONNECTIONS, остаток - поровну
+    WORKERS воркерам API за вычетом их соединений вне пула (LISTEN,
+    см. LISTEN_CONNECTIONS). На реплике (role="replica") нет загрузчика
+    и LISTEN, поэтому воркерам делится весь бюджет. Постоянная часть
+    пула рассчитана на ожидаемую конкурентность, остаток бюджета -
+    overflow. Если бюджета не хватает даже на одно соединение на процесс,
+    пул все равно получает одно, и сумма превысит DB_MAX_CONNECTIONS.
+
+    С PgBouncer (transaction pooling) пул держит PgBouncer, поэтому
+    используется NullPool и отключается кэш подготовленных выражений.
+    """
+    if DB_PGBOUNCER:
+        return {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            },
+        }
+
+    loader_budget = min(DB_LOADER_MAX_CONNECTIONS, DB_MAX_CONNECTIONS)
+    workers = max(API_WORKERS, 1)
+    if role == "api":
+        api_budget = (DB_MAX_CONNECTIONS - loader_budget) // workers
+        budget = max(api_budget - LISTEN_CONNECTIONS, 1)
+        concurrency = DB_API_CONCURRENCY
+    elif role == "replica":
+        budget = max(DB_MAX_CONNECTIONS // workers, 1)
+        concurrency = DB_API_CONCURRENCY
+    else:
+        budget = max(loader_budget, 1)
+        concurrency = DB_LOADER_CONCURRENCY
+
+    pool_size = max(min(concurrency, budget), 1)
+    return {
+        "poolclass": InstrumentedPool,
+        "pool_size": pool_size,
+        "max_overflow": budget - pool_size,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+    }
+
+
+def create_engine_for(url: str, role: str = DB_ENGINE_ROLE) -> AsyncEngine:
+    """Создать async engine с пулом, рассчитанным для роли процесса"""
+    return create_async_engine(url, echo=False, **pool_options(role))
+
+
+async_engine = create_engine_for(ASYNC_SQLALCHEMY_DATABASE_URL)
+
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
@@ -41,3 +145,47 @@ async def init_async_database():
     """Создание всех таблиц асинхронно"""
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+async def warm_up_pool(connections: int):
+    """
+    Заранее открыть соединения пула, чтобы первые запросы не ждали подключения
+
+    Соединения берутся из пула одновременно, поэтому открываются разные.
+    """
+
+    async def checkout():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(checkout() for _ in range(connections)))
+
+
+def pool_status(engine: AsyncEngine = async_engine) -> Dict[str, Any]:
+    """Состояние пула соединений процесса"""
+    pool = engine.pool
+    status: Dict[str, Any] = {
+        "pid": os.getpid(),
+        "role": DB_ENGINE_ROLE,
+        "pool_class": type(pool).__name__,
+        "pgbouncer": DB_PGBOUNCER,
+    }
+
+    if isinstance(pool, InstrumentedPool):
+        status.update(
+            {
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": pool.checkouts,
+                "timeouts": pool.timeouts,
+                "wait_seconds_total": round(pool.wait_seconds, 6),
+                "wait_seconds_max": round(pool.max_wait_seconds, 6),
+                "wait_seconds_avg": round(
+                    pool.wait_seconds / pool.checkouts if pool.checkouts else 0.0, 6
+                ),
+            }
+        )
+    return status
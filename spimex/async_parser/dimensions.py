@@ -0,0 +1,135 @@
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Upsert возвращает ключи и новых, и уже существующих кодов.
+# Наименование обновляется последним загруженным значением.
+UPSERT_PRODUCTS = text(
+    """
+    INSERT INTO spimex_products (exchange_product_id, name)
+    SELECT * FROM unnest(CAST(:codes AS varchar[]), CAST(:names AS varchar[]))
+    ON CONFLICT (exchange_product_id) DO UPDATE SET name = EXCLUDED.name
+    RETURNING exchange_product_id, id
+    """
+)
+
+UPSERT_DELIVERY_BASES = text(
+    """
+    INSERT INTO spimex_delivery_bases (delivery_basis_id, name)
+    SELECT * FROM unnest(CAST(:codes AS varchar[]), CAST(:names AS varchar[]))
+    ON CONFLICT (delivery_basis_id) DO UPDATE SET name = EXCLUDED.name
+    RETURNING delivery_basis_id, id
+    """
+)
+
+
+class DimensionCache:
+    """
+    Кэш суррогатных ключей справочников инструментов и базисов поставки
+
+    Загрузчик заменяет наименования в записях на ключи справочников.
+    Ключи известных кодов берутся из словарей в памяти процесса,
+    новые коды добавляются в справочники одним upsert на пачку записей.
+    Upsert выполняется отдельной транзакцией и фиксируется до загрузки
+    результатов торгов, поэтому в кэш не попадают ключи откатанных строк.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self._session_factory = session_factory
+        self.products: Dict[str, int] = {}
+        self.bases: Dict[str, int] = {}
+        # Параллельные даты с одинаковыми новыми кодами не дублируют upsert.
+        # Блокировка создается в работающем цикле событий: кэш создается
+        # при импорте модуля, а на Python 3.9 asyncio.Lock() привязывается
+        # к циклу в момент создания, а не к циклу asyncio.run()
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def resolve(self, records: List[dict]) -> List[dict]:
+        """
+        Заменить наименования в записях ключами справочников
+
+        Args:
+            records: Записи с exchange_product_name и delivery_basis_name
+
+        Returns:
+            Записи с product_key и basis_key вместо наименований
+        """
+        await self._upsert_missing(records)
+
+        resolved = []
+        for record in records:
+            record = dict(record)
+            del record["exchange_product_name"]
+            del record["delivery_basis_name"]
+            record["product_key"] = self.products[record["exchange_product_id"]]
+            record["basis_key"] = self.bases[record["delivery_basis_id"]]
+            resolved.append(record)
+        return resolved
+
+    async def _upsert_missing(self, records: List[dict]):
+        """Добавить в справочники коды, которых нет в кэше"""
+        products = self._missing(
+            records, self.products, "exchange_product_id", "exchange_product_name"
+        )
+        bases = self._missing(
+            records, self.bases, "delivery_basis_id", "delivery_basis_name"
+        )
+        if not products and not bases:
+            return
+
+        async with self._get_lock():
+            products = {c: n for c, n in products.items() if c not in self.products}
+            bases = {c: n for c, n in bases.items() if c not in self.bases}
+            if not products and not bases:
+                return
+
+            async with self._session_factory() as session:
+                fetched_products = await self._upsert(
+                    session, UPSERT_PRODUCTS, products
+                )
+                fetched_bases = await self._upsert(
+                    session, UPSERT_DELIVERY_BASES, bases
+                )
+                await session.commit()
+
+            self.products.update(fetched_products)
+            self.bases.update(fetched_bases)
+
+    def _get_lock(self) -> asyncio.Lock:
+        """Блокировка upsert, принадлежащая текущему циклу событий"""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    @staticmethod
+    def _missing(
+        records: List[dict], known: Dict[str, int], code_field: str, name_field: str
+    ) -> Dict[str, str]:
+        """Коды (с наименованиями) из записей, отсутствующие в кэше"""
+        return {
+            record[code_field]: record[name_field]
+            for record in records
+            if record[code_field] not in known
+        }
+
+    @staticmethod
+    async def _upsert(
+        session: AsyncSession, statement, members: Dict[str, str]
+    ) -> Dict[str, int]:
+        """Upsert кодов справочника, возвращает код -> ключ"""
+        if not members:
+            return {}
+
+        # Коды по порядку: параллельные загрузчики блокируют строки
+        # справочника в одном порядке и не попадают во взаимоблокировку
+        codes = sorted(members)
+        result = await session.execute(
+            statement, {"codes": codes, "names": [members[c] for c in codes]}
+        )
+        return {code: key for code, key in result.all()}
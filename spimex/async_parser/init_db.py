@@ -3,8 +3,14 @@ import sys
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import OperationalError
 from config import ASYNC_SQLALCHEMY_DATABASE_URL, DB_NAME
-from database import async_engine, Base
+from database import async_engine, AsyncSessionLocal, Base
 from models.trading_result import TradingResult
+from models.trading_rollup import TradingDailyRollup  # noqa: F401
+from models.trading_date import TradingDate  # noqa: F401
+from models.product import Product  # noqa: F401
+from models.delivery_basis import DeliveryBasis  # noqa: F401
+from models.rejected_record import RejectedRecord  # noqa: F401
+from rollups import rebuild_rollups
 
 
 def create_database_if_not_exists():
@@ -59,6 +65,11 @@ async def init_async_database():
 
         print("✅ Асинхронные таблицы успешно созданы!")
 
+        async with AsyncSessionLocal() as session:
+            await rebuild_rollups(session)
+            await session.commit()
+        print("✅ Дневные агрегаты и торговый календарь пересчитаны")
+
         tables = Base.metadata.tables.keys()
         print(f"📋 Созданные таблицы: {list(tables)}")
 
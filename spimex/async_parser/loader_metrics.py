@@ -0,0 +1,110 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    push_to_gateway,
+)
+from config import PUSHGATEWAY_URL
+
+
+# Загрузчик - короткоживущий процесс: метрики собираются в отдельном
+# реестре и отправляются в Pushgateway в конце запуска
+registry = CollectorRegistry()
+
+DATES_PROCESSED = Counter(
+    "spimex_loader_dates_total",
+    "Обработанные даты по результату "
+    "(loaded, rejected, exists, no_file, no_data, error)",
+    ["status"],
+    registry=registry,
+)
+ROWS_LOADED = Counter(
+    "spimex_loader_rows_total",
+    "Загруженные записи результатов торгов",
+    registry=registry,
+)
+ROWS_REJECTED = Counter(
+    "spimex_loader_rows_rejected_total",
+    "Строки бюллетеня, отправленные в карантин, по причине",
+    ["reason"],
+    registry=registry,
+)
+DOWNLOAD_BYTES = Histogram(
+    "spimex_loader_download_bytes",
+    "Размер скачанного файла бюллетеня",
+    buckets=(16384, 65536, 262144, 1048576, 4194304, 16777216),
+    registry=registry,
+)
+STAGE_DURATION = Histogram(
+    "spimex_loader_stage_duration_seconds",
+    "Время этапа загрузки (locate - поиск файлов периода, download, parse, db)",
+    ["stage"],
+    registry=registry,
+)
+DB_QUERY_DURATION = Histogram(
+    "spimex_db_query_duration_seconds",
+    "Время запросов к БД по методу загрузчика",
+    ["method"],
+    registry=registry,
+)
+DB_ROWS = Histogram(
+    "spimex_db_rows_written",
+    "Количество строк, записанных в БД за одну операцию",
+    ["method"],
+    buckets=(0, 1, 10, 100, 1000, 10000, 100000),
+    registry=registry,
+)
+RUN_DURATION = Gauge(
+    "spimex_loader_run_duration_seconds",
+    "Длительность последнего запуска загрузчика",
+    registry=registry,
+)
+LAST_SUCCESS = Gauge(
+    "spimex_loader_last_success_timestamp_seconds",
+    "Время последнего успешного запуска загрузчика (unix time)",
+    registry=registry,
+)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """Замерить время этапа загрузки даты"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def observe_query(method: str, rows: int) -> Iterator[None]:
+    """Замерить время операции загрузчика с БД и количество записанных строк"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        DB_QUERY_DURATION.labels(method).observe(time.perf_counter() - started)
+        DB_ROWS.labels(method).observe(rows)
+
+
+def push_metrics(job: str = "spimex_loader") -> bool:
+    """
+    Отправить метрики загрузчика в Pushgateway
+
+    Returns:
+        True, если метрики отправлены; False, если PUSHGATEWAY_URL
+        не задан или Pushgateway недоступен
+    """
+    if not PUSHGATEWAY_URL:
+        return False
+    try:
+        push_to_gateway(PUSHGATEWAY_URL, job=job, registry=registry)
+        return True
+    except Exception as e:
+        print(f"⚠️ Не удалось отправить метрики в Pushgateway: {e}")
+        return False
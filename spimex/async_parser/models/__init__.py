@@ -1,23 +1,45 @@
 from .trading_result import TradingResult
+from .trading_rollup import TradingDailyRollup
+from .trading_date import TradingDate
+from .product import Product
+from .delivery_basis import DeliveryBasis
+from .rejected_record import RejectedRecord
 from .schemas import (
     TradingResultItem,
     TradingResultFilter,
     DynamicsFilter,
+    DynamicsBatchRequest,
+    ExportFilter,
     TradingResultResponse,
     TradingDynamicsResponse,
+    DynamicsBatchResponse,
     LastTradingDatesResponse,
     ErrorResponse,
     CacheStatsResponse,
+    AggregateFilter,
+    AggregateItem,
+    AggregateResponse,
 )
 
 __all__ = [
     "TradingResult",
+    "TradingDailyRollup",
+    "TradingDate",
+    "Product",
+    "DeliveryBasis",
+    "RejectedRecord",
     "TradingResultItem",
     "TradingResultFilter",
     "DynamicsFilter",
+    "DynamicsBatchRequest",
+    "ExportFilter",
     "TradingResultResponse",
     "TradingDynamicsResponse",
+    "DynamicsBatchResponse",
     "LastTradingDatesResponse",
     "ErrorResponse",
     "CacheStatsResponse",
+    "AggregateFilter",
+    "AggregateItem",
+    "AggregateResponse",
 ]
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, SmallInteger, String
+from database import Base
+
+
+class DeliveryBasis(Base):
+    """Справочник базисов поставки (код и наименование)"""
+
+    __tablename__ = "spimex_delivery_bases"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=True)
+    delivery_basis_id = Column(String(3), nullable=False, unique=True)
+    name = Column(String, nullable=False)
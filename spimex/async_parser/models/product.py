@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String
+from database import Base
+
+
+class Product(Base):
+    """Справочник биржевых инструментов (код и наименование)"""
+
+    __tablename__ = "spimex_products"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    exchange_product_id = Column(String, nullable=False, unique=True)
+    name = Column(String, nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from database import Base
+
+
+class RejectedRecord(Base):
+    """Карантин строк бюллетеня, не прошедших проверку при загрузке"""
+
+    __tablename__ = "spimex_rejected_records"
+    __table_args__ = (Index("ix_spimex_rejected_records_date", "date"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    date = Column(Date, nullable=False)
+    # Исходный код инструмента как в файле (может быть некорректным)
+    exchange_product_id = Column(String, nullable=True)
+    reason = Column(String(32), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_on = Column(DateTime, nullable=False)
@@ -1,9 +1,53 @@
 from pydantic import BaseModel, validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import date, datetime
+import base64
+import binascii
 import hashlib
 
 
+def encode_cursor(last_date: date, last_id: int) -> str:
+    """Кодирует позицию (date, id) в непрозрачный курсор"""
+    raw = f"{last_date.isoformat()}:{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """Декодирует курсор в позицию (date, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, id_part = raw.split(":")
+        return date.fromisoformat(date_part), int(id_part)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Некорректный курсор пагинации")
+
+
+def _check_identifier(cls, v, field):
+    if v is not None and not v.isalnum():
+        raise ValueError(f"{field.name} должен содержать только буквы и цифры")
+    return v
+
+
+def identifier_validator(*fields: str):
+    """Валидатор идентификаторов (oil_id, ...): только буквы и цифры"""
+    return validator(*fields, allow_reuse=True)(_check_identifier)
+
+
+class DateRangeFilter(BaseModel):
+    """Фильтр за период: общая проверка дат для фильтров по периоду"""
+
+    start_date: date
+    end_date: date
+
+    @validator("end_date")
+    def validate_date_range(cls, v, values):
+        start_date = values.get("start_date")
+        if start_date is not None and start_date > v:
+            raise ValueError("Дата начала не может быть больше даты окончания")
+        return v
+
+
 class TradingResultItem(BaseModel):
     """Элемент результата торгов"""
 
@@ -37,23 +81,9 @@ class TradingResultFilter(BaseModel):
     delivery_basis_id: Optional[str] = None
     limit: int = 100
 
-    @validator("oil_id")
-    def validate_oil_id(cls, v):
-        if v is not None and not v.isalnum():
-            raise ValueError("oil_id должен содержать только буквы и цифры")
-        return v
-
-    @validator("delivery_type_id")
-    def validate_delivery_type_id(cls, v):
-        if v is not None and not v.isalnum():
-            raise ValueError("delivery_type_id должен содержать только буквы и цифры")
-        return v
-
-    @validator("delivery_basis_id")
-    def validate_delivery_basis_id(cls, v):
-        if v is not None and not v.isalnum():
-            raise ValueError("delivery_basis_id должен содержать только буквы и цифры")
-        return v
+    _validate_ids = identifier_validator(
+        "oil_id", "delivery_type_id", "delivery_basis_id"
+    )
 
     def cache_key(self) -> str:
         """Генерирует ключ для кэширования"""
@@ -61,40 +91,109 @@ class TradingResultFilter(BaseModel):
         return hashlib.md5(params.encode()).hexdigest()
 
 
-class DynamicsFilter(BaseModel):
+class DynamicsFilter(DateRangeFilter):
     """Фильтр для получения динамики торгов"""
 
-    start_date: date
-    end_date: date
     oil_id: Optional[str] = None
     delivery_type_id: Optional[str] = None
     delivery_basis_id: Optional[str] = None
     limit: int = 1000
+    cursor: Optional[str] = None
 
-    @validator("oil_id")
-    def validate_oil_id(cls, v):
-        if v is not None and not v.isalnum():
-            raise ValueError("oil_id должен содержать только буквы и цифры")
+    _validate_ids = identifier_validator(
+        "oil_id", "delivery_type_id", "delivery_basis_id"
+    )
+
+    @validator("cursor")
+    def validate_cursor(cls, v):
+        if v is not None:
+            decode_cursor(v)
         return v
 
-    @validator("delivery_type_id")
-    def validate_delivery_type_id(cls, v):
-        if v is not None and not v.isalnum():
-            raise ValueError("delivery_type_id должен содержать только буквы и цифры")
+    def cache_key(self) -> str:
+        """Генерирует ключ для кэширования"""
+        params = f"{self.start_date}:{self.end_date}:{self.oil_id}:{self.delivery_type_id}:{self.delivery_basis_id}:{self.limit}:{self.cursor}"
+        return hashlib.md5(params.encode()).hexdigest()
+
+
+class DynamicsBatchRequest(BaseModel):
+    """Пакетный запрос динамики торгов: имя запроса -> фильтр"""
+
+    queries: Dict[str, DynamicsFilter]
+
+    @validator("queries")
+    def validate_queries(cls, v):
+        if not v:
+            raise ValueError("queries не может быть пустым")
+        for name, filter_params in v.items():
+            if not 1 <= filter_params.limit <= 10000:
+                raise ValueError(f"{name}: limit должен быть в диапазоне 1-10000")
+        return v
+
+
+class ExportFilter(DateRangeFilter):
+    """Фильтр для потоковой выгрузки результатов торгов"""
+
+    oil_id: Optional[str] = None
+    delivery_type_id: Optional[str] = None
+    delivery_basis_id: Optional[str] = None
+    format: str = "ndjson"
+
+    _validate_ids = identifier_validator(
+        "oil_id", "delivery_type_id", "delivery_basis_id"
+    )
+
+    @validator("format")
+    def validate_format(cls, v):
+        if v not in ("ndjson", "csv"):
+            raise ValueError("format должен быть ndjson или csv")
         return v
 
-    @validator("delivery_basis_id")
-    def validate_delivery_basis_id(cls, v):
-        if v is not None and not v.isalnum():
-            raise ValueError("delivery_basis_id должен содержать только буквы и цифры")
+
+class AggregateFilter(DateRangeFilter):
+    """Фильтр для получения агрегатов торгов по периодам"""
+
+    bucket: str = "day"
+    oil_id: Optional[str] = None
+    delivery_basis_id: Optional[str] = None
+    limit: int = 1000
+
+    _validate_ids = identifier_validator("oil_id", "delivery_basis_id")
+
+    @validator("bucket")
+    def validate_bucket(cls, v):
+        if v not in ("day", "week", "month"):
+            raise ValueError("bucket должен быть day, week или month")
         return v
 
     def cache_key(self) -> str:
         """Генерирует ключ для кэширования"""
-        params = f"{self.start_date}:{self.end_date}:{self.oil_id}:{self.delivery_type_id}:{self.delivery_basis_id}:{self.limit}"
+        params = f"{self.start_date}:{self.end_date}:{self.bucket}:{self.oil_id}:{self.delivery_basis_id}:{self.limit}"
         return hashlib.md5(params.encode()).hexdigest()
 
 
+class AggregateItem(BaseModel):
+    """Агрегат торгов за период по нефтепродукту и базису поставки"""
+
+    period_start: date
+    oil_id: str
+    delivery_basis_id: str
+    volume: float
+    total: float
+    count: int
+    records: int
+    avg_price: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    open_price: Optional[float] = None
+    close_price: Optional[float] = None
+
+    class Config:
+        json_encoders = {
+            date: lambda v: v.isoformat(),
+        }
+
+
 class TradingResultResponse(BaseModel):
     """Ответ с результатами торгов"""
 
@@ -109,6 +208,22 @@ class TradingDynamicsResponse(BaseModel):
     results: List[TradingResultItem]
     count: int
     filter: Dict[str, Any]
+    next_cursor: Optional[str] = None
+
+
+class DynamicsBatchResponse(BaseModel):
+    """Ответ на пакетный запрос динамики торгов"""
+
+    results: Dict[str, TradingDynamicsResponse]
+    count: int
+
+
+class AggregateResponse(BaseModel):
+    """Ответ с агрегатами торгов"""
+
+    results: List[AggregateItem]
+    count: int
+    filter: Dict[str, Any]
 
 
 class LastTradingDatesResponse(BaseModel):
@@ -145,6 +260,9 @@ class CacheStatsResponse(BaseModel):
     misses: int
     hit_rate: float
     expires_at: Optional[datetime] = None
+    codec: Dict[str, Any] = {}
+    namespaces: Dict[str, Dict[str, Any]] = {}
+    response_bodies: Dict[str, Any] = {}
 
     class Config:
         json_encoders = {
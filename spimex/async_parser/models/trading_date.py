@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, Date, DateTime
+from database import Base
+
+
+class TradingDate(Base):
+    """Торговый календарь: загруженные даты и количество записей за дату"""
+
+    __tablename__ = "spimex_trading_dates"
+
+    date = Column(Date, primary_key=True)
+    row_count = Column(Integer, nullable=False)
+    loaded_on = Column(DateTime, nullable=False)
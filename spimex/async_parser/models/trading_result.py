@@ -1,20 +1,40 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime
+from sqlalchemy import (
+    Column,
+    Integer,
+    SmallInteger,
+    String,
+    Float,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+)
 from database import Base
 
 
 class TradingResult(Base):
     __tablename__ = "spimex_trading_results"
+    __table_args__ = (
+        # Индекс для выборок по периоду и keyset-пагинации (date, id)
+        Index("ix_spimex_trading_results_date_id", "date", "id"),
+        # Месячные секции по дате торгов создает загрузчик (partitions.py)
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
 
-    id = Column(Integer, primary_key=True)
+    # Первичный ключ секционированной таблицы включает ключ секционирования
+    id = Column(Integer, primary_key=True, autoincrement=True)
     exchange_product_id = Column(String, nullable=False)
-    exchange_product_name = Column(String, nullable=False)
+    # Наименования инструмента и базиса хранятся в справочниках
+    product_key = Column(Integer, ForeignKey("spimex_products.id"), nullable=False)
     oil_id = Column(String(4), nullable=False)
     delivery_basis_id = Column(String(3), nullable=False)
-    delivery_basis_name = Column(String, nullable=False)
+    basis_key = Column(
+        SmallInteger, ForeignKey("spimex_delivery_bases.id"), nullable=False
+    )
     delivery_type_id = Column(String(1), nullable=False)
     volume = Column(Float, nullable=False)
     total = Column(Float, nullable=False)
     count = Column("contract_count", Integer, nullable=False)
-    date = Column(Date, nullable=False)
+    date = Column(Date, primary_key=True)
     created_on = Column(DateTime, nullable=False)
     updated_on = Column(DateTime, nullable=False)
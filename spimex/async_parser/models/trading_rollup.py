@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index
+from database import Base
+
+
+class TradingDailyRollup(Base):
+    """Дневные агрегаты торгов по нефтепродукту и базису поставки"""
+
+    __tablename__ = "spimex_trading_daily_rollups"
+    __table_args__ = (
+        Index(
+            "ix_spimex_trading_daily_rollups_oil_basis_date",
+            "oil_id",
+            "delivery_basis_id",
+            "date",
+        ),
+    )
+
+    date = Column(Date, primary_key=True)
+    oil_id = Column(String(4), primary_key=True)
+    delivery_basis_id = Column(String(3), primary_key=True)
+    volume = Column(Float, nullable=False)
+    total = Column(Float, nullable=False)
+    count = Column("contract_count", Integer, nullable=False)
+    records = Column(Integer, nullable=False)
+    min_price = Column(Float, nullable=True)
+    max_price = Column(Float, nullable=True)
+    updated_on = Column(DateTime, nullable=False)
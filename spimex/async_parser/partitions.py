@@ -0,0 +1,105 @@
+from datetime import date
+from typing import Iterable, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+PARENT_TABLE = "spimex_trading_results"
+
+# relkind 'p' - секционированная таблица; на БД без миграции 0002
+# таблица обычная, и секции не создаются
+IS_PARTITIONED = text(
+    "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table_name)"
+)
+
+EXISTING_PARTITIONS = text(
+    """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.oid = to_regclass(:table_name)
+    """
+)
+
+
+def month_start(day: date) -> date:
+    """Первый день месяца"""
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    """Первый день следующего месяца"""
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Имя месячной секции, например spimex_trading_results_y2024m01"""
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def create_partition_sql(month: date) -> str:
+    """DDL месячной секции [month; следующий месяц)"""
+    month = month_start(month)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+        f"PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    )
+
+
+def months_between(first: date, last: date) -> List[date]:
+    """Первые дни всех месяцев от first до last включительно"""
+    months = []
+    current = month_start(first)
+    while current <= last:
+        months.append(current)
+        current = next_month(current)
+    return months
+
+
+async def ensure_partitions(
+    session: AsyncSession, dates: Iterable[date], months_ahead: int = 1
+) -> List[str]:
+    """
+    Создать недостающие месячные секции для дат загрузки
+
+    Вызывается загрузчиком один раз перед параллельной загрузкой дат,
+    отдельной короткой транзакцией: создание секции блокирует
+    родительскую таблицу. Дополнительно создаются months_ahead
+    будущих секций после последней даты.
+
+    Args:
+        session: Сессия БД
+        dates: Даты, которые будут загружены
+        months_ahead: Сколько секций создать заранее
+
+    Returns:
+        Имена созданных секций
+    """
+    dates = sorted(dates)
+    if not dates:
+        return []
+
+    result = await session.execute(IS_PARTITIONED, {"table_name": PARENT_TABLE})
+    if not result.scalar():
+        return []
+
+    last = dates[-1]
+    for _ in range(months_ahead):
+        last = next_month(last)
+
+    result = await session.execute(EXISTING_PARTITIONS, {"table_name": PARENT_TABLE})
+    existing = set(result.scalars().all())
+
+    created = []
+    for month in months_between(dates[0], last):
+        if partition_name(month) not in existing:
+            await session.execute(text(create_partition_sql(month)))
+            created.append(partition_name(month))
+
+    await session.commit()
+    return created
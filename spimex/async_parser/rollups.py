@@ -0,0 +1,149 @@
+from datetime import date
+from typing import List
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from constants import TRADING_DATES_CHANNEL
+
+
+# Пересчет дневных агрегатов из сырых результатов торгов.
+# Цена сделки - стоимость договоров, деленная на объем.
+_ROLLUP_UPSERT_SQL = """
+INSERT INTO spimex_trading_daily_rollups (
+    date, oil_id, delivery_basis_id, volume, total, contract_count,
+    records, min_price, max_price, updated_on
+)
+SELECT
+    date,
+    oil_id,
+    delivery_basis_id,
+    SUM(volume),
+    SUM(total),
+    SUM(contract_count),
+    COUNT(*),
+    MIN(CASE WHEN volume > 0 THEN total / volume END),
+    MAX(CASE WHEN volume > 0 THEN total / volume END),
+    now()
+FROM spimex_trading_results
+{where}
+GROUP BY date, oil_id, delivery_basis_id
+ON CONFLICT (date, oil_id, delivery_basis_id) DO UPDATE SET
+    volume = EXCLUDED.volume,
+    total = EXCLUDED.total,
+    contract_count = EXCLUDED.contract_count,
+    records = EXCLUDED.records,
+    min_price = EXCLUDED.min_price,
+    max_price = EXCLUDED.max_price,
+    updated_on = EXCLUDED.updated_on
+"""
+
+REFRESH_DAILY_ROLLUP = text(_ROLLUP_UPSERT_SQL.format(where="WHERE date = :date_val"))
+REBUILD_ROLLUPS = text(_ROLLUP_UPSERT_SQL.format(where=""))
+
+# Торговый календарь: дата и количество загруженных записей
+_TRADING_DATES_UPSERT_SQL = """
+INSERT INTO spimex_trading_dates (date, row_count, loaded_on)
+SELECT date, COUNT(*), now()
+FROM spimex_trading_results
+{where}
+GROUP BY date
+ON CONFLICT (date) DO UPDATE SET
+    row_count = EXCLUDED.row_count,
+    loaded_on = EXCLUDED.loaded_on
+"""
+
+# Upsert даты и уведомление подписчиков API. NOTIFY внутри транзакции
+# доставляется только после коммита, вместе с данными торгов. Уведомление
+# о новой дате отправляется, только если в календаре нет более поздней
+# даты: загрузка истории не сбрасывает кэш на каждую дату и не рассылается
+# подписчикам SSE как новые торги (см. NOTIFY_BACKFILL).
+REFRESH_TRADING_DATE = text(
+    "WITH upserted AS ("
+    + _TRADING_DATES_UPSERT_SQL.format(where="WHERE date = :date_val")
+    + "RETURNING date, row_count) "
+    "SELECT pg_notify(:channel, json_build_object("
+    "'type', 'trading_date', 'date', date, 'row_count', row_count)::text) "
+    "FROM upserted WHERE NOT EXISTS ("
+    "SELECT 1 FROM spimex_trading_dates later WHERE later.date > upserted.date)"
+)
+
+# Одно уведомление за запуск загрузчика, если загружены даты старше
+# последней торговой даты (загрузка истории): API сбрасывает кэш один раз
+NOTIFY_BACKFILL = text(
+    """
+    SELECT pg_notify(:channel, json_build_object(
+        'type', 'backfill',
+        'start', CAST(:start AS date),
+        'end', CAST(:end AS date),
+        'dates', CAST(:dates AS integer)
+    )::text)
+    WHERE CAST(:start AS date) < (SELECT max(date) FROM spimex_trading_dates)
+    """
+)
+REBUILD_TRADING_DATES = text(_TRADING_DATES_UPSERT_SQL.format(where=""))
+
+GET_TRADING_DATE_ROW_COUNT = text(
+    "SELECT row_count FROM spimex_trading_dates WHERE date = :date_val"
+)
+
+
+async def refresh_daily_rollup(session: AsyncSession, trade_date: date):
+    """
+    Пересчитать дневные агрегаты за одну торговую дату
+
+    Выполняется в транзакции загрузчика, поэтому агрегаты фиксируются
+    атомарно вместе с сырыми данными.
+    """
+    await session.execute(REFRESH_DAILY_ROLLUP, {"date_val": trade_date})
+
+
+async def rebuild_rollups(session: AsyncSession):
+    """Пересчитать дневные агрегаты и торговый календарь за все даты"""
+    await session.execute(REBUILD_ROLLUPS)
+    await session.execute(REBUILD_TRADING_DATES)
+
+
+async def refresh_trading_date(session: AsyncSession, trade_date: date):
+    """
+    Добавить дату в торговый календарь (в транзакции загрузчика)
+
+    После коммита API получает уведомление в канале TRADING_DATES_CHANNEL,
+    если дата - последняя в календаре.
+    """
+    await session.execute(
+        REFRESH_TRADING_DATE,
+        {"date_val": trade_date, "channel": TRADING_DATES_CHANNEL},
+    )
+
+
+async def notify_backfill(session: AsyncSession, loaded_dates: List[date]):
+    """
+    Уведомить API о загрузке исторических дат одним сообщением
+
+    Уведомление отправляется, если среди загруженных дат есть более ранние,
+    чем последняя дата календаря (о ней API уже уведомлен при загрузке).
+    """
+    if not loaded_dates:
+        return
+    await session.execute(
+        NOTIFY_BACKFILL,
+        {
+            "channel": TRADING_DATES_CHANNEL,
+            "start": min(loaded_dates),
+            "end": max(loaded_dates),
+            "dates": len(loaded_dates),
+        },
+    )
+    await session.commit()
+
+
+async def get_loaded_row_count(session: AsyncSession, trade_date: date) -> int:
+    """
+    Количество уже загруженных записей за дату по торговому календарю
+
+    Returns:
+        Количество записей или 0, если дата не загружалась
+    """
+    result = await session.execute(
+        GET_TRADING_DATE_ROW_COUNT, {"date_val": trade_date}
+    )
+    return result.scalar() or 0
@@ -1,14 +1,43 @@
+import glob
+import os
+import tempfile
 import uvicorn
+
+os.environ.setdefault("DB_ENGINE_ROLE", "api")
+
 from config import api_settings
 
 
+def prepare_metrics_dir(workers: int):
+    """
+    Каталог метрик Prometheus для нескольких воркеров
+
+    Каждый воркер пишет метрики в файлы PROMETHEUS_MULTIPROC_DIR,
+    /metrics собирает их по всем процессам. Файлы прошлого запуска
+    удаляются, чтобы счетчики не суммировались с завершенными процессами.
+    """
+    if workers <= 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return
+
+    metrics_dir = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="spimex-metrics-")
+    )
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(path)
+
+
 def main():
     """Основная функция запуска API"""
+    workers = 1 if api_settings.DEBUG else api_settings.WORKERS
+    prepare_metrics_dir(workers)
+
     print("🚀 Запуск SPIMEX API из async_parser")
     print("=" * 50)
     print(f"🌐 Host: {api_settings.HOST}")
     print(f"🔌 Port: {api_settings.PORT}")
     print(f"🐛 Debug: {api_settings.DEBUG}")
+    print(f"👷 Workers: {workers}")
     print(
         f"📊 Database: {api_settings.DATABASE_URL.split('@')[-1] if '@' in api_settings.DATABASE_URL else 'Local'}"
     )
@@ -24,7 +53,7 @@ def main():
             log_level=api_settings.LOG_LEVEL.lower(),
             access_log=True,
             loop="asyncio",
-            workers=1 if api_settings.DEBUG else 4,
+            workers=workers,
         )
     except KeyboardInterrupt:
         print("\n🔄 Завершение работы по запросу пользователя")
@@ -2,6 +2,7 @@ import asyncio
 from datetime import timedelta, datetime
 from spimex_parser import parse_multiple_dates, clear_page_cache
 from constants import DATE_FORMAT
+from loader_metrics import RUN_DURATION, LAST_SUCCESS, push_metrics
 
 
 def generate_dates(start: datetime, end: datetime):
@@ -60,10 +61,17 @@ async def async_main():
         )
         print("=" * 70)
 
+        RUN_DURATION.set(processing_time.total_seconds())
+        LAST_SUCCESS.set_to_current_time()
+
     except Exception as e:
         print(f"❌ Критическая ошибка: {e}")
         return
 
+    finally:
+        if push_metrics():
+            print("📈 Метрики отправлены в Pushgateway")
+
 
 if __name__ == "__main__":
     asyncio.run(async_main())
@@ -1,12 +1,31 @@
-import re
 import asyncio
 import aiohttp
 import pandas as pd
 from io import BytesIO
 from datetime import datetime
+from typing import Dict, Optional
 from tqdm.asyncio import tqdm
+from sqlalchemy import delete
 from models.trading_result import TradingResult
+from models.rejected_record import RejectedRecord
 from database import AsyncSessionLocal
+from rollups import (
+    refresh_daily_rollup,
+    refresh_trading_date,
+    get_loaded_row_count,
+    notify_backfill,
+)
+from partitions import ensure_partitions
+from dimensions import DimensionCache
+from validation import split_valid_rows, rejected_records
+from loader_metrics import (
+    DATES_PROCESSED,
+    ROWS_LOADED,
+    ROWS_REJECTED,
+    DOWNLOAD_BYTES,
+    observe_stage,
+    observe_query,
+)
 from constants import (
     EXCEL_ENGINE,
     COLUMN_PATTERNS,
@@ -14,7 +33,6 @@ from constants import (
     DATE_FORMAT_SPIMEX,
     BASE_URL,
     PAGE_URL_PATTERN,
-    FILE_URL_PATTERN,
     ALL_FILES_PATTERN,
     RECORDS_TO_SAVE,
     METRIC_TON_MARKER,
@@ -23,9 +41,25 @@ from constants import (
     HTTP_TIMEOUT,
 )
 
+import sys
+from pathlib import Path
+
+project_path = Path(__file__).parent.parent
+sys.path.insert(0, str(project_path))
+
+from bulletin_locator import (
+    ListingUnavailable,
+    parse_listing,
+    range_search,
+    run_search_async,
+)
+
 
 PAGE_CACHE: dict = {}
 
+# Ключи справочников инструментов и базисов на время работы загрузчика
+DIMENSIONS = DimensionCache(AsyncSessionLocal)
+
 
 def clear_page_cache():
     """Очищает кэш страниц"""
@@ -130,168 +164,222 @@ def find_columns(columns):
     return column_mapping
 
 
-async def find_url_for_date(session: aiohttp.ClientSession, target_date: str):
-    """
-    Асинхронно ищет правильный URL для скачивания файла на конкретную дату
+async def fetch_listing_page(session: aiohttp.ClientSession, page_num: int):
     """
-    try:
-        date_obj = datetime.strptime(target_date, DATE_FORMAT)
-        date_formatted = date_obj.strftime(DATE_FORMAT_SPIMEX)
-
-        file_url, file_response, last_date, first_date = await search_in_page(
-            session,
-            BASE_URL,
-            date_formatted,
-            page_num=1,
-        )
-        if file_url:
-            return file_url, file_response
-
-        page_range = list(range(MAX_PAGES_TO_CHECK, 1, -1))
-
-        for page_num in page_range:
-            page_url = BASE_URL + PAGE_URL_PATTERN.format(page_num=page_num)
-            file_url, file_response, last_date, first_date = await search_in_page(
-                session,
-                page_url,
-                date_formatted,
-                page_num,
-            )
+    Асинхронно загружает страницу листинга бюллетеней
 
-            if last_date and last_date > date_formatted:
-                break
-
-            if first_date and first_date < date_formatted:
-                continue
-
-            if file_url:
-                return file_url, file_response
-
-        return None, None
-
-    except Exception as e:
-        print(f"⚠️ Ошибка при парсинге HTML: {e}")
-        return None, None
-
-
-async def search_in_page(
-    session: aiohttp.ClientSession,
-    page_url: str,
-    date_formatted: str,
-    page_num: int,
-):
-    """
-    Асинхронно ищет файл на конкретной странице
+    Returns:
+        Список (дата YYYYMMDD, URL файла), пустой для несуществующей
+        страницы, или None при ошибке загрузки
     """
-    global PAGE_CACHE
-
     if page_num in PAGE_CACHE:
-        cached_data = PAGE_CACHE[page_num]
-        first_file_date = cached_data["first_date"]
-        last_file_date = cached_data["last_date"]
+        return PAGE_CACHE[page_num]
 
-        if first_file_date and first_file_date < date_formatted:
-            return None, None, last_file_date, first_file_date
-    else:
-        try:
-            async with session.get(
-                page_url,
-                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
-            ) as response:
-                if response.status != 200:
-                    return None, None, None, None
-
-                html_content = await response.text()
-
-                all_files_pattern = ALL_FILES_PATTERN
-                all_matches = re.findall(all_files_pattern, html_content)
-
-                first_file_date = None
-                last_file_date = None
-                if all_matches:
-                    first_file_date = all_matches[0][1]
-                    last_file_date = all_matches[-1][1]
-
-                    PAGE_CACHE[page_num] = {
-                        "first_date": first_file_date,
-                        "last_date": last_file_date,
-                    }
-        except Exception:
-            return None, None, None, None
-
-        if first_file_date and first_file_date < date_formatted:
-            return None, None, last_file_date, first_file_date
+    page_url = BASE_URL
+    if page_num > 1:
+        page_url += PAGE_URL_PATTERN.format(page_num=page_num)
 
     try:
         async with session.get(
             page_url,
             timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
         ) as response:
+            # 404 - страницы нет (за концом листинга), прочие ответы -
+            # сбой, после которого страница запрашивается повторно
+            if response.status == 404:
+                return []
             if response.status != 200:
-                return (
-                    None,
-                    None,
-                    first_file_date if page_num in PAGE_CACHE else None,
-                    last_file_date if page_num in PAGE_CACHE else None,
-                )
+                return None
             html_content = await response.text()
     except Exception:
-        return (
-            None,
-            None,
-            first_file_date if page_num in PAGE_CACHE else None,
-            last_file_date if page_num in PAGE_CACHE else None,
-        )
+        return None
 
-    pattern = FILE_URL_PATTERN.format(date_formatted=date_formatted)
-    target_matches = re.findall(pattern, html_content)
+    entries = parse_listing(html_content, ALL_FILES_PATTERN)
+    PAGE_CACHE[page_num] = entries
+    return entries
 
-    if target_matches:
-        file_path = target_matches[0]
 
-        if file_path.startswith("/"):
-            file_url = f"https://spimex.com{file_path}"
-        else:
-            file_url = f"https://spimex.com/{file_path}"
+async def locate_range(
+    session: aiohttp.ClientSession, start: str, end: str
+) -> Dict[str, str]:
+    """
+    Асинхронно находит файлы бюллетеней за период (даты YYYY-MM-DD)
 
-        try:
-            async with session.get(
-                file_url,
-                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
-            ) as file_response:
-                if file_response.status == 200:
-                    file_content = await file_response.read()
-                    return (
-                        file_url,
-                        file_content,
-                        last_file_date if page_num in PAGE_CACHE else None,
-                        first_file_date if page_num in PAGE_CACHE else None,
-                    )
-        except Exception:
-            pass
+    Returns:
+        Словарь {дата YYYY-MM-DD: URL файла} для дат, по которым есть файл
 
-    return (
-        None,
-        None,
-        last_file_date if page_num in PAGE_CACHE else None,
-        first_file_date if page_num in PAGE_CACHE else None,
+    Raises:
+        ListingUnavailable: Страница листинга не загрузилась после повторов
+    """
+    search = range_search(
+        datetime.strptime(start, DATE_FORMAT).strftime(DATE_FORMAT_SPIMEX),
+        datetime.strptime(end, DATE_FORMAT).strftime(DATE_FORMAT_SPIMEX),
+        MAX_PAGES_TO_CHECK,
     )
+    found = await run_search_async(
+        search, lambda page_num: fetch_listing_page(session, page_num)
+    )
+    return {
+        datetime.strptime(file_date, DATE_FORMAT_SPIMEX).strftime(DATE_FORMAT): url
+        for file_date, url in found.items()
+    }
+
+
+async def download_file(session: aiohttp.ClientSession, file_url: str):
+    """Асинхронно скачивает файл бюллетеня (None при ошибке)"""
+    try:
+        async with session.get(
+            file_url,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        ) as file_response:
+            if file_response.status == 200:
+                return await file_response.read()
+    except Exception:
+        pass
+    return None
 
 
-async def parse_bulletin_for_date(session: aiohttp.ClientSession, date_str: str):
+async def find_url_for_date(session: aiohttp.ClientSession, target_date: str):
+    """
+    Асинхронно ищет URL файла на конкретную дату и скачивает его
+    """
+    try:
+        file_urls = await locate_range(session, target_date, target_date)
+    except Exception as e:
+        print(f"⚠️ Ошибка поиска файла в листинге: {e}")
+        return None, None
+
+    file_url = file_urls.get(target_date)
+    if not file_url:
+        return None, None
+
+    file_content = await download_file(session, file_url)
+    if file_content is None:
+        return None, None
+    return file_url, file_content
+
+
+async def parse_bulletin_for_date(
+    session: aiohttp.ClientSession,
+    date_str: str,
+    file_urls: Optional[Dict[str, str]] = None,
+):
     """
     Асинхронно парсит бюллетень по итогам торгов для указанной даты
+
+    Args:
+        file_urls: Файлы периода из locate_range; без него файл даты
+            ищется в листинге отдельно
     """
     print(f"Обработка даты: {date_str}")
 
-    url, response_content = await find_url_for_date(session, date_str)
+    with observe_stage("download"):
+        if file_urls is None:
+            url, response_content = await find_url_for_date(session, date_str)
+        else:
+            url = file_urls.get(date_str)
+            response_content = await download_file(session, url) if url else None
+            if response_content is None:
+                url = None
 
     if not url:
         print(f"❌ Не найден URL для даты {date_str}")
+        DATES_PROCESSED.labels("no_file").inc()
         return None
 
     print(f"📥 Найден URL: {url}")
+    DOWNLOAD_BYTES.observe(len(response_content))
+
+    with observe_stage("parse"):
+        parsed = parse_bulletin_records(response_content, date_str)
+
+    if parsed is None:
+        DATES_PROCESSED.labels("no_data").inc()
+        return None
+
+    records, rejected = parsed
+    if rejected:
+        print(f"⚠️ Строк в карантине на {date_str}: {len(rejected)}")
+
+    trade_date = pd.to_datetime(date_str).date()
+
+    with observe_stage("db"):
+        async with AsyncSessionLocal() as session_db:
+            try:
+                existing_count = await get_loaded_row_count(session_db, trade_date)
+
+                if existing_count > 0:
+                    print(
+                        f"ℹ️ Данные за {date_str} уже существуют в БД "
+                        f"({existing_count} записей), пропускаем"
+                    )
+                    DATES_PROCESSED.labels("exists").inc()
+                    return None
+
+                # Карантин даты заменяется целиком в той же транзакции,
+                # поэтому повторная загрузка даты его не дублирует
+                with observe_query("insert_rejected_records", len(rejected)):
+                    await session_db.execute(
+                        delete(RejectedRecord).where(RejectedRecord.date == trade_date)
+                    )
+                    for record in rejected:
+                        session_db.add(RejectedRecord(**record))
+                    await session_db.flush()
+
+                if not records:
+                    await session_db.commit()
+                    count_rejected(rejected)
+                    print(f"❌ Нет корректных записей на {date_str}")
+                    DATES_PROCESSED.labels("rejected").inc()
+                    return None
+
+                with observe_query("resolve_dimensions", len(records)):
+                    resolved = await DIMENSIONS.resolve(records)
+
+                with observe_query("insert_trading_results", len(records)):
+                    for record in resolved:
+                        trading_result = TradingResult(**record)
+                        session_db.add(trading_result)
+                    await session_db.flush()
+
+                with observe_query("refresh_rollups", 1):
+                    await refresh_daily_rollup(session_db, trade_date)
+                    await refresh_trading_date(session_db, trade_date)
+
+                await session_db.commit()
+                print(f"✅ Загружено записей: {len(records)}")
+                DATES_PROCESSED.labels("loaded").inc()
+                ROWS_LOADED.inc(len(records))
+                count_rejected(rejected)
+                return records
+
+            except Exception as e:
+                await session_db.rollback()
+                print(f"❌ Ошибка при сохранении в БД: {e}")
+                DATES_PROCESSED.labels("error").inc()
+                return None
+
+
+def count_rejected(rejected: list):
+    """
+    Учесть строки карантина в метриках
+
+    Вызывается после коммита карантина: дата, которая уже загружена или
+    не сохранилась из-за ошибки, строк в карантин не добавляет.
+    """
+    for record in rejected:
+        ROWS_REJECTED.labels(record["reason"]).inc()
+
+
+def parse_bulletin_records(response_content: bytes, date_str: str):
+    """
+    Разбирает Excel файл бюллетеня в записи для сохранения в БД
 
+    Returns:
+        Кортеж (записи с полями RECORDS_TO_SAVE, записи карантина для строк
+        с некорректным кодом инструмента или значениями) или None,
+        если данных нет
+    """
     df = None
     engine = EXCEL_ENGINE
 
@@ -318,56 +406,33 @@ async def parse_bulletin_for_date(session: aiohttp.ClientSession, date_str: str)
         print(f"ℹ️ Нет записей с количеством договоров > 0 на {date_str}")
         return None
 
-    df = df_metric_ton
-
-    df["oil_id"] = df["exchange_product_id"].str[:4]
-    df["delivery_basis_id"] = df["exchange_product_id"].str[4:7]
-    df["delivery_type_id"] = df["exchange_product_id"].str[-1]
+    df, df_rejected = split_valid_rows(df_metric_ton)
 
     df["date"] = pd.to_datetime(date_str)
     now = pd.Timestamp.now()
     df["created_on"] = now
     df["updated_on"] = now
 
-    records = df[RECORDS_TO_SAVE].to_dict(orient="records")
-
-    async with AsyncSessionLocal() as session_db:
-        try:
-            from sqlalchemy import text
-
-            existing_count_result = await session_db.execute(
-                text(
-                    "SELECT COUNT(*) FROM spimex_trading_results WHERE DATE(date) = :date_val"
-                ),
-                {"date_val": pd.to_datetime(date_str).date()},
-            )
-            existing_count = existing_count_result.scalar()
-
-            if existing_count > 0:
-                print(
-                    f"ℹ️ Данные за {date_str} уже существуют в БД "
-                    f"({existing_count} записей), пропускаем"
-                )
-                return None
-
-            for record in records:
-                trading_result = TradingResult(**record)
-                session_db.add(trading_result)
-
-            await session_db.commit()
-            print(f"✅ Загружено записей: {len(records)}")
-            return records
-
-        except Exception as e:
-            await session_db.rollback()
-            print(f"❌ Ошибка при сохранении в БД: {e}")
-            return None
+    return (
+        df[RECORDS_TO_SAVE].to_dict(orient="records"),
+        rejected_records(df_rejected, date_str),
+    )
 
 
 async def parse_multiple_dates(date_strings: list, max_concurrent: int = 50):
     """
     Асинхронно обрабатывает несколько дат параллельно
     """
+    if not date_strings:
+        return []
+
+    # Месячные секции создаются заранее, до параллельной загрузки
+    trade_dates = [datetime.strptime(d, DATE_FORMAT).date() for d in date_strings]
+    async with AsyncSessionLocal() as session_db:
+        created = await ensure_partitions(session_db, trade_dates)
+    if created:
+        print(f"🧩 Созданы секции: {', '.join(created)}")
+
     connector = aiohttp.TCPConnector(limit=100, limit_per_host=20)
     timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
 
@@ -375,13 +440,33 @@ async def parse_multiple_dates(date_strings: list, max_concurrent: int = 50):
         connector=connector,
         timeout=timeout,
     ) as session:
+        # Файлы всего периода находятся одним проходом по листингу;
+        # если листинг недоступен, файл каждой даты ищется отдельно
+        try:
+            with observe_stage("locate"):
+                file_urls = await locate_range(
+                    session, min(date_strings), max(date_strings)
+                )
+            print(f"🔎 Найдено файлов бюллетеней за период: {len(file_urls)}")
+        except ListingUnavailable as e:
+            print(f"⚠️ {e}, файлы ищутся по каждой дате отдельно")
+            file_urls = None
+
         semaphore = asyncio.Semaphore(max_concurrent)
 
         async def parse_with_semaphore(date_str):
             async with semaphore:
-                return await parse_bulletin_for_date(session, date_str)
+                return await parse_bulletin_for_date(session, date_str, file_urls)
 
         tasks = [parse_with_semaphore(date_str) for date_str in date_strings]
         results = await tqdm.gather(*tasks, desc="Обработка дат", unit="дата")
 
-        return results
+    loaded_dates = [
+        datetime.strptime(date_str, DATE_FORMAT).date()
+        for date_str, result in zip(date_strings, results)
+        if result is not None
+    ]
+    async with AsyncSessionLocal() as session_db:
+        await notify_backfill(session_db, loaded_dates)
+
+    return results
@@ -0,0 +1,89 @@
+import json
+from typing import Tuple
+
+import pandas as pd
+
+from constants import PRODUCT_CODE_PATTERN
+
+# Причины отклонения строки бюллетеня в порядке проверки
+REJECT_INVALID_CODE = "invalid_code"
+REJECT_MISSING_NAME = "missing_name"
+REJECT_INVALID_NUMBERS = "invalid_numbers"
+
+CODE_PARTS = ["oil_id", "delivery_basis_id", "delivery_type_id"]
+NAME_COLUMNS = ["exchange_product_name", "delivery_basis_name"]
+
+
+def split_valid_rows(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Разбирает коды инструментов и отделяет корректные строки от отклоненных
+
+    Код раскладывается одним регулярным выражением на всю колонку
+    (str.extract) вместо срезов .str[:4]/.str[4:7]/.str[-1], которые
+    пропускали в БД коды любой длины и состава. Отклоненные строки
+    получают колонку reject_reason - первую непройденную проверку.
+
+    Returns:
+        Кортеж (корректные строки с oil_id, delivery_basis_id
+        и delivery_type_id; отклоненные строки)
+    """
+    codes = df["exchange_product_id"].astype(str).str.strip()
+    parts = codes.str.extract(PRODUCT_CODE_PATTERN)
+
+    checks = [
+        (REJECT_INVALID_CODE, parts.isna().any(axis=1)),
+        (
+            REJECT_MISSING_NAME,
+            df[NAME_COLUMNS]
+            .apply(lambda col: col.isna() | (col.astype(str).str.strip() == ""))
+            .any(axis=1),
+        ),
+        (
+            REJECT_INVALID_NUMBERS,
+            df[["volume", "total"]].isna().any(axis=1)
+            | (df[["volume", "total"]] < 0).any(axis=1),
+        ),
+    ]
+
+    reason = pd.Series(None, index=df.index, dtype=object)
+    for name, failed in reversed(checks):
+        reason = reason.mask(failed, name)
+
+    rejected_mask = reason.notna()
+    valid = df[~rejected_mask].copy()
+    valid["exchange_product_id"] = codes[~rejected_mask]
+    valid[CODE_PARTS] = parts[~rejected_mask]
+
+    rejected = df[rejected_mask].copy()
+    rejected["reject_reason"] = reason[rejected_mask]
+    return valid, rejected
+
+
+def rejected_records(rejected: pd.DataFrame, date_str: str) -> list:
+    """
+    Записи карантина для отклоненных строк
+
+    В payload сохраняется исходная строка бюллетеня, чтобы после
+    исправления правил проверки ее можно было загрузить повторно
+    без скачивания файла.
+    """
+    payload_columns = [col for col in rejected.columns if col != "reject_reason"]
+    payloads = json.loads(
+        rejected[payload_columns].to_json(
+            orient="records", force_ascii=False, date_format="iso"
+        )
+    )
+    now = pd.Timestamp.now()
+    trade_date = pd.to_datetime(date_str).date()
+    return [
+        {
+            "date": trade_date,
+            "exchange_product_id": None if pd.isna(code) else str(code),
+            "reason": reason,
+            "payload": payload,
+            "created_on": now,
+        }
+        for code, reason, payload in zip(
+            rejected["exchange_product_id"], rejected["reject_reason"], payloads
+        )
+    ]
@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import asyncpg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "async_parser"))
+
+from config import ASYNC_SQLALCHEMY_DATABASE_URL  # noqa: E402
+
+SCHEMA = "spimex_bench"
+
+COLUMNS = """
+    id integer NOT NULL,
+    exchange_product_id varchar NOT NULL,
+    product_key integer NOT NULL,
+    oil_id varchar(4) NOT NULL,
+    delivery_basis_id varchar(3) NOT NULL,
+    basis_key smallint NOT NULL,
+    delivery_type_id varchar(1) NOT NULL,
+    volume float NOT NULL,
+    total float NOT NULL,
+    contract_count integer NOT NULL,
+    date date NOT NULL,
+    created_on timestamp NOT NULL,
+    updated_on timestamp NOT NULL
+"""
+
+# Синтетические торги: rows_per_day записей на каждый рабочий день,
+# 40 нефтепродуктов x 25 базисов с неравномерной частотой
+FILL_SQL = f"""
+INSERT INTO {SCHEMA}.plain
+SELECT
+    row_number() OVER (),
+    oil || basis || 'F',
+    oil_key * 100 + basis_key,
+    oil,
+    basis,
+    basis_key,
+    'F',
+    volume,
+    volume * (40000 + random() * 20000),
+    1 + (random() * 20)::int,
+    day,
+    day,
+    day
+FROM (
+    SELECT
+        day,
+        oil_key,
+        basis_key,
+        'A' || lpad(oil_key::text, 3, '0') AS oil,
+        'B' || lpad(basis_key::text, 2, '0') AS basis,
+        (1 + random() * 500)::int * 10.0 AS volume
+    FROM (
+        SELECT
+            day::date AS day,
+            1 + (power(random(), 2) * 40)::int AS oil_key,
+            1 + (power(random(), 3) * 25)::int AS basis_key
+        FROM generate_series($1::date, $2::date, interval '1 day') AS day
+        CROSS JOIN generate_series(1, $3::int)
+        WHERE extract(isodow FROM day) < 6
+    ) keys
+) rows
+"""
+
+QUERIES = {
+    "dynamics_month_oil": (
+        "SELECT * FROM {table} WHERE date >= $1 AND date <= $2 AND oil_id = $3 "
+        "ORDER BY date DESC, id DESC LIMIT 1000"
+    ),
+    "dynamics_week_all": (
+        "SELECT * FROM {table} WHERE date >= $1 AND date <= $2 "
+        "ORDER BY date DESC, id DESC LIMIT 1000"
+    ),
+    "trading_day": "SELECT * FROM {table} WHERE date = $1",
+    "quarter_totals": (
+        "SELECT oil_id, SUM(volume), SUM(total) FROM {table} "
+        "WHERE date >= $1 AND date <= $2 GROUP BY oil_id"
+    ),
+}
+
+
+def month_starts(first: date, last: date) -> List[date]:
+    """Первые дни месяцев от first до last включительно"""
+    months = []
+    current = first.replace(day=1)
+    while current <= last:
+        months.append(current)
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+async def prepare(conn: asyncpg.Connection, start: date, end: date, rows_per_day: int):
+    """Создать обычную и секционированную таблицы с одинаковыми данными"""
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+
+    await conn.execute(f"CREATE TABLE {SCHEMA}.plain ({COLUMNS}, PRIMARY KEY (id))")
+    await conn.execute(
+        f"CREATE TABLE {SCHEMA}.partitioned ({COLUMNS}, PRIMARY KEY (id, date)) "
+        "PARTITION BY RANGE (date)"
+    )
+    for month in month_starts(start, end):
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        await conn.execute(
+            f"CREATE TABLE {SCHEMA}.partitioned_y{month.year}m{month.month:02d} "
+            f"PARTITION OF {SCHEMA}.partitioned "
+            f"FOR VALUES FROM ('{month}') TO ('{next_month}')"
+        )
+
+    started = time.perf_counter()
+    await conn.execute(FILL_SQL, start, end, rows_per_day)
+    await conn.execute(f"INSERT INTO {SCHEMA}.partitioned SELECT * FROM {SCHEMA}.plain")
+    for table in ("plain", "partitioned"):
+        await conn.execute(
+            f"CREATE INDEX ON {SCHEMA}.{table} (date, id)"
+        )
+        await conn.execute(f"ANALYZE {SCHEMA}.{table}")
+
+    rows = await conn.fetchval(f"SELECT count(*) FROM {SCHEMA}.plain")
+    print(f"📦 Сгенерировано записей: {rows:,} за {time.perf_counter() - started:.1f}с")
+
+
+def query_args(name: str, start: date, end: date, oils: List[str]) -> Tuple:
+    """Случайные параметры запроса в пределах периода данных"""
+    span = (end - start).days
+    day = start + timedelta(days=random.randint(0, span))
+    if name == "dynamics_month_oil":
+        return day, min(day + timedelta(days=30), end), random.choice(oils)
+    if name == "dynamics_week_all":
+        return day, min(day + timedelta(days=7), end)
+    if name == "trading_day":
+        return (day,)
+    return day, min(day + timedelta(days=91), end)
+
+
+async def measure(
+    conn: asyncpg.Connection, start: date, end: date, iterations: int
+) -> Dict[str, Dict[str, List[float]]]:
+    """Время выполнения запросов (мс) к обеим таблицам на одинаковых параметрах"""
+    oils = [
+        row["oil_id"]
+        for row in await conn.fetch(f"SELECT DISTINCT oil_id FROM {SCHEMA}.plain")
+    ]
+    timings: Dict[str, Dict[str, List[float]]] = {}
+
+    for name, sql in QUERIES.items():
+        statements = {
+            table: await conn.prepare(sql.format(table=f"{SCHEMA}.{table}"))
+            for table in ("plain", "partitioned")
+        }
+        timings[name] = {table: [] for table in statements}
+
+        for _ in range(iterations):
+            args = query_args(name, start, end, oils)
+            for table, statement in statements.items():
+                started = time.perf_counter()
+                await statement.fetch(*args)
+                timings[name][table].append((time.perf_counter() - started) * 1000)
+
+    return timings
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Перцентиль по отсортированной выборке"""
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def report(timings: Dict[str, Dict[str, List[float]]]):
+    """Таблица p50/p95 по запросам и ускорение секционированной таблицы"""
+    print("\n" + "=" * 78)
+    print(
+        f"{'Запрос':<22}{'plain p50':>11}{'p95':>9}"
+        f"{'part p50':>11}{'p95':>9}{'ускорение p50':>16}"
+    )
+    print("-" * 78)
+    for name, tables in timings.items():
+        plain, part = tables["plain"], tables["partitioned"]
+        plain_p50, part_p50 = statistics.median(plain), statistics.median(part)
+        print(
+            f"{name:<22}{plain_p50:>9.2f}мс{percentile(plain, 95):>7.2f}мс"
+            f"{part_p50:>9.2f}мс{percentile(part, 95):>7.2f}мс"
+            f"{plain_p50 / part_p50 if part_p50 else 0:>15.2f}x"
+        )
+    print("=" * 78)
+
+
+async def run(args: argparse.Namespace):
+    end = date.today()
+    start = end - timedelta(days=365 * args.years)
+    dsn = ASYNC_SQLALCHEMY_DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+    print("🏁 SPIMEX - бенчмарк секционирования spimex_trading_results")
+    print("=" * 78)
+    print(f"📅 Период: {start} - {end}, записей в день: {args.rows_per_day}")
+    print(f"🔁 Повторов каждого запроса: {args.iterations}")
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await prepare(conn, start, end, args.rows_per_day)
+        timings = await measure(conn, start, end, args.iterations)
+        report(timings)
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(
+        description="Сравнение задержек запросов к обычной и секционированной таблице"
+    )
+    parser.add_argument("--years", type=int, default=3, help="Лет синтетических данных")
+    parser.add_argument(
+        "--rows-per-day", type=int, default=2000, help="Записей за торговый день"
+    )
+    parser.add_argument("--iterations", type=int, default=50, help="Повторов запроса")
+    parser.add_argument(
+        "--keep", action="store_true", help=f"Не удалять схему {SCHEMA} после прогона"
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+import re
+import time
+from typing import Awaitable, Callable, Dict, Generator, List, Optional, Tuple
+
+SPIMEX_HOST = "https://spimex.com"
+
+# Файл в листинге: (дата торгов YYYYMMDD, URL файла бюллетеня)
+ListingEntry = Tuple[str, str]
+# Поиск запрашивает номер страницы и получает ее файлы
+RangeSearch = Generator[int, List[ListingEntry], Dict[str, str]]
+
+# Попыток загрузки страницы листинга и пауза между ними (секунды)
+PAGE_FETCH_ATTEMPTS = 3
+PAGE_RETRY_DELAY = 1.0
+
+
+class ListingUnavailable(Exception):
+    """Страницу листинга не удалось загрузить - результат поиска неполон"""
+
+    def __init__(self, page_num: int):
+        super().__init__(f"Страница листинга {page_num} недоступна")
+        self.page_num = page_num
+
+
+def absolute_url(file_path: str) -> str:
+    """URL файла по ссылке со страницы листинга"""
+    if file_path.startswith("http"):
+        return file_path
+    if file_path.startswith("/"):
+        return f"{SPIMEX_HOST}{file_path}"
+    return f"{SPIMEX_HOST}/{file_path}"
+
+
+def parse_listing(html_content: str, pattern: str) -> List[ListingEntry]:
+    """
+    Файлы бюллетеней на странице листинга в порядке страницы
+
+    Args:
+        html_content: HTML страницы
+        pattern: Регулярное выражение ссылки с группами (путь, дата YYYYMMDD)
+    """
+    return [
+        (file_date, absolute_url(file_path))
+        for file_path, file_date in re.findall(pattern, html_content)
+    ]
+
+
+def range_search(start: str, end: str, max_pages: int) -> RangeSearch:
+    """
+    Поиск файлов бюллетеней за период start..end (YYYYMMDD включительно)
+
+    Листинг отсортирован от новых дат к старым: страница 1 - самые свежие
+    бюллетени. Бинарным поиском находится первая страница, на которой
+    есть даты не новее end (пустая страница - за концом листинга), затем
+    страницы читаются подряд, пока не встретится дата старше start.
+    Всего O(log max_pages + страниц периода) загрузок.
+
+    Поиск не выполняет запросы сам: генератор отдает номер нужной
+    страницы и получает ее файлы через send(), поэтому один алгоритм
+    работает и с requests (run_search), и с aiohttp (run_search_async).
+
+    Returns:
+        Словарь {дата YYYYMMDD: URL файла}; для даты с несколькими
+        файлами берется первый на странице (самый свежий)
+    """
+    listings: Dict[int, List[ListingEntry]] = {}
+
+    low, high = 1, max_pages + 1
+    while low < high:
+        middle = (low + high) // 2
+        entries = yield middle
+        listings[middle] = entries
+        if not entries or entries[-1][0] <= end:
+            high = middle
+        else:
+            low = middle + 1
+
+    found: Dict[str, str] = {}
+    for page_num in range(low, max_pages + 1):
+        entries = listings[page_num] if page_num in listings else (yield page_num)
+        if not entries:
+            break
+        for file_date, file_url in entries:
+            if start <= file_date <= end:
+                found.setdefault(file_date, file_url)
+        if entries[-1][0] < start:
+            break
+    return found
+
+
+def run_search(
+    search: RangeSearch,
+    fetch_page: Callable[[int], Optional[List[ListingEntry]]],
+) -> Dict[str, str]:
+    """
+    Выполнить поиск, загружая страницы синхронной функцией
+
+    fetch_page возвращает файлы страницы (пустой список - страницы нет)
+    или None при ошибке загрузки; такая страница запрашивается повторно.
+
+    Raises:
+        ListingUnavailable: Страница не загрузилась за PAGE_FETCH_ATTEMPTS
+            попыток. Ошибку нельзя принять за пустую страницу: бинарный
+            поиск ушел бы не в ту сторону и вернул неполный результат
+    """
+    try:
+        page_num = next(search)
+        while True:
+            for attempt in range(PAGE_FETCH_ATTEMPTS):
+                if attempt:
+                    time.sleep(PAGE_RETRY_DELAY * attempt)
+                entries = fetch_page(page_num)
+                if entries is not None:
+                    break
+            else:
+                raise ListingUnavailable(page_num)
+            page_num = search.send(entries)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def run_search_async(
+    search: RangeSearch,
+    fetch_page: Callable[[int], Awaitable[Optional[List[ListingEntry]]]],
+) -> Dict[str, str]:
+    """Выполнить поиск, загружая страницы корутиной (см. run_search)"""
+    try:
+        page_num = next(search)
+        while True:
+            for attempt in range(PAGE_FETCH_ATTEMPTS):
+                if attempt:
+                    await asyncio.sleep(PAGE_RETRY_DELAY * attempt)
+                entries = await fetch_page(page_num)
+                if entries is not None:
+                    break
+            else:
+                raise ListingUnavailable(page_num)
+            page_num = search.send(entries)
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "async_parser"))
+
+from database import async_engine  # noqa: E402
+from dimensions import UPSERT_PRODUCTS, UPSERT_DELIVERY_BASES  # noqa: E402
+from partitions import ensure_partitions, months_between, next_month  # noqa: E402
+from rollups import rebuild_rollups  # noqa: E402
+
+# Торговых дней в году (будни без праздников)
+TRADING_DAYS_PER_YEAR = 250
+
+# Доли типов поставки: F - франко-вагон, A - франко-труба, J - самовывоз
+DELIVERY_TYPES = (("F", 0.7), ("A", 0.2), ("J", 0.1))
+
+OIL_NAMES = (
+    "Бензин (АИ-92-К5)",
+    "Бензин (АИ-95-К5)",
+    "Дизельное топливо (ДТ-Л-К5)",
+    "Дизельное топливо (ДТ-З-К5)",
+    "Топливо для реактивных двигателей (ТС-1)",
+    "Мазут топочный М-100",
+    "Газы углеводородные сжиженные (ПБТ)",
+    "Битум нефтяной дорожный (БНД 70/100)",
+)
+
+CREATE_SYNTHETIC_PRODUCTS = text(
+    """
+    CREATE TEMPORARY TABLE synthetic_products (
+        exchange_product_id varchar NOT NULL,
+        product_key integer NOT NULL,
+        oil_id varchar(4) NOT NULL,
+        delivery_basis_id varchar(3) NOT NULL,
+        basis_key smallint NOT NULL,
+        delivery_type_id varchar(1) NOT NULL,
+        activity float NOT NULL,
+        price float NOT NULL,
+        volume_scale float NOT NULL,
+        lot float NOT NULL
+    ) ON COMMIT PRESERVE ROWS
+    """
+)
+
+INSERT_SYNTHETIC_PRODUCTS = text(
+    """
+    INSERT INTO synthetic_products
+    SELECT * FROM unnest(
+        CAST(:codes AS varchar[]), CAST(:product_keys AS integer[]),
+        CAST(:oil_ids AS varchar[]), CAST(:basis_ids AS varchar[]),
+        CAST(:basis_keys AS smallint[]), CAST(:delivery_types AS varchar[]),
+        CAST(:activities AS float[]), CAST(:prices AS float[]),
+        CAST(:volume_scales AS float[]), CAST(:lots AS float[])
+    )
+    """
+)
+
+# Каждый инструмент торгуется в будний день с вероятностью activity.
+# Объем - экспоненциальное распределение, кратное лоту; цена - базовая
+# цена инструмента с годовым трендом, сезонностью и дневным шумом.
+FILL_MONTH = text(
+    """
+    INSERT INTO spimex_trading_results (
+        exchange_product_id, product_key, oil_id, delivery_basis_id, basis_key,
+        delivery_type_id, volume, total, contract_count, date,
+        created_on, updated_on
+    )
+    SELECT
+        exchange_product_id, product_key, oil_id, delivery_basis_id, basis_key,
+        delivery_type_id,
+        volume,
+        round((volume * price
+            * (1 + 0.08 * (day - CAST(:origin AS date)) / 365.0)
+            * (1 + 0.05 * sin(2 * pi() * extract(doy FROM day) / 365.0))
+            * (0.97 + random() * 0.06))::numeric, 2)::float,
+        greatest(1, round(volume / lot))::int,
+        day,
+        now(),
+        now()
+    FROM (
+        SELECT
+            p.*,
+            day::date AS day,
+            greatest(p.lot, round(p.volume_scale * -ln(1 - random()) / p.lot) * p.lot)
+                AS volume
+        FROM generate_series(
+            CAST(:start AS date), CAST(:end AS date), interval '1 day'
+        ) AS day
+        CROSS JOIN synthetic_products p
+        WHERE extract(isodow FROM day) < 6 AND random() < p.activity
+    ) trades
+    """
+)
+
+
+@dataclass
+class SyntheticProduct:
+    exchange_product_id: str
+    oil_id: str
+    delivery_basis_id: str
+    delivery_type_id: str
+    name: str
+    basis_name: str
+    activity: float
+    price: float
+    volume_scale: float
+    lot: float
+
+
+def basis_code(index: int) -> str:
+    """Трехбуквенный код базиса поставки по номеру"""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return (
+        letters[index // 676 % 26] + letters[index // 26 % 26] + letters[index % 26]
+    )
+
+
+def build_products(rows_per_day: float, rng: random.Random) -> List[SyntheticProduct]:
+    """
+    Набор инструментов, дающий в среднем rows_per_day сделок за торговый день
+
+    Популярность нефтепродуктов и базисов распределена по Ципфу: несколько
+    марок бензина и дизеля на крупных базисах дают большую часть сделок,
+    длинный хвост инструментов торгуется редко.
+    """
+    oil_count = max(20, min(400, int(math.sqrt(rows_per_day) * 4)))
+    basis_count = max(30, min(2000, int(math.sqrt(rows_per_day) * 6)))
+
+    oils = [
+        (
+            f"{'ABDJ'[i % 4]}{100 + i * 7 % 900:03d}",
+            f"{OIL_NAMES[i % len(OIL_NAMES)]} #{i + 1}",
+            1.0 / (i + 1) ** 0.8,
+            rng.uniform(25000, 90000),
+        )
+        for i in range(oil_count)
+    ]
+    bases = [
+        (basis_code(i), f"Базис поставки {basis_code(i)}", 1.0 / (i + 1) ** 0.6)
+        for i in range(basis_count)
+    ]
+
+    oil_weights = list(itertools.accumulate(oil[2] for oil in oils))
+    basis_weights = list(itertools.accumulate(basis[2] for basis in bases))
+    type_weights = list(itertools.accumulate(w for _, w in DELIVERY_TYPES))
+
+    products = []
+    seen = set()
+    # Инструменты добавляются, пока ожидаемое число сделок за день
+    # не достигнет rows_per_day
+    expected_rows = 0.0
+    while expected_rows < rows_per_day:
+        oil_id, oil_name, oil_weight, oil_price = rng.choices(
+            oils, cum_weights=oil_weights
+        )[0]
+        basis_id, basis_name, basis_weight = rng.choices(
+            bases, cum_weights=basis_weights
+        )[0]
+        delivery_type = rng.choices(DELIVERY_TYPES, cum_weights=type_weights)[0][0]
+        code = f"{oil_id}{basis_id}{rng.randint(1, 999):03d}{delivery_type}"
+        if code in seen:
+            continue
+        seen.add(code)
+
+        activity = min(0.95, 0.05 + 2.0 * oil_weight * basis_weight)
+        lot = rng.choice((20.0, 60.0, 65.0, 120.0))
+        products.append(
+            SyntheticProduct(
+                exchange_product_id=code,
+                oil_id=oil_id,
+                delivery_basis_id=basis_id,
+                delivery_type_id=delivery_type,
+                name=oil_name,
+                basis_name=basis_name,
+                activity=activity,
+                price=oil_price * rng.uniform(0.9, 1.1),
+                volume_scale=lot * rng.lognormvariate(1.5, 0.8),
+                lot=lot,
+            )
+        )
+        expected_rows += activity
+    return products
+
+
+async def load_products(conn, products: List[SyntheticProduct]):
+    """Добавить инструменты в справочники и во временную таблицу генерации"""
+    product_keys = dict(
+        (
+            await conn.execute(
+                UPSERT_PRODUCTS,
+                {
+                    "codes": [p.exchange_product_id for p in products],
+                    "names": [p.name for p in products],
+                },
+            )
+        ).all()
+    )
+    bases = {p.delivery_basis_id: p.basis_name for p in products}
+    basis_keys = dict(
+        (
+            await conn.execute(
+                UPSERT_DELIVERY_BASES,
+                {"codes": list(bases), "names": list(bases.values())},
+            )
+        ).all()
+    )
+
+    await conn.execute(CREATE_SYNTHETIC_PRODUCTS)
+    await conn.execute(
+        INSERT_SYNTHETIC_PRODUCTS,
+        {
+            "codes": [p.exchange_product_id for p in products],
+            "product_keys": [product_keys[p.exchange_product_id] for p in products],
+            "oil_ids": [p.oil_id for p in products],
+            "basis_ids": [p.delivery_basis_id for p in products],
+            "basis_keys": [basis_keys[p.delivery_basis_id] for p in products],
+            "delivery_types": [p.delivery_type_id for p in products],
+            "activities": [p.activity for p in products],
+            "prices": [p.price for p in products],
+            "volume_scales": [p.volume_scale for p in products],
+            "lots": [p.lot for p in products],
+        },
+    )
+    await conn.commit()
+
+
+async def run(args: argparse.Namespace):
+    end = date.today()
+    start = end - timedelta(days=365 * args.years)
+    rows_per_day = args.rows / (TRADING_DAYS_PER_YEAR * args.years)
+    rng = random.Random(args.seed)
+
+    print("🧪 SPIMEX - генерация синтетических результатов торгов")
+    print("=" * 60)
+    print(f"📅 Период: {start} - {end}")
+    print(f"🎯 Целевое количество записей: {args.rows:,}")
+    print(f"📈 В среднем за торговый день: {rows_per_day:,.0f}")
+
+    products = build_products(rows_per_day, rng)
+    print(f"🛢️ Инструментов: {len(products):,}")
+
+    started = time.perf_counter()
+    async with async_engine.connect() as conn:
+        existing = await conn.scalar(
+            text("SELECT EXISTS (SELECT 1 FROM spimex_trading_results)")
+        )
+        if existing and not args.reset:
+            print("❌ Таблица spimex_trading_results не пуста (используйте --reset)")
+            return
+        if args.reset:
+            await conn.execute(
+                text(
+                    "TRUNCATE spimex_trading_results, spimex_trading_daily_rollups, "
+                    "spimex_trading_dates, spimex_products, spimex_delivery_bases"
+                )
+            )
+            await conn.commit()
+
+        await conn.execute(text(f"SELECT setseed({rng.random() * 2 - 1})"))
+        await load_products(conn, products)
+        created = await ensure_partitions(conn, [start, end])
+        if created:
+            print(f"🧩 Создано секций: {len(created)}")
+
+        total_rows = 0
+        for month in months_between(start, end):
+            month_end = min(next_month(month) - timedelta(days=1), end)
+            result = await conn.execute(
+                FILL_MONTH,
+                {"start": max(month, start), "end": month_end, "origin": start},
+            )
+            await conn.commit()
+            total_rows += result.rowcount
+            elapsed = time.perf_counter() - started
+            print(
+                f"   {month:%Y-%m}: {result.rowcount:,} записей "
+                f"(всего {total_rows:,}, {total_rows / elapsed:,.0f} записей/с)"
+            )
+
+        print("📊 Пересчет дневных агрегатов и торгового календаря...")
+        await rebuild_rollups(conn)
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+
+    await async_engine.dispose()
+    print("=" * 60)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Сгенерировано записей: {total_rows:,} за {elapsed:.1f}с")
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(
+        description="Синтетические результаты торгов в БД асинхронного парсера"
+    )
+    parser.add_argument(
+        "--rows", type=int, default=1_000_000, help="Записей всего (1e5 - 1e8)"
+    )
+    parser.add_argument("--years", type=int, default=5, help="Лет истории торгов")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Очистить результаты торгов, агрегаты и справочники перед генерацией",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
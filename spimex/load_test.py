@@ -0,0 +1,364 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+ENDPOINTS = {
+    "dynamics": "/api/v1/dynamics",
+    "trading-results": "/api/v1/trading-results",
+    "last-trading-dates": "/api/v1/last-trading-dates",
+}
+
+DEFAULT_MIX = "dynamics=60,trading-results=25,last-trading-dates=15"
+
+# Окна динамики, которые запрашивают дашборды, и их частота
+DYNAMICS_WINDOWS = ((7, 0.4), (30, 0.35), (90, 0.15), (365, 0.1))
+
+
+@dataclass
+class PhaseResult:
+    name: str
+    duration: float = 0.0
+    latencies: Dict[str, List[float]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    etag_responses: int = 0
+    cache_hit_rate: Optional[float] = None
+
+    @property
+    def requests(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Разобрать смесь запросов вида dynamics=60,trading-results=25"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Неизвестный эндпоинт в смеси: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Перцентиль по отсортированной выборке"""
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def fetch_reference_data(
+    http: aiohttp.ClientSession, base_url: str
+) -> Tuple[List[date], List[dict]]:
+    """Торговые даты и последние результаты торгов для построения запросов"""
+    async with http.get(
+        f"{base_url}{ENDPOINTS['last-trading-dates']}", params={"limit": 100}
+    ) as response:
+        response.raise_for_status()
+        dates = [date.fromisoformat(d) for d in (await response.json())["dates"]]
+
+    async with http.get(
+        f"{base_url}{ENDPOINTS['trading-results']}", params={"limit": 1000}
+    ) as response:
+        response.raise_for_status()
+        results = (await response.json())["results"]
+
+    return dates, results
+
+
+def build_query_pool(
+    endpoint: str,
+    size: int,
+    dates: List[date],
+    results: List[dict],
+    rng: random.Random,
+) -> List[dict]:
+    """
+    Набор различных параметров запросов к эндпоинту
+
+    Параметры берутся из реальных торговых дат и инструментов: окна
+    динамики заканчиваются на торговой дате, фильтры - коды нефтепродуктов,
+    базисов и типов поставки из последних торгов.
+    """
+    pool = []
+    seen = set()
+    attempts = 0
+    while len(pool) < size and attempts < size * 20:
+        attempts += 1
+        sample = rng.choice(results) if results else {}
+        params: Dict[str, object] = {}
+
+        if endpoint == "dynamics":
+            window = rng.choices(
+                [w for w, _ in DYNAMICS_WINDOWS],
+                weights=[p for _, p in DYNAMICS_WINDOWS],
+            )[0]
+            end_date = rng.choice(dates)
+            params["start_date"] = (end_date - timedelta(days=window)).isoformat()
+            params["end_date"] = end_date.isoformat()
+            if sample and rng.random() < 0.8:
+                params["oil_id"] = sample["oil_id"]
+            if sample and rng.random() < 0.2:
+                params["delivery_basis_id"] = sample["delivery_basis_id"]
+            if sample and rng.random() < 0.1:
+                params["delivery_type_id"] = sample["delivery_type_id"]
+            params["limit"] = rng.choice((100, 1000))
+
+        elif endpoint == "trading-results":
+            if sample and rng.random() < 0.7:
+                params["oil_id"] = sample["oil_id"]
+            if sample and rng.random() < 0.2:
+                params["delivery_basis_id"] = sample["delivery_basis_id"]
+            params["limit"] = rng.choice((10, 100, 1000))
+
+        else:
+            params["limit"] = rng.choice((5, 10, 30, 100))
+
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            pool.append(params)
+
+    return pool
+
+
+def zipf_weights(size: int, exponent: float) -> List[float]:
+    """Веса популярности запросов: первые запросы пула - самые частые"""
+    return [1.0 / (rank + 1) ** exponent for rank in range(size)]
+
+
+async def run_phase(
+    http: aiohttp.ClientSession,
+    args: argparse.Namespace,
+    name: str,
+    pools: Dict[str, List[dict]],
+    mix: Dict[str, float],
+    cache: bool,
+) -> PhaseResult:
+    """
+    Прогрев и замер одной фазы нагрузки
+
+    concurrency корутин отправляют запросы без пауз до окончания фазы.
+    При отключенном кэше запросы идут с Cache-Control: no-cache - API
+    с CACHE_CLIENT_BYPASS=true читает их из БД мимо Redis.
+    """
+    rng = random.Random(args.seed)
+    headers = {} if cache else {"Cache-Control": "no-cache"}
+    endpoints = list(mix)
+    endpoint_weights = [mix[e] for e in endpoints]
+    query_weights = {
+        endpoint: zipf_weights(len(pool), args.zipf) for endpoint, pool in pools.items()
+    }
+    result = PhaseResult(name=name)
+
+    async def worker(deadline: float, record: bool):
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(endpoints, weights=endpoint_weights)[0]
+            params = rng.choices(pools[endpoint], weights=query_weights[endpoint])[0]
+            started = time.perf_counter()
+            try:
+                async with http.get(
+                    f"{args.base_url}{ENDPOINTS[endpoint]}",
+                    params=params,
+                    headers=headers,
+                ) as response:
+                    await response.read()
+                    status = response.status
+                    has_etag = "ETag" in response.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status, has_etag = None, False
+            elapsed = (time.perf_counter() - started) * 1000
+
+            if not record:
+                continue
+            if status != 200:
+                result.errors[endpoint] += 1
+                continue
+            result.latencies[endpoint].append(elapsed)
+            result.etag_responses += has_etag
+
+    if args.warmup > 0:
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(
+            *(worker(deadline, record=False) for _ in range(args.concurrency))
+        )
+
+    stats_before = await fetch_cache_stats(http, args.base_url)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(
+        *(worker(deadline, record=True) for _ in range(args.concurrency))
+    )
+    result.duration = time.perf_counter() - started
+    stats_after = await fetch_cache_stats(http, args.base_url)
+
+    if stats_before and stats_after:
+        hits = stats_after["hits"] + stats_after.get("stale", 0)
+        hits -= stats_before["hits"] + stats_before.get("stale", 0)
+        misses = stats_after["misses"] - stats_before["misses"]
+        if hits + misses > 0:
+            result.cache_hit_rate = hits / (hits + misses) * 100
+
+    return result
+
+
+async def fetch_cache_stats(
+    http: aiohttp.ClientSession, base_url: str
+) -> Optional[dict]:
+    """Счетчики попаданий и промахов кэша API (None, если недоступны)"""
+    try:
+        async with http.get(f"{base_url}/api/v1/cache/stats") as response:
+            if response.status == 200:
+                return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    return None
+
+
+def latency_row(label: str, latencies: List[float], errors: int) -> str:
+    """Строка таблицы отчета: количество запросов, ошибки и перцентили"""
+    row = f"{label:<22}{len(latencies):>10}{errors:>8}"
+    if latencies:
+        for pct in (50, 95, 99):
+            row += f"{percentile(latencies, pct):>7.1f}мс"
+        row += f"{max(latencies):>9.1f}мс"
+    return row
+
+
+def report(result: PhaseResult):
+    """Пропускная способность и перцентили задержек фазы"""
+    print(f"\n📊 Фаза: {result.name}")
+    print("=" * 78)
+    print(
+        f"{'Эндпоинт':<22}{'запросов':>10}{'ошибок':>8}"
+        f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>11}"
+    )
+    print("-" * 78)
+
+    all_latencies = []
+    for endpoint in ENDPOINTS:
+        latencies = result.latencies.get(endpoint, [])
+        errors = result.errors.get(endpoint, 0)
+        if latencies or errors:
+            all_latencies.extend(latencies)
+            print(latency_row(endpoint, latencies, errors))
+
+    print("-" * 78)
+    print(latency_row("всего", all_latencies, sum(result.errors.values())))
+    throughput = result.requests / result.duration if result.duration else 0
+    print(f"🚀 Пропускная способность: {throughput:,.1f} запросов/с")
+    if result.cache_hit_rate is not None:
+        print(f"🎯 Попадания в кэш Redis: {result.cache_hit_rate:.1f}%")
+
+
+def summary(result: PhaseResult) -> dict:
+    """Итоги фазы для JSON отчета"""
+    endpoints = {}
+    for endpoint, latencies in result.latencies.items():
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "errors": result.errors.get(endpoint, 0),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+        }
+    return {
+        "phase": result.name,
+        "duration_s": result.duration,
+        "requests": result.requests,
+        "throughput_rps": result.requests / result.duration if result.duration else 0,
+        "cache_hit_rate": result.cache_hit_rate,
+        "endpoints": endpoints,
+    }
+
+
+async def run(args: argparse.Namespace):
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+
+    print("🏋️ SPIMEX - нагрузочное тестирование API")
+    print("=" * 78)
+    print(f"🌐 API: {args.base_url}")
+    print(f"🔀 Смесь запросов: {args.mix}")
+    print(
+        f"⏱️ Прогрев {args.warmup}с, замер {args.duration}с, "
+        f"параллельных клиентов: {args.concurrency}"
+    )
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        dates, results = await fetch_reference_data(http, args.base_url)
+        if not dates:
+            print("❌ В API нет торговых дат (сгенерируйте данные generate_data.py)")
+            return
+
+        pools = {
+            endpoint: build_query_pool(endpoint, args.queries, dates, results, rng)
+            for endpoint in mix
+        }
+        print(
+            "🧾 Различных запросов: "
+            + ", ".join(f"{e}={len(pool)}" for e, pool in pools.items())
+        )
+
+        phases = {"on": [True], "off": [False], "both": [True, False]}[args.cache]
+        summaries = []
+        for cache in phases:
+            name = "кэш включен" if cache else "кэш отключен"
+            result = await run_phase(http, args, name, pools, mix, cache)
+            report(result)
+            if not cache and result.etag_responses:
+                print(
+                    "⚠️ Ответы содержат ETag - API обслуживает их из кэша. "
+                    "Запустите API с CACHE_CLIENT_BYPASS=true"
+                )
+            summaries.append(summary(result))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Отчет сохранен: {args.json}")
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование SPIMEX API")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Адрес API")
+    parser.add_argument(
+        "--duration", type=float, default=30, help="Длительность замера, с"
+    )
+    parser.add_argument(
+        "--warmup", type=float, default=5, help="Длительность прогрева, с"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=50, help="Параллельных клиентов"
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Доли запросов к эндпоинтам")
+    parser.add_argument(
+        "--queries", type=int, default=500, help="Различных запросов к эндпоинту"
+    )
+    parser.add_argument(
+        "--zipf", type=float, default=1.1, help="Показатель популярности запросов"
+    )
+    parser.add_argument(
+        "--cache", choices=("on", "off", "both"), default="both", help="Фазы с кэшем"
+    )
+    parser.add_argument("--timeout", type=float, default=30, help="Таймаут запроса, с")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+    parser.add_argument("--json", help="Сохранить итоги в JSON файл")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
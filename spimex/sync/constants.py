@@ -15,8 +15,6 @@ BASE_URL = "https://spimex.com/markets/oil_products/trades/results/"
 
 PAGE_URL_PATTERN = "?page=page-{page_num}"
 
-FILE_URL_PATTERN = r'href="([^"]*oil_xls_{date_formatted}\d{{6}}\.xls[^"]*)"'
-
 ALL_FILES_PATTERN = r'href="([^"]*oil_xls_(\d{8})\d{6}\.xls[^"]*)"'
 
 RECORDS_TO_SAVE = [
@@ -1,9 +1,16 @@
 from datetime import timedelta, datetime
 from tqdm import tqdm
-from spimex_parser import parse_bulletin_for_date, clear_page_cache
+from spimex_parser import (
+    parse_bulletin_for_date,
+    clear_page_cache,
+    locate_range,
+)
 
 from constants import DATE_FORMAT
 
+# spimex_parser добавляет корень проекта в sys.path
+from bulletin_locator import ListingUnavailable
+
 
 def generate_dates(start: datetime, end: datetime):
     """Генерирует даты в формате YYYY-MM-DD"""
@@ -35,11 +42,20 @@ def sync_main():
 
     dates_list = list(generate_dates(start_date, end_date))
 
+    # Файлы всего периода находятся одним проходом по листингу;
+    # если листинг недоступен, файл каждой даты ищется отдельно
+    try:
+        file_urls = locate_range(dates_list[0], dates_list[-1])
+        print(f"🔎 Найдено файлов бюллетеней за период: {len(file_urls)}")
+    except ListingUnavailable as e:
+        print(f"⚠️ {e}, файлы ищутся по каждой дате отдельно")
+        file_urls = None
+
     for date_str in tqdm(dates_list, desc="Обработка дат", unit="дата"):
         processed_count += 1
 
         try:
-            parse_bulletin_for_date(date_str)
+            parse_bulletin_for_date(date_str, file_urls=file_urls)
             success_count += 1
             tqdm.write(f"✅ {date_str} - успешно обработано")
         except Exception as e:
@@ -1,8 +1,8 @@
-import re
 import requests
 import pandas as pd
 from io import BytesIO
 from datetime import datetime
+from typing import Dict, Optional
 from tqdm import tqdm
 from models.trading_result import TradingResult
 from database import SessionLocal
@@ -13,7 +13,6 @@ from constants import (
     DATE_FORMAT_SPIMEX,
     BASE_URL,
     PAGE_URL_PATTERN,
-    FILE_URL_PATTERN,
     ALL_FILES_PATTERN,
     RECORDS_TO_SAVE,
     METRIC_TON_MARKER,
@@ -22,6 +21,18 @@ from constants import (
     HTTP_TIMEOUT,
 )
 
+import sys
+from pathlib import Path
+
+project_path = Path(__file__).parent.parent
+sys.path.insert(0, str(project_path))
+
+from bulletin_locator import (
+    parse_listing,
+    range_search,
+    run_search,
+)
+
 
 PAGE_CACHE: dict = {}
 
@@ -122,142 +133,105 @@ def find_columns(columns):
     return column_mapping
 
 
-def find_url_for_date(target_date: str):
-    """
-    Ищет правильный URL для скачивания файла на конкретную дату через парсинг
-    HTML с пагинацией. Начинает поиск с последней страницы и прекращает поиск
-    на странице, если файл оказался первым
-    (более новые даты на этой странице быть не могут)
-    target_date: строка в формате YYYY-MM-DD
+def fetch_listing_page(page_num: int):
     """
-    try:
-        date_obj = datetime.strptime(target_date, DATE_FORMAT)
-        date_formatted = date_obj.strftime(DATE_FORMAT_SPIMEX)
-
-        file_url, file_response, last_date, first_date = search_in_page(
-            BASE_URL, date_formatted, page_num=1
-        )
-        if file_url:
-            return file_url, file_response
+    Загружает страницу листинга бюллетеней
 
-        page_range = list(range(MAX_PAGES_TO_CHECK, 1, -1))
-        for page_num in tqdm(
-            page_range,
-            desc="Поиск по страницам",
-            leave=False,
-        ):
-            page_url = BASE_URL + PAGE_URL_PATTERN.format(page_num=page_num)
-            file_url, file_response, last_date, first_date = search_in_page(
-                page_url, date_formatted, page_num
-            )
-
-            if last_date and last_date > date_formatted:
-                break
-
-            if first_date and first_date < date_formatted:
-                continue
+    Возвращает список (дата YYYYMMDD, URL файла), пустой для несуществующей
+    страницы, или None при ошибке загрузки
+    """
+    if page_num in PAGE_CACHE:
+        return PAGE_CACHE[page_num]
 
-            if file_url:
-                return file_url, file_response
+    page_url = BASE_URL
+    if page_num > 1:
+        page_url += PAGE_URL_PATTERN.format(page_num=page_num)
 
-        return None, None
+    try:
+        response = requests.get(page_url, timeout=HTTP_TIMEOUT)
+        # 404 - страницы нет (за концом листинга), прочие ответы -
+        # сбой, после которого страница запрашивается повторно
+        if response.status_code == 404:
+            return []
+        if response.status_code != 200:
+            return None
+    except Exception:
+        return None
 
-    except Exception as e:
-        print(f"⚠️ Ошибка при парсинге HTML: {e}")
-        return None, None
+    entries = parse_listing(response.text, ALL_FILES_PATTERN)
+    PAGE_CACHE[page_num] = entries
+    return entries
 
 
-def search_in_page(page_url: str, date_formatted: str, page_num: int):
+def locate_range(start: str, end: str) -> Dict[str, str]:
     """
-    Ищет файл на конкретной странице
-    Возвращает (file_url, file_response, last_file_date, first_file_date)
+    Находит файлы бюллетеней за период бинарным поиском по листингу
+    start, end: строки в формате YYYY-MM-DD
+    Возвращает словарь {дата YYYY-MM-DD: URL файла}
+    Бросает ListingUnavailable, если страница листинга не загрузилась
     """
-    global PAGE_CACHE
-
-    if page_num in PAGE_CACHE:
-        cached_data = PAGE_CACHE[page_num]
-        first_file_date = cached_data["first_date"]
-        last_file_date = cached_data["last_date"]
-
-        if first_file_date and first_file_date < date_formatted:
-            return None, None, last_file_date, first_file_date
-    else:
-        try:
-            response = requests.get(page_url, timeout=HTTP_TIMEOUT)
-
-            if response.status_code != 200:
-                return None, None, None, None
-
-            html_content = response.text
-
-            all_files_pattern = ALL_FILES_PATTERN
-            all_matches = re.findall(all_files_pattern, html_content)
-
-            first_file_date = None
-            last_file_date = None
-            if all_matches:
-                first_file_date = all_matches[0][1]
-                last_file_date = all_matches[-1][1]
-
-                PAGE_CACHE[page_num] = {
-                    "first_date": first_file_date,
-                    "last_date": last_file_date,
-                }
-        except Exception:
-            return None, None, None, None
-
-        if first_file_date and first_file_date < date_formatted:
-            return None, None, last_file_date, first_file_date
-
-    if page_num not in PAGE_CACHE:
-        try:
-            response = requests.get(page_url, timeout=HTTP_TIMEOUT)
-            if response.status_code != 200:
-                return None, None, None, None
-            html_content = response.text
-        except Exception:
-            return None, None, None, None
-    else:
-        try:
-            response = requests.get(page_url, timeout=HTTP_TIMEOUT)
-            if response.status_code != 200:
-                return None, None, first_file_date, last_file_date
-            html_content = response.text
-        except Exception:
-            return None, None, first_file_date, last_file_date
-
-    pattern = FILE_URL_PATTERN.format(date_formatted=date_formatted)
-    target_matches = re.findall(pattern, html_content)
+    search = range_search(
+        datetime.strptime(start, DATE_FORMAT).strftime(DATE_FORMAT_SPIMEX),
+        datetime.strptime(end, DATE_FORMAT).strftime(DATE_FORMAT_SPIMEX),
+        MAX_PAGES_TO_CHECK,
+    )
+    found = run_search(search, fetch_listing_page)
+    return {
+        datetime.strptime(file_date, DATE_FORMAT_SPIMEX).strftime(DATE_FORMAT): url
+        for file_date, url in found.items()
+    }
+
+
+def download_file(file_url: str):
+    """Скачивает файл бюллетеня (None при ошибке)"""
+    try:
+        file_response = requests.get(file_url, timeout=HTTP_TIMEOUT)
+        if file_response.status_code == 200:
+            return file_response
+    except Exception:
+        pass
+    return None
 
-    if target_matches:
-        file_path = target_matches[0]
 
-        if file_path.startswith("/"):
-            file_url = f"https://spimex.com{file_path}"
-        else:
-            file_url = f"https://spimex.com/{file_path}"
+def find_url_for_date(target_date: str):
+    """
+    Ищет URL файла на конкретную дату через locate_range и скачивает его
+    target_date: строка в формате YYYY-MM-DD
+    """
+    try:
+        file_urls = locate_range(target_date, target_date)
+    except Exception as e:
+        print(f"⚠️ Ошибка поиска файла в листинге: {e}")
+        return None, None
 
-        file_response = requests.get(file_url, timeout=HTTP_TIMEOUT)
-        if file_response.status_code == 200:
-            return (
-                file_url,
-                file_response,
-                last_file_date,
-                first_file_date,
-            )
+    file_url = file_urls.get(target_date)
+    if not file_url:
+        return None, None
 
-    return None, None, last_file_date, first_file_date
+    file_response = download_file(file_url)
+    if file_response is None:
+        return None, None
+    return file_url, file_response
 
 
-def parse_bulletin_for_date(date_str: str, max_retries=3):
+def parse_bulletin_for_date(
+    date_str: str, max_retries=3, file_urls: Optional[Dict[str, str]] = None
+):
     """
     Парсит бюллетень по итогам торгов для указанной даты
     date_str: строка в формате YYYY-MM-DD
     max_retries: максимальное количество попыток при ошибках сети
+    file_urls: файлы периода из locate_range (без него файл ищется отдельно)
     """
     print(f"Обработка даты: {date_str}")
 
-    url, response = find_url_for_date(date_str)
+    if file_urls is None:
+        url, response = find_url_for_date(date_str)
+    else:
+        url = file_urls.get(date_str)
+        response = download_file(url) if url else None
+        if response is None:
+            url = None
 
     if not url:
         print(f"❌ Не найден URL для даты {date_str}")